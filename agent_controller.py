@@ -2,14 +2,22 @@ import queue
 import time
 import threading
 from collections import deque
-from signals import Signals
+from signals import Signals, InputQueue
+from event_bus import COALESCE
 from stt import SpeechRecognizer
-from llm_wrapper import LlamaWrapper
-from memory.memory_controller import MemoryController
+from llm_wrapper import build_llm
 from emotion_detector import EmotionDetector
 from tts.tts_wrapper import build_tts
 from vtube_studio import VTubeStudioController
-from config import stt_mode
+from lipsync import LipSync
+from startup import ComponentLoader
+from tracing import Tracer
+from metrics_server import MetricsServer, MetricFamily
+from web_server import WebFrontendServer
+from multiproc import SttProcess, build_tts_process, build_llm_process
+from autonomous_pool import AutonomousLinePool, AUTONOMOUS_PROMPT
+from chat_input import ChatInput, InputDigest
+from config import stt_mode, warmup_config, startup_config, tracing_config, metrics_config, web_config, vts_config, lipsync_config, speculative_prefill_config, process_config, prompt_budget_config, chat_history_config, summary_config, autonomous_pool_config, chat_input_config, input_digest_config
 
 
 
@@ -31,29 +39,19 @@ class AgentController:
         silence_seconds: int = 30,
         wait_user_talking_seconds: float = 2.0,
         debug_signals: bool = True,
+        signals=None,
+        components=None,
+        stt=None,
     ):
-        self.q = queue.Queue()
-        self.signals = Signals(debug_print=debug_signals)
-
-        # LLM, Memory
-        self.llm = LlamaWrapper()
-        self.memory = MemoryController(generate_callable=self.llm.generate)
-
-        # stt
-        self.stt = SpeechRecognizer(input_queue=self.q, signals=self.signals)
-        
-        # emotion detector
-        self.emotion = EmotionDetector()
-
-        # tts
-        self.tts = build_tts(self.signals)
-
-        # VTS
-        self.vts = VTubeStudioController(
-            signals=self.signals,
-            enabled=True,
-        )
-        self.vts.start()
+        """
+        For benchmarks / tests (defaults = the real thing):
+        signals:    an existing Signals instance
+        components: {name: zero-arg factory} replacing the llm / memory / emotion / tts / vts constructors
+        stt:        factory(input_queue, signals) -> object with start(), stop(), ready (Event), stats()
+        """
+        self.signals = signals if signals is not None else Signals(debug_print=debug_signals)
+        self.q = InputQueue(self.signals)
+        self._stop = threading.Event()   # stop() -> run() returns after the current turn
 
         # configs / timers
         self.silence_seconds = int(silence_seconds)
@@ -63,41 +61,631 @@ class AgentController:
         # deferred fact extraction jobs (same llm, run when idle)
         self.pending_fact_jobs = deque()
 
-        # start STT thread-
+        # autonomous lines generated ahead of the silence deadline (played instantly when it passes)
+        self.autonomous_pool = None
+        if autonomous_pool_config.get("enabled", True):
+            self.autonomous_pool = AutonomousLinePool(
+                size=autonomous_pool_config.get("size", 3),
+                ttl_seconds=autonomous_pool_config.get("ttl_seconds", 300),
+                similarity=autonomous_pool_config.get("similarity", 0.8),
+                recent_size=autonomous_pool_config.get("recent_size", 16),
+            )
+        self.pool_refill_lead_seconds = float(autonomous_pool_config.get("refill_lead_seconds", 20))
+
+        # a burst of queued input (speech + chat) -> one bounded user text
+        self.input_digest = InputDigest(
+            max_messages=input_digest_config.get("max_chat_messages", 8),
+            max_chars=input_digest_config.get("max_chat_chars", 600),
+            half_life_seconds=input_digest_config.get("half_life_seconds", 15),
+            source_weights=input_digest_config.get("source_weights"),
+        )
+
+        # per-turn stage latency (rolling p50/p95/p99, tracer.to_json())
+        self.tracer = Tracer(
+            enabled=tracing_config.get("enabled", True),
+            window=tracing_config.get("window", 1024),
+        )
+        self.turn_counts = {"user": 0, "autonomous": 0}
+
+        # speculative prefill: newest stable partial per segment (coalesced), consumed by the main loop
+        self._stable_sub = self.signals.subscribe(
+            "controller_stable",
+            maxlen=1,
+            policy=COALESCE,
+            topics=("stt_stable",),
+            notify=self.signals.notify,
+        )
+        self._speculation = None    # {"segment_id", "text", "prompt"} of the last prefill
+        self.speculation_counts = {"prefill": 0, "commit": 0, "rollback": 0}
+
+        # mouth parameters computed from the played TTS audio, injected by the VTS controller
+        self.lipsync = None
+        if lipsync_config.get("enabled", True):
+            self.lipsync = LipSync(
+                rate_hz=lipsync_config.get("rate_hz", 30),
+                gate_db=lipsync_config.get("gate_db", -45.0),
+                full_db=lipsync_config.get("full_db", -12.0),
+                attack=lipsync_config.get("attack", 0.6),
+                release=lipsync_config.get("release", 0.25),
+                params=lipsync_config.get("params"),
+            )
+
+        # components are built concurrently (heavy libs are imported inside the constructors),
+        # each one is warmed up right after it is built: the first real turn runs at steady-state latency
+        warm = bool(warmup_config.get("enabled", True))
+        rounds = warmup_config.get("rounds", 2)
+
+        # optional: STT / TTS (+ audio output) / LLM in their own processes (multiproc.py),
+        # the proxies have the same interface, so nothing below changes
+        stages = set(process_config.get("stages") or ()) if process_config.get("enabled", False) else set()
+        self._factories = {
+            "llm": build_llm_process if "llm" in stages else build_llm,
+            "memory": self._build_memory,
+            "emotion": EmotionDetector,
+            "tts": (lambda: build_tts_process(self.signals)) if "tts" in stages else (lambda: build_tts(self.signals)),
+            "vts": self._new_vts,
+        }
+        self._factories.update(components or {})
+
+        self.components = ComponentLoader(max_workers=startup_config.get("max_workers", 6))
+        self.components.submit(
+            "llm",
+            self._factories["llm"],
+            warm_up=(lambda llm: llm.warm_up(warmup_config.get("llm_prompt", "Hi"))) if warm else None,
+            warmup_rounds=rounds,
+        )
+        self.components.submit(
+            "memory",
+            self._factories["memory"],
+            warm_up=(lambda memory: memory.long.warm_up()) if warm else None,
+            warmup_rounds=rounds,
+        ).add_done_callback(lambda _: self.signals.notify())  # pending fact jobs may run now
+        self.components.submit(
+            "emotion",
+            self._factories["emotion"],
+            warm_up=(lambda emotion: emotion.warm_up()) if warm else None,
+            warmup_rounds=rounds,
+        )
+        self.components.submit(
+            "tts",
+            self._build_tts,
+            warm_up=self._warm_up_tts if warm else None,
+            warmup_rounds=rounds,
+        )
+        self.components.submit("vts", self._build_vts)
+
+        # stt (the whisper models load inside the STT thread, stt.ready is set when done)
+        if stt is None and "stt" in stages:
+            stt = SttProcess    # start() blocks until the STT process exits
+        if stt is not None:
+            self.stt = stt(self.q, self.signals)
+            self.stt_thread = threading.Thread(target=self.stt.start, daemon=True)
+            self.stt_thread.start()
+        else:
+            self._start_stt()
+
+        # optional text chat (socket / file tail), filtered + rate limited into the same queue
+        self.chat_input = None
+        if chat_input_config.get("enabled", False):
+            cfg = chat_input_config
+            self.chat_input = ChatInput(
+                self.q,
+                self.signals,
+                host=cfg.get("host", "127.0.0.1"),
+                port=cfg.get("port"),
+                tail_path=cfg.get("tail_path"),
+                max_message_chars=cfg.get("max_message_chars", 200),
+                mention_keywords=cfg.get("mention_keywords"),
+                mention_priority=cfg.get("mention_priority", 2.0),
+                author_rate=cfg.get("author_rate", 0.2),
+                author_burst=cfg.get("author_burst", 2),
+                global_rate=cfg.get("global_rate", 5.0),
+                global_burst=cfg.get("global_burst", 20),
+                dedupe_seconds=cfg.get("dedupe_seconds", 30),
+            )
+            self.chat_input.start()
+
+        # optional Prometheus /metrics endpoint (own thread, reads values only on scrape)
+        self.metrics_server = None
+        if metrics_config.get("enabled", False):
+            self.metrics_server = MetricsServer(
+                self._collect_metrics,
+                host=metrics_config.get("host", "127.0.0.1"),
+                port=metrics_config.get("port", 9108),
+            )
+            self.metrics_server.start()
+
+        # optional web frontend (signals, transcripts, reply deltas over WebSocket)
+        self.web_server = None
+        if web_config.get("enabled", False):
+            self.web_server = WebFrontendServer(
+                self.signals,
+                host=web_config.get("host", "127.0.0.1"),
+                port=web_config.get("port", 8765),
+                client_queue_size=web_config.get("client_queue_size", 256),
+            )
+            self.web_server.start()
+
+    # Components (block until ready; use self.components.ready(name) to check first)
+    @property
+    def llm(self):
+        return self.components.get("llm")
+
+    @property
+    def memory(self):
+        return self.components.get("memory")
+
+    @property
+    def emotion(self):
+        return self.components.get("emotion")
+
+    @property
+    def tts(self):
+        return self.components.get("tts")
+
+    @property
+    def vts(self):
+        return self.components.get("vts")
+
+    def _llm_generate(self, **kwargs):
+        return self.llm.generate(**kwargs)
+
+    def _start_stt(self):
+        self.stt = SpeechRecognizer(input_queue=self.q, signals=self.signals)
         if stt_mode["mode"] == "realtime":
             self.stt_thread = threading.Thread(target=self.stt.start_realtime, daemon=True)
         elif stt_mode["mode"] == "batch":
             self.stt_thread = threading.Thread(target=self.stt.start_batch, daemon=True)
+        elif stt_mode["mode"] == "replay":
+            self.stt_thread = threading.Thread(target=self.stt.start_replay, daemon=True)
         else:
             raise ValueError(f"Unknown STT mode: {stt_mode['mode']}")
         self.stt_thread.start()
 
+    def _build_memory(self):
+        from memory.memory_controller import MemoryController  # chromadb / rapidfuzz only when used
+        memory = MemoryController(
+            generate_callable=self._llm_generate,
+            max_prompt_tokens=prompt_budget_config.get("max_prefill_tokens", 1024),
+            section_budgets=prompt_budget_config.get("sections"),
+            history_tokens=chat_history_config.get("max_tokens", 768) if chat_history_config.get("enabled", True) else 0,
+            history_low_watermark=chat_history_config.get("low_watermark", 0.5),
+            summary_tokens=summary_config.get("max_tokens", 160) if summary_config.get("enabled", True) else 0,
+            summary_path=summary_config.get("path"),
+            summary_lead_seconds=summary_config.get("lead_seconds", 60),
+            summary_batch=summary_config.get("batch", 4),
+        )
+        # exact token counts once the LLM (tokenizer + template overhead) is loaded
+        self.components.future("llm").add_done_callback(lambda f: self._attach_tokenizer(memory, f))
+        return memory
+
+    def _attach_tokenizer(self, memory, llm_future):
+        if llm_future.exception() is not None:
+            return
+        llm = llm_future.result()
+        try:
+            reserved = llm.prompt_overhead(SYSTEM_PROMPT) if hasattr(llm, "prompt_overhead") else None
+            # LlmProcess: tokenizer lives in the LLM process, counts stay estimated
+            memory.budget.set_tokenizer(getattr(llm, "tokenizer", None), reserved_tokens=reserved)
+        except Exception as e:
+            print(f"[AgentController] WARN: prompt budget tokenizer not attached: {e}")
+
+    def _build_tts(self):
+        tts = self._factories["tts"]()
+        if self.lipsync is not None:
+            self.lipsync.attach(tts.audio)
+        return tts
+
+    def _new_vts(self):
+        return VTubeStudioController(
+            signals=self.signals,
+            enabled=True,
+            url=vts_config["url"],
+            token_path=vts_config["token_path"],
+            request_timeout=vts_config["request_timeout"],
+            reconnect_min_sec=vts_config["reconnect_min_sec"],
+            reconnect_max_sec=vts_config["reconnect_max_sec"],
+            lipsync=self.lipsync,
+        )
+
+    def _build_vts(self):
+        vts = self._factories["vts"]()
+        vts.start()
+        return vts
+
+    def _warm_up_tts(self, tts):
+        if tts.enabled:
+            tts.warm_up(warmup_config.get("tts_text", "Hello."))
+
+    def startup_report(self):
+        """Per component: load time, cold/warm latency, readiness time since startup."""
+        report = self.components.report()
+        report["stt"] = {"status": "ready" if self.stt.ready.is_set() else "loading"}
+        return report
+
+    def _history(self):
+        """Chat history for the LLM (None while memory is loading: single-message prompt)."""
+        memory = self.components.peek("memory")
+        if memory is None or not hasattr(memory, "history_messages"):
+            return None
+        return memory.history_messages()
+
+    def _summary_due(self):
+        memory = self.components.peek("memory")
+        return memory is not None and hasattr(memory, "summary_due") and memory.summary_due()
+
+    def _pool_refill_due(self):
+        """Pool needs a line, the LLM is loaded and the silence deadline is close enough."""
+        if self.autonomous_pool is None or not self.components.ready("llm"):
+            return False
+        deadline = self.last_activity_ts + self.silence_seconds
+        return time.time() >= deadline - self.pool_refill_lead_seconds and self.autonomous_pool.refill_due()
+
+    def _idle_deadline(self):
+        """Next time idle work becomes due without a signal change (pool refill or silence)."""
+        deadline = self.last_activity_ts + self.silence_seconds
+        if self.autonomous_pool is None or not self.components.ready("llm"):
+            return deadline
+        # not before the refill window opens, nor before the pool takes a line again (rejected / full)
+        refill_at = max(self.autonomous_pool.next_refill_at(), deadline - self.pool_refill_lead_seconds)
+        return min(deadline, refill_at)
+
+    def _wait_until_serving(self):
+        """The loop only needs LLM + STT, the rest joins as soon as it is ready."""
+        print("[AgentController] waiting for LLM + STT...")
+        self.llm  # re-raises if the LLM failed to load
+        while not self.stt.ready.wait(timeout=0.5):
+            if not self.stt_thread.is_alive():
+                raise RuntimeError("STT thread exited before it was ready")
+        for name, r in self.startup_report().items():
+            print(f"[Startup] {name}: {r.get('status')}")
+
+    def _can_run_background(self):
+        return (
+            (not self.signals.ai_generating) and
+            (not self.signals.user_talking) and
+            (not self.signals.new_q)
+        )
+
+    def _idle_work_due(self):
+        if not self._can_run_background():
+            return False
+        if self.pending_fact_jobs:
+            return self.components.ready("memory")  # silence waits until the jobs are done
+        if self._summary_due():
+            return True
+        return (time.time() - self.last_activity_ts) >= self.silence_seconds or self._pool_refill_due()
+
+    def _next_input(self):
+        """
+        Blocks until input arrives, idle work becomes possible (signal change) or the
+        silence deadline passes. Returns the next queue item, or None for an idle tick.
+        Sleeps fully while idle, wakes within a millisecond on input/signals.
+        """
+        while not self._stop.is_set():
+            try:
+                item = self.q.get_nowait()
+                self.signals.new_q = True
+                return item
+            except queue.Empty:
+                self.signals.new_q = False
+
+            if self._idle_work_due():
+                return None
+
+            timeout = None  # nothing scheduled: wait for input or a signal change
+            if self._can_run_background() and not self.pending_fact_jobs:
+                timeout = max(0.0, self._idle_deadline() - time.time())
+            if self._maybe_speculate():
+                continue
+
+            self.signals.wait_for(
+                lambda: (not self.q.empty()) or self._idle_work_due() or len(self._stable_sub) > 0 or self._stop.is_set(),
+                timeout=timeout,
+            )
+
+    def _maybe_speculate(self):
+        """
+        Stable partial transcript -> build the prompt and prefill the LLM KV cache now,
+        so the final transcript only has to compute what changed. Returns True if it ran.
+        """
+        events = self._stable_sub.drain()
+        if not events or not speculative_prefill_config.get("enabled", True):
+            return False
+        data = events[-1][1] or {}
+        text = (data.get("text") or "").strip()
+        if len(text.split()) < int(speculative_prefill_config.get("min_words", 3)):
+            return False
+        if not self.components.ready("llm") or not hasattr(self.llm, "prefill"):
+            return False
+        if self._speculation and self._speculation["text"] == text:
+            return False
+
+        if self.components.ready("memory"):
+            prompt = self.memory.build_prompt_with_context(text)
+        else:
+            prompt = f"[USER]: {text}"
+        try:
+            st = self.llm.prefill(system_prompt=SYSTEM_PROMPT, user_prompt=prompt, history=self._history())
+        except Exception as e:
+            print(f"[AgentController] WARN: speculative prefill failed: {e}")
+            self._speculation = None
+            return True
+        self._speculation = {"segment_id": data.get("segment_id"), "text": text, "prompt": prompt}
+        self.speculation_counts["prefill"] += 1
+        print(f"[AgentController] prefilled from stable partial ({st['prompt_tokens']} tokens, "
+              f"{st['reused_tokens']} reused, {st['prefill_s'] * 1000:.0f} ms): {text}")
+        return True
+
+    def _take_speculation(self, items, user_text):
+        """
+        Final transcript arrived: commit (same text -> reuse the speculative prompt, its KV is
+        already computed) or roll back (the LLM only reuses the common token prefix).
+        Returns (outcome, prompt or None).
+        """
+        spec, self._speculation = self._speculation, None
+        self._stable_sub.drain()    # partials of a segment that is already final
+        if spec is None:
+            return None, None
+        last = items[-1]
+        if len(items) == 1 and last.get("segment_id") == spec["segment_id"] and user_text == spec["text"]:
+            self.speculation_counts["commit"] += 1
+            return "commit", spec["prompt"]
+        self.speculation_counts["rollback"] += 1
+        return "rollback", None
+
+    def _collect_metrics(self):
+        """Called by the metrics thread on scrape: plain attribute reads, components only if ready."""
+        fams = []
+        turns = MetricFamily("ai_turns_total", "counter", "Processed turns.")
+        for kind, n in self.turn_counts.items():
+            turns.add(n, kind=kind)
+        fams.append(turns)
+        fams.append(MetricFamily("ai_input_queue_depth", "gauge", "Items waiting in the input queue.").add(self.q.qsize()))
+        spec = MetricFamily("ai_speculative_prefill_total", "counter", "Prefills from stable partials and their outcome.")
+        for outcome, n in self.speculation_counts.items():
+            spec.add(n, outcome=outcome)
+        fams.append(spec)
+        fams.append(MetricFamily("ai_pending_fact_jobs", "gauge", "Deferred fact extraction jobs.").add(len(self.pending_fact_jobs)))
+        if self.chat_input is not None:
+            chat = MetricFamily("ai_chat_messages_total", "counter", "Chat messages received, accepted and dropped (by reason).")
+            for outcome, n in self.chat_input.stats.items():
+                chat.add(n, outcome=outcome)
+            fams.append(chat)
+        digest = MetricFamily("ai_input_digest_total", "counter", "Chat messages merged into prompts and dropped from them.")
+        for event, n in self.input_digest.stats.items():
+            digest.add(n, event=event)
+        fams.append(digest)
+        if self.autonomous_pool is not None:
+            fams.append(MetricFamily("ai_autonomous_pool_lines", "gauge", "Pre-generated autonomous lines ready.").add(len(self.autonomous_pool.lines)))
+            pool = MetricFamily("ai_autonomous_pool_total", "counter", "Autonomous line pool events.")
+            for event, n in self.autonomous_pool.stats.items():
+                pool.add(n, event=event)
+            fams.append(pool)
+
+        sig = MetricFamily("ai_signal", "gauge", "Current Signals state (1 = on).")
+        for name in ("user_talking", "ai_talking", "ai_generating", "memory_generating", "new_q", "stt_enabled", "avatar_enabled"):
+            sig.add(bool(getattr(self.signals, name)), name=name)
+        fams.append(sig)
+
+        bus = MetricFamily("ai_event_bus_dropped_total", "counter", "Events dropped by bounded subscribers.")
+        for sub in self.signals.bus.stats()["subscribers"]:
+            bus.add(sub["dropped"], subscriber=sub["name"])
+        fams.append(bus)
+
+        ready = MetricFamily("ai_component_ready", "gauge", "Component finished loading.")
+        for name in ("llm", "memory", "emotion", "tts", "vts"):
+            ready.add(self.components.ready(name), component=name)
+        fams.append(ready)
+
+        llm = self.components.peek("llm")
+        if llm is not None:
+            st = getattr(llm, "last_stats", None) or {}
+            fams.append(MetricFamily("ai_llm_tokens_per_second", "gauge", "Decode speed of the last generation.").add(st.get("tokens_per_s")))
+            fams.append(MetricFamily("ai_llm_ttft_seconds", "gauge", "Time to first token of the last generation.").add(st.get("ttft_s")))
+            fams.append(MetricFamily("ai_llm_draft_acceptance_rate", "gauge", "Accepted / drafted tokens of the last generation (speculative decoding).").add(st.get("acceptance_rate")))
+
+        memory = self.components.peek("memory")
+        if memory is not None:
+            try:
+                facts = memory.long.collection.count()
+            except Exception:
+                facts = None
+            fams.append(MetricFamily("ai_memory_facts", "gauge", "Long-term memory collection size.").add(facts))
+            fams.append(MetricFamily("ai_memory_short_entries", "gauge", "Short-term memory entries.").add(len(memory.short.memory)))
+
+        tts = self.components.peek("tts")
+        if tts is not None:
+            st = tts.stats()
+            fams.append(MetricFamily("ai_tts_queue_depth", "gauge", "Utterances waiting for synthesis.").add(st["queue_depth"]))
+            utt = MetricFamily("ai_tts_utterances_total", "counter", "Utterances by outcome.")
+            for status in ("played", "dropped", "cancelled"):
+                utt.add(st[status], status=status)
+            fams.append(utt)
+            if tts.cache is not None:
+                cs = tts.cache.stats()
+                fams.append(MetricFamily("ai_tts_cache_hits_total", "counter", "TTS audio cache hits.").add(cs["hits"]))
+                fams.append(MetricFamily("ai_tts_cache_misses_total", "counter", "TTS audio cache misses.").add(cs["misses"]))
+                fams.append(MetricFamily("ai_tts_cache_bytes", "gauge", "Bytes stored in the TTS audio cache.").add(cs["bytes_stored"]))
+
+        vts = self.components.peek("vts")
+        if vts is not None:
+            st = vts.stats
+            fam = MetricFamily("ai_vts_request_latency_seconds", "summary", "VTube Studio request latency.")
+            fam.add(st["latency_sum_s"], suffix="_sum").add(st["requests"], suffix="_count")
+            fams.append(fam)
+            fams.append(MetricFamily("ai_vts_request_errors_total", "counter", "Failed VTube Studio requests.").add(st["errors"]))
+            fams.append(MetricFamily("ai_vts_reconnects_total", "counter", "VTube Studio reconnect attempts.").add(st["reconnects"]))
+            lip = MetricFamily("ai_vts_lipsync_injections_total", "counter", "Lip-sync parameter injections.")
+            for status in ("sent", "dropped", "errors"):
+                lip.add(st[f"lipsync_{status}"], status=status)
+            fams.append(lip)
+            fams.append(MetricFamily("ai_vts_connected", "gauge", "1 if the VTube Studio socket is authenticated.").add(vts.connected))
+
+        st = self.stt.stats()
+        fams.append(MetricFamily("ai_stt_segments_total", "counter", "Finalized STT segments.").add(st["segments"]))
+        for name, key, help_text in (
+            ("ai_stt_finalize_latency_seconds", "finalize_latency", "Recording stop -> final text."),
+            ("ai_stt_real_time_factor", "rtf", "Finalize time / segment audio length."),
+        ):
+            fam = MetricFamily(name, "summary", help_text)
+            for q in ("p50", "p95"):
+                fam.add(st[key].get(q), quantile=f"0.{q[1:]}")
+            fams.append(fam)
+
+        stages = MetricFamily("ai_stage_latency_seconds", "summary", "Turn stage latency (rolling window).")
+        for stage, h in self.tracer.summary().items():
+            for q in ("p50", "p95", "p99"):
+                stages.add(h.get(q), stage=stage, quantile=f"0.{q[1:]}")
+            stages.add(h["count"], suffix="_count", stage=stage)
+        fams.append(stages)
+        return fams
+
+    def _trace_llm_stats(self, turn):
+        st = getattr(self.llm, "last_stats", None) or {}
+        self.tracer.record(turn, "llm_prefill", st.get("ttft_s"))
+        self.tracer.record(turn, "llm_decode", st.get("decode_s"))
+        self.tracer.set(
+            turn,
+            prompt_tokens=st.get("prompt_tokens"),
+            new_tokens=st.get("new_tokens"),
+            tokens_per_s=st.get("tokens_per_s"),
+            reused_tokens=st.get("reused_tokens"),
+            history_messages=st.get("history_messages"),
+            acceptance_rate=st.get("acceptance_rate"),
+            tokens_per_step=st.get("tokens_per_step"),
+        )
+
+    def _speak(self, text, emo_label, turn=None, input_ts=None):
+        if not self.signals.avatar_enabled:
+            return None
+        tts = self.components.peek("tts")
+        if tts is None:
+            print("[TTS] not ready yet, skipping playback")
+            return None
+
+        def on_start(utt):
+            # runs on the audio thread when the first chunk reaches the device
+            self.tracer.record(turn, "tts_first_audio", utt.playback_started_at - utt.enqueued_at)
+            if input_ts is not None:
+                self.tracer.record(turn, "input_to_first_audio", utt.playback_started_at - input_ts)
+
+        try:
+            return tts.speak(text, emotion_label=emo_label, on_start=on_start)
+        except Exception as e:
+            print(f"[TTS] ERROR: {e}")
+            return None
+
+    def _autonomous_turn(self):
+        """Silence deadline passed: play a pooled line, or generate one live if the pool is empty."""
+        turn = self.tracer.start_turn("autonomous")
+        deadline = self.last_activity_ts + self.silence_seconds
+        line = self.autonomous_pool.take() if self.autonomous_pool is not None else None
+        if line is not None:
+            autonomous_text, emo_label = line["text"], line["emotion"]
+            self.tracer.set(turn, pooled=True, line_age_s=time.time() - line["created_at"], prerendered=line["prerendered"])
+        else:
+            self.signals.ai_generating = True
+            try:
+                with self.tracer.span(turn, "llm"):
+                    autonomous_text = self._generate_autonomous()
+            finally:
+                self.signals.ai_generating = False
+            self._trace_llm_stats(turn)
+            self.tracer.set(turn, pooled=False)
+            emo_label = None
+        self.turn_counts["autonomous"] += 1
+
+        if autonomous_text:
+            print(f"\n[AI - autonomous] {autonomous_text}\n")
+
+            # emotion detection (pooled lines come with their label)
+            if emo_label is None:
+                with self.tracer.span(turn, "emotion"):
+                    try:
+                        emo_label = self._detect_emotion(autonomous_text)
+                    except Exception as e:
+                        emo_label = "neutral"
+                        print(f"[EmotionDetector] ERROR (autonomous): {e}")
+            self.signals.emotion_label = emo_label
+            print(f"[EmotionDetector] {emo_label}")
+            self.signals.publish("reply", {"turn": turn.id, "text": autonomous_text, "emotion": emo_label, "autonomous": True})
+            if self.autonomous_pool is not None:
+                self.autonomous_pool.remember(autonomous_text)
+
+            # deferred fact extraction (no user input)
+            self.pending_fact_jobs.append(("", autonomous_text))
+
+            with self.tracer.span(turn, "tts_enqueue"):
+                self._speak(autonomous_text, emo_label, turn=turn, input_ts=deadline)
+        # also after an empty reply: the next attempt waits a full silence period
+        self.last_activity_ts = time.time()
+        self.tracer.end_turn(turn)
+
+    def _generate_autonomous(self):
+        return self.llm.generate(
+            system_prompt=SYSTEM_PROMPT,
+            user_prompt=AUTONOMOUS_PROMPT,
+            max_new_tokens=80,
+            temperature=0.7,
+            top_p=0.9,
+            history=self._history(),
+        ).strip()
+
+    def _refill_autonomous_pool(self):
+        """
+        One pooled line while the LLM has nothing else to do: text, emotion label and
+        (optionally) its audio rendered into the TTS cache, so the silence handler only plays it.
+        """
+        self.signals.memory_generating = True   # background LLM job, like the fact / summary jobs
+        try:
+            text = self._generate_autonomous()
+        except Exception as e:
+            print(f"[AgentController] ERROR: autonomous line generation failed: {e}")
+            text = ""
+        finally:
+            self.signals.memory_generating = False
+        try:
+            emo_label = self._detect_emotion(text) if text else "neutral"
+        except Exception as e:
+            emo_label = "neutral"
+            print(f"[EmotionDetector] ERROR (pool): {e}")
+
+        prerendered = False
+        tts = self.components.peek("tts")
+        if text and autonomous_pool_config.get("presynthesize", True) and self.signals.avatar_enabled and tts is not None:
+            try:
+                prerendered = bool(tts.prerender(text, emotion_label=emo_label))
+            except Exception as e:
+                print(f"[TTS] WARN: prerender failed: {e}")
+        if self.autonomous_pool.offer(text, emotion=emo_label, prerendered=prerendered):
+            print(f"[AgentController] pooled autonomous line ({len(self.autonomous_pool.lines)}/{self.autonomous_pool.size}): {text}")
+
+    def _detect_emotion(self, text):
+        if not self.signals.avatar_enabled or not self.components.ready("emotion"):
+            return "neutral"  # still loading
+        return self.emotion.predict_label(text)
+
     def run(self):
+        self._wait_until_serving()
         print("[AgentController] running (acts as main)...")
 
         try:
-            while True:
+            while not self._stop.is_set():
                 # ============================================================
                 # A) INPUT STAGE: wait for queue input (or idle)
                 # ============================================================
-                try:
-                    item = self.q.get(timeout=0.5)
-                    self.signals.new_q = True
-                except queue.Empty:
-                    item = None
-                    self.signals.new_q = False
+                item = self._next_input()
+                if self._stop.is_set():
+                    break
 
                 # ============================================================
                 # B) IDLE STAGE: if no new user input -> run deferred memory job + silence autonomous
                 # ============================================================
                 if item is None:
-                    can_run_background = (
-                        (not self.signals.ai_generating) and
-                        (not self.signals.user_talking) and
-                        (not self.signals.new_q)
-                    )
+                    can_run_background = self._can_run_background()
                     # 1) Run ONE deferred fact extraction job if LLM is not busy
-                    if can_run_background and self.pending_fact_jobs:
+                    if can_run_background and self.pending_fact_jobs and self.components.ready("memory"):
                         user_text_job, ai_text_job = self.pending_fact_jobs.popleft()
                         self.signals.memory_generating = True
                         try:
@@ -105,51 +693,40 @@ class AgentController:
                         finally:
                             self.signals.memory_generating = False
 
-                    # 2) Silence -> autonomous message (only when not generating)
-                    if can_run_background and (not self.pending_fact_jobs):
+                    # 2) Fold expiring short-term exchanges into the rolling summary (one batch)
+                    elif can_run_background and self._summary_due():
+                        self.signals.memory_generating = True
+                        try:
+                            self.memory.summarize_expiring()
+                        except Exception as e:
+                            print(f"[AgentController] ERROR: rolling summary failed: {e}")
+                        finally:
+                            self.signals.memory_generating = False
+
+                    # 3) Silence -> autonomous message (only when not generating)
+                    if can_run_background and (not self.pending_fact_jobs) and not self._summary_due():
                         if (time.time() - self.last_activity_ts) >= self.silence_seconds:
-                            self.signals.ai_generating = True
-                            try:
-                                autonomous_text = self.llm.generate(
-                                    system_prompt=SYSTEM_PROMPT,
-                                    user_prompt="Say one short, natural sentence to re-engage the user.",
-                                    max_new_tokens=80,
-                                    temperature=0.7,
-                                    top_p=0.9,
-                                ).strip()
-                            finally:
-                                self.signals.ai_generating = False
-
-                            if autonomous_text:
-                                print(f"\n[AI - autonomous] {autonomous_text}\n")
-
-                                # emotion detection
-                                try:
-                                    emo_label = self.emotion.predict_label(autonomous_text)
-                                except Exception as e:
-                                    emo_label = "neutral"
-                                    print(f"[EmotionDetector] ERROR (autonomous): {e}")
-                                self.signals.emotion_label = emo_label
-                                print(f"[EmotionDetector] {emo_label}")
-
-                                # deferred fact extraction (no user input)
-                                self.pending_fact_jobs.append(("", autonomous_text))
-
-                                self.last_activity_ts = time.time()
+                            self._autonomous_turn()
+
+                        # 4) Pre-generate the next autonomous line (before the deadline)
+                        elif self._pool_refill_due():
+                            self._refill_autonomous_pool()
 
                     continue  # go next loop tick
 
+                # one trace per turn, one span per stage
+                turn = self.tracer.start_turn("user")
+                self.tracer.record(turn, "queue_delay", max(0.0, time.time() - float(item.get("timestamp") or time.time())))
+
                 # ============================================================
                 # C) USER TALKING WAIT: wait briefly until user stops talking
                 # ============================================================
-                start_wait = time.time()
-                while self.signals.user_talking:
-                    if (time.time() - start_wait) > self.wait_user_talking_seconds:
-                        break
-                    time.sleep(0.05)
+                with self.tracer.span(turn, "wait_user_talking"):
+                    self.signals.wait_until("user_talking", False, timeout=self.wait_user_talking_seconds)
 
                 # ============================================================
-                # D) KEEP LATEST: drain burst -> keep newest as main, older as "also said earlier"
+                # D) KEEP LATEST: drain burst -> newest speech as main, older as "also said earlier",
+                #    chat messages as a capped digest (see chat_input.InputDigest)
                 # ============================================================
                 items = [item]
                 try:
@@ -158,60 +735,79 @@ class AgentController:
                 except queue.Empty:
                     pass
 
-                texts = [(it.get("text") or "").strip() for it in items]
-                texts = [t for t in texts if t]
+                user_text = self.input_digest.merge(items)
 
                 self.signals.new_q = False  # edge reset
 
-                if not texts:
+                if not user_text:
                     continue
 
-                user_text_latest = texts[-1]
-                earlier = texts[:-1]
-                if earlier:
-                    user_text = user_text_latest + "\nUser also said earlier: " + " | ".join(earlier)
-                else:
-                    user_text = user_text_latest
+                input_ts = min(float(it.get("timestamp") or time.time()) for it in items)
 
                 print(f"[AgentController] ({time.strftime('%H:%M:%S')}) Merged input:\n{user_text}")
+                self.signals.publish("user_input", {"turn": turn.id, "text": user_text})
 
                 # ============================================================
                 # E) MEMORY: start_turn + build_prompt_with_context
                 # ============================================================
                 self.last_activity_ts = time.time()
 
-                short_id = self.memory.start_turn(user_text)
-                prompt = self.memory.build_prompt_with_context(user_text)
+                outcome, speculative_prompt = self._take_speculation(items, user_text)
+                self.tracer.set(turn, speculation=outcome)
+
+                with self.tracer.span(turn, "retrieval"):
+                    if speculative_prompt is not None and self.components.ready("memory"):
+                        short_id = self.memory.start_turn(user_text)
+                        prompt = speculative_prompt     # retrieval already ran on the stable partial
+                    elif self.components.ready("memory"):
+                        short_id = self.memory.start_turn(user_text)
+                        prompt = self.memory.build_prompt_with_context(user_text)
+                    else:
+                        short_id = None  # memory still loading: answer without context
+                        prompt = f"[USER]: {user_text}"
 
                 # ============================================================
                 # F) LLM RESPONSE GENERATION
                 # ============================================================
                 self.signals.ai_generating = True
                 try:
-                    ai_text = self.llm.generate(
-                        system_prompt=SYSTEM_PROMPT,
-                        user_prompt=prompt
-                    ).strip()
+                    with self.tracer.span(turn, "llm"):
+                        ai_text = self.llm.generate(
+                            system_prompt=SYSTEM_PROMPT,
+                            user_prompt=prompt,
+                            on_delta=lambda d: self.signals.publish("reply_delta", {"turn": turn.id, "text": d}),
+                            history=self._history(),
+                        ).strip()
                 finally:
                     self.signals.ai_generating = False
+                self._trace_llm_stats(turn)
 
                 print(f"\n[AI] {ai_text}\n")
 
                 # ============================================================
                 # G) EMOTION DETECTION (AI output -> label -> signals)
                 # ============================================================
-                try:
-                    emo_label = self.emotion.predict_label(ai_text)
-                except Exception as e:
-                    emo_label = "neutral"
-                    print(f"[EmotionDetector] ERROR: {e}")
+                with self.tracer.span(turn, "emotion"):
+                    try:
+                        emo_label = self._detect_emotion(ai_text)
+                    except Exception as e:
+                        emo_label = "neutral"
+                        print(f"[EmotionDetector] ERROR: {e}")
                 self.signals.emotion_label = emo_label
                 print(f"[EmotionDetector] {emo_label}")
+                self.signals.publish("reply", {"turn": turn.id, "text": ai_text, "emotion": emo_label})
+
+                # pooled autonomous lines were written before this exchange
+                if self.autonomous_pool is not None:
+                    self.autonomous_pool.remember(ai_text)
+                    if autonomous_pool_config.get("clear_on_user_turn", True):
+                        self.autonomous_pool.clear()
 
                 # ============================================================
                 # H) SHORT-TERM UPDATE (fill placeholder)
                 # ============================================================
-                self.memory.short.set_ai_for_id(short_id, ai_text)
+                if short_id is not None:
+                    self.memory.short.set_ai_for_id(short_id, ai_text)
 
                 # ============================================================
                 # I) DEFERRED FACT EXTRACTION (run later when idle)
@@ -221,28 +817,50 @@ class AgentController:
                 # ============================================================
                 # J) TTS (async) - same interface for all engines
                 # ============================================================
-                try:
-                    self.tts.play(ai_text, emotion_label=emo_label)
-                except Exception as e:
-                    print(f"[TTS] ERROR: {e}")
+                with self.tracer.span(turn, "tts_enqueue"):
+                    self._speak(ai_text, emo_label, turn=turn, input_ts=input_ts)
+                self.tracer.end_turn(turn)
+                self.turn_counts["user"] += 1
 
                 # Later modules:
-                # - Web frontend (web socket)
                 # - Testing (important: VB Cable)
                 # - no modul, but lora finetune
 
         except KeyboardInterrupt:
             print("\n[AgentController] Shutting down...")
-            self.stt.stop()
-            self.stt_thread.join()
+        finally:
+            self.shutdown()
+
+    def stop(self):
+        """Thread-safe: run() returns after the current turn (then shuts everything down)."""
+        self._stop.set()
+        self.signals.notify()
+
+    def shutdown(self):
+        if tracing_config.get("dump_path"):
             try:
-                self.tts.stop()
-            except Exception:
-                pass
+                self.tracer.dump(tracing_config["dump_path"])
+            except Exception as e:
+                print(f"[Tracer] ERROR: dump failed: {e}")
+        self.stt.stop()
+        self.stt_thread.join(timeout=5.0)
+        if self.chat_input is not None:
+            self.chat_input.stop()
+        for name in ("tts", "vts", "llm"):
+            component = self.components.peek(name)
+            stop = getattr(component, "stop", None)     # LlamaWrapper has none, LlmProcess / OpenAIChatLLM do
+            if stop is None:
+                continue
             try:
-                self.vts.stop()
+                stop()
             except Exception:
                 pass
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        if self.web_server is not None:
+            self.web_server.stop()
+        self._stable_sub.close()
+        self.components.shutdown(wait=False)
 
 
 
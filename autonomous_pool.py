@@ -0,0 +1,113 @@
+"""
+Pool of pre-generated autonomous re-engagement lines.
+
+The silence handler used to generate its line only once the deadline passed
+(LLM -> emotion -> TTS, seconds of dead air). The pool is filled ahead of the
+deadline while the LLM has nothing else to do: every line comes with its emotion
+label and, optionally, its audio already in the TTS cache, so the silence
+handler only has to play it.
+
+Lines expire after ttl_seconds (the conversation moves on), and a line too
+similar to something said recently (or to another pooled line) is discarded.
+"""
+
+import difflib
+import re
+import time
+from collections import deque
+
+AUTONOMOUS_PROMPT = "Say one short, natural sentence to re-engage the user."
+
+_WORD_RE = re.compile(r"[^\w\s]+")
+
+
+def _normalize(text):
+    return " ".join(_WORD_RE.sub(" ", (text or "").lower()).split())
+
+
+class AutonomousLinePool:
+    def __init__(self, size=3, ttl_seconds=300, similarity=0.8, recent_size=16, retry_seconds=5.0):
+        self.size = int(size)
+        self.ttl_seconds = float(ttl_seconds)
+        self.similarity = float(similarity)     # difflib ratio at which two lines count as the same
+        self.retry_seconds = float(retry_seconds)
+        self.lines = deque()                    # {"text", "emotion", "created_at", "prerendered"}, oldest first
+        self.recent = deque(maxlen=int(recent_size))   # normalized texts spoken recently
+        self._retry_at = 0.0
+        self.stats = {"produced": 0, "taken": 0, "misses": 0, "expired": 0, "duplicates": 0, "cleared": 0}
+
+    # producer side
+    def refill_due(self):
+        return time.time() >= self.next_refill_at()
+
+    def next_refill_at(self):
+        """
+        Earliest time a refill can be due: now-ish if a slot is free (after a rejected
+        line: the retry time), else when the oldest pooled line expires.
+        """
+        self._prune()
+        if len(self.lines) < self.size:
+            return self._retry_at
+        return self.lines[0]["created_at"] + self.ttl_seconds
+
+    def offer(self, text, emotion="neutral", prerendered=False):
+        """Add a generated line. False if it is empty or repeats something recent (retry later)."""
+        text = (text or "").strip()
+        if not text or self._is_duplicate(text):
+            if text:
+                self.stats["duplicates"] += 1
+            self._retry_at = time.time() + self.retry_seconds
+            return False
+        self.lines.append({
+            "text": text,
+            "emotion": emotion or "neutral",
+            "created_at": time.time(),
+            "prerendered": bool(prerendered),
+        })
+        self.stats["produced"] += 1
+        return True
+
+    # consumer side
+    def take(self):
+        """Oldest fresh line that wasn't said meanwhile, or None (caller generates live)."""
+        self._prune()
+        while self.lines:
+            line = self.lines.popleft()
+            if self._is_recent(line["text"]):
+                self.stats["duplicates"] += 1
+                continue
+            self.stats["taken"] += 1
+            return line
+        self.stats["misses"] += 1
+        return None
+
+    def remember(self, text):
+        """Everything the character says (replies and autonomous lines) is deduped against."""
+        norm = _normalize(text)
+        if norm:
+            self.recent.append(norm)
+
+    def clear(self):
+        """Conversation moved on: pooled lines were written for an older context."""
+        if self.lines:
+            self.stats["cleared"] += len(self.lines)
+            self.lines.clear()
+        self._retry_at = 0.0
+
+    # internal
+    def _prune(self):
+        now = time.time()
+        while self.lines and now - self.lines[0]["created_at"] >= self.ttl_seconds:
+            self.lines.popleft()
+            self.stats["expired"] += 1
+
+    def _similar(self, a, b):
+        return a == b or difflib.SequenceMatcher(None, a, b).ratio() >= self.similarity
+
+    def _is_recent(self, text):
+        norm = _normalize(text)
+        return any(self._similar(norm, r) for r in self.recent)
+
+    def _is_duplicate(self, text):
+        norm = _normalize(text)
+        return self._is_recent(text) or any(self._similar(norm, _normalize(l["text"])) for l in self.lines)
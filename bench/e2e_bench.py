@@ -0,0 +1,225 @@
+"""
+End-to-end turn pipeline benchmark: the real AgentController with fake components
+(bench/fakes.py), so it runs on any CPU box without mic, speakers, GPU or VTS.
+
+    python -m bench.e2e_bench
+    python -m bench.e2e_bench --script bench/scripts/smoke.json --repeat 5 --json data/bench.json
+    python -m bench.e2e_bench --thresholds bench/thresholds.json     # exit code 1 on regression (CI)
+    python -m bench.e2e_bench --llm http    # OpenAIChatLLM against a local stub server
+
+Reports per-stage latency distributions (the controller's own tracer), throughput,
+Python heap growth (tracemalloc) and the fake/mock component counters.
+
+Thresholds file: {"dotted.path.in.report": max} or {"path": {"min": x, "max": y}}, e.g.
+    {"stages.input_to_first_audio.p95": 1.5, "memory.growth_mb": 5}
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import config
+from agent_controller import AgentController
+from signals import Signals
+from tts.audio_output import AudioOutput
+
+from bench.fakes import (
+    ScriptedSTT, FakeLLM, FakeMemory, FakeEmotion, FakeTTS, FastNullSink, MockVTSServer, StubChatServer,
+)
+
+DEFAULT_SCRIPT = os.path.join(os.path.dirname(__file__), "scripts", "smoke.json")
+
+
+def load_script(path, repeat=1):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    steps = data["turns"] if isinstance(data, dict) else data
+    return list(steps) * max(1, int(repeat))
+
+
+def run(args):
+    script = load_script(args.script, args.repeat)
+
+    vts = MockVTSServer(latency_s=args.vts_latency).start()
+    config.vts_config["url"] = vts.url
+    config.vts_config["token_path"] = os.path.join(tempfile.gettempdir(), "bench_vts_token.txt")
+    config.tracing_config["dump_path"] = args.trace_dump
+    config.warmup_config["rounds"] = 1
+
+    stub = None
+    if args.llm == "http":
+        from llm_http import OpenAIChatLLM
+        stub = StubChatServer(
+            tokens_per_s=args.tokens_per_s,
+            ttft_s=100.0 / args.prefill_tokens_per_s,   # ~ a 100 token prompt
+            reply_tokens=args.reply_tokens,
+        ).start()
+        make_llm = lambda: OpenAIChatLLM(base_url=stub.url)
+    else:
+        make_llm = lambda: FakeLLM(args.tokens_per_s, args.prefill_tokens_per_s, args.reply_tokens)
+
+    signals = Signals(debug_print=False)
+    audio = AudioOutput(signals, FastNullSink(24000, 1, speed=args.playback_speed), sample_rate=24000, channels=1)
+    holder = {}
+
+    def tts_busy():
+        tts = holder["agent"].components.peek("tts") if "agent" in holder else None
+        return bool(tts is not None and tts.busy)
+
+    def make_stt(input_queue, sig):
+        holder["stt"] = ScriptedSTT(input_queue, sig, script, speed=args.speed, busy=tts_busy)
+        return holder["stt"]
+
+    tracemalloc.start()
+    agent = AgentController(
+        silence_seconds=10 ** 6,    # no autonomous turns during the run
+        debug_signals=False,
+        signals=signals,
+        components={
+            "llm": make_llm,
+            "memory": lambda: FakeMemory(retrieval_s=args.retrieval_s),
+            "emotion": FakeEmotion,
+            "tts": lambda: FakeTTS(signals, audio, synth_rtf=args.tts_rtf),
+        },
+        stt=make_stt,
+    )
+    holder["agent"] = agent
+
+    runner = threading.Thread(target=agent.run, daemon=True)
+    runner.start()
+    missing = agent.components.wait(["llm", "memory", "emotion", "tts", "vts"], timeout=30.0)
+    if missing:
+        print(f"[Bench] WARN: not ready: {missing}")
+
+    mem_start = tracemalloc.get_traced_memory()[0]
+    t0 = time.perf_counter()
+    holder["stt"].go.set()
+    holder["stt"].done.wait()
+    wall = time.perf_counter() - t0
+    mem_end, mem_peak = tracemalloc.get_traced_memory()
+
+    agent.stop()
+    runner.join(timeout=10.0)
+    tracemalloc.stop()
+    vts.stop()
+    if stub is not None:
+        stub.stop()
+
+    turns = [t for t in agent.tracer.turns if t.kind == "user"]
+    new_tokens = sum(t.attrs.get("new_tokens") or 0 for t in turns)
+    llm_s = sum(t.spans.get("llm") or 0.0 for t in turns)
+    n = max(1, len(turns))
+    vts_ctrl = agent.components.peek("vts")
+
+    return {
+        "config": vars(args),
+        "stages": agent.tracer.summary(),
+        "throughput": {
+            "turns": len(turns),
+            "wall_s": wall,
+            "turns_per_min": 60.0 * len(turns) / wall if wall > 0 else None,
+            "llm_tokens_per_s": new_tokens / llm_s if llm_s > 0 else None,
+        },
+        "memory": {
+            "start_mb": mem_start / 2 ** 20,
+            "end_mb": mem_end / 2 ** 20,
+            "peak_mb": mem_peak / 2 ** 20,
+            "growth_mb": (mem_end - mem_start) / 2 ** 20,
+            "growth_kb_per_turn": (mem_end - mem_start) / 1024.0 / n,
+            "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+        },
+        "speculation": dict(agent.speculation_counts),
+        "tts": agent.components.peek("tts").stats() if agent.components.peek("tts") else None,
+        "vts": dict(vts_ctrl.stats) if vts_ctrl is not None else None,
+        "mock_vts_requests": dict(vts.counts),
+        "stub_llm_server": dict(stub.counts) if stub is not None else None,
+    }
+
+
+def _lookup(report, path):
+    value = report
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def check_thresholds(report, thresholds):
+    """-> list of failure messages (empty = pass)"""
+    failures = []
+    for path, limit in thresholds.items():
+        value = _lookup(report, path)
+        lo, hi = (limit.get("min"), limit.get("max")) if isinstance(limit, dict) else (None, limit)
+        if value is None:
+            failures.append(f"{path}: missing from report")
+        elif hi is not None and value > hi:
+            failures.append(f"{path}: {value:.4f} > max {hi}")
+        elif lo is not None and value < lo:
+            failures.append(f"{path}: {value:.4f} < min {lo}")
+    return failures
+
+
+def print_report(report):
+    print("\n=== stages (seconds) ===")
+    print(f"{'stage':<24} {'count':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+    for stage, h in sorted(report["stages"].items()):
+        if not h.get("window"):
+            continue
+        print(f"{stage:<24} {h['count']:>6} {h['p50']:>8.4f} {h['p95']:>8.4f} {h['p99']:>8.4f} {h['max']:>8.4f}")
+    tp, mem = report["throughput"], report["memory"]
+    print("\n=== throughput ===")
+    print(f"turns={tp['turns']} wall={tp['wall_s']:.1f}s turns/min={tp['turns_per_min'] or 0:.1f} "
+          f"llm tok/s={tp['llm_tokens_per_s'] or 0:.1f}")
+    print("\n=== memory (tracemalloc) ===")
+    print(f"start={mem['start_mb']:.2f}MB end={mem['end_mb']:.2f}MB peak={mem['peak_mb']:.2f}MB "
+          f"growth={mem['growth_mb']:.3f}MB ({mem['growth_kb_per_turn']:.1f} KB/turn) max_rss={mem['max_rss_mb']:.0f}MB")
+    print(f"\nspeculation={report['speculation']} mock_vts={report['mock_vts_requests']}")
+    if report.get("stub_llm_server"):
+        print(f"stub_llm_server={report['stub_llm_server']}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--script", default=DEFAULT_SCRIPT)
+    ap.add_argument("--repeat", type=int, default=1, help="play the script N times")
+    ap.add_argument("--speed", type=float, default=4.0, help="user speech/pauses time scale (1 = real time)")
+    ap.add_argument("--playback-speed", type=float, default=8.0, help="TTS playback time scale")
+    ap.add_argument("--llm", choices=("fake", "http"), default="fake", help="fake = FakeLLM in process, http = OpenAIChatLLM + stub server")
+    ap.add_argument("--tokens-per-s", type=float, default=40.0)
+    ap.add_argument("--prefill-tokens-per-s", type=float, default=2000.0)
+    ap.add_argument("--reply-tokens", type=int, default=24)
+    ap.add_argument("--retrieval-s", type=float, default=0.02)
+    ap.add_argument("--tts-rtf", type=float, default=0.2, help="fake synthesis real-time factor")
+    ap.add_argument("--vts-latency", type=float, default=0.002)
+    ap.add_argument("--trace-dump", default=None, help="also write the tracer JSON here")
+    ap.add_argument("--json", help="write the report here")
+    ap.add_argument("--thresholds", help="JSON with regression limits, exit 1 if any is exceeded")
+    args = ap.parse_args()
+
+    report = run(args)
+    print_report(report)
+
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, default=str)
+
+    if args.thresholds:
+        with open(args.thresholds, "r", encoding="utf-8") as f:
+            failures = check_thresholds(report, json.load(f))
+        for msg in failures:
+            print(f"[Bench] REGRESSION {msg}")
+        if failures:
+            sys.exit(1)
+        print("[Bench] thresholds OK")
+
+
+if __name__ == "__main__":
+    main()
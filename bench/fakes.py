@@ -0,0 +1,518 @@
+"""
+Stand-ins for the heavy components, so AgentController runs without a GPU,
+microphone, speakers, VTube Studio or an LLM server.
+
+Everything is deterministic (same script -> same texts, same token counts) and
+timed with sleeps, so the controller's own overhead and queueing show up in
+the traces exactly like in a real run.
+
+- ScriptedSTT:   plays a scripted conversation (partials, stable, final, user_talking)
+- FakeLLM:       word = token, configurable prefill and decode tokens/sec, prefix reuse
+- FakeMemory:    short-term list + fake retrieval delay
+- FakeEmotion:   label from a hash of the text
+- FakeTTS:       real BaseTTS queue + AudioOutput, synthesizes a tone at a given RTF
+- FastNullSink:  null sink that "plays" N times faster than real time
+- MockVTSServer: local WebSocket server speaking the VTS plugin API
+- StubChatServer: local OpenAI-compatible /v1/chat/completions (SSE), FakeLLM timing
+"""
+
+import asyncio
+import json
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from tracing import Histogram
+from tts.audio_output import NullSink
+from tts.base_tts import BaseTTS
+
+_VOCAB = (
+    "oh that sounds really nice and I think we could talk about it more later "
+    "honestly I love this kind of question because it makes me wonder what you "
+    "would pick if you had to choose right now"
+).split()
+
+_EMOTIONS = ("anger", "disgust", "fear", "joy", "neutral", "sadness", "surprise")
+
+
+def _seed(text):
+    return zlib.crc32((text or "").encode("utf-8"))
+
+
+class ScriptedSTT:
+    """
+    Script: list of {"text", "talk_s", "finalize_s", "pause_s", "final_text", "wait_reply"}.
+    final_text (optional) differs from what the stable partials said -> speculative rollback.
+    """
+
+    def __init__(self, input_queue, signals, script, speed=1.0, reply_timeout=60.0, busy=None):
+        self.input_queue = input_queue
+        self.signals = signals
+        self.script = list(script)
+        self.speed = max(1e-6, float(speed))
+        self.reply_timeout = float(reply_timeout)
+        self.busy = busy            # callable: True while the agent is still speaking
+        self.ready = threading.Event()
+        self.go = threading.Event()     # the script starts when this is set (after warm-up)
+        self.done = threading.Event()
+        self.active = False
+        self.segment_id = 0
+        self.finalize_latency = Histogram()
+        self.sent = []              # (segment_id, text, final_ts)
+        self._replies = signals.subscribe("bench_stt", maxlen=64, topics=("reply",))
+
+    def _sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds / self.speed)
+
+    def start(self):
+        self.active = True
+        self.ready.set()
+        self.go.wait()
+        for step in self.script:
+            if not self.active:
+                break
+            self._say(step)
+            if step.get("wait_reply", True):
+                self._wait_reply()
+            self._sleep(float(step.get("pause_s", 0.5)))
+        self.done.set()
+
+    def _say(self, step):
+        text = step["text"].strip()
+        words = text.split()
+        talk_s = float(step.get("talk_s", 0.3 * len(words)))
+
+        self.segment_id += 1
+        self.signals.user_talking = True
+        for i in range(1, len(words) + 1):
+            self._sleep(talk_s / len(words))
+            partial = " ".join(words[:i])
+            event = {"segment_id": self.segment_id, "text": partial, "timestamp": time.time()}
+            self.signals.publish("stt_partial", event)
+            if i == len(words) or i % 3 == 0:
+                self.signals.publish("stt_stable", event)
+        self.signals.user_talking = False
+
+        t0 = time.perf_counter()
+        self._sleep(float(step.get("finalize_s", 0.15)))
+        final = (step.get("final_text") or text).strip()
+        self.signals.publish("transcript", {"source": "microphone", "text": final, "segment_id": self.segment_id})
+        self.input_queue.put({
+            "timestamp": time.time(),
+            "source": "microphone",
+            "kind": "final",
+            "segment_id": self.segment_id,
+            "text": final,
+        })
+        self.signals.new_q = True
+        self.finalize_latency.add(time.perf_counter() - t0)
+        self.sent.append((self.segment_id, final, time.time()))
+
+    def _wait_reply(self):
+        if self._replies.get(timeout=self.reply_timeout) is None:
+            print("[Bench] WARN: no reply within timeout")
+            return
+        if self.busy is None:
+            return
+        deadline = time.time() + self.reply_timeout
+        while self.active and self.busy() and time.time() < deadline:
+            self.signals.wait_for(lambda: not self.busy(), timeout=0.05)
+
+    def stats(self):
+        return {
+            "segments": self.segment_id,
+            "audio_s": None,
+            "finalize_latency": self.finalize_latency.summary(),
+            "rtf": {},
+        }
+
+    def stop(self):
+        self.active = False
+        self.go.set()
+        self._replies.close()
+
+
+class FakeLLM:
+    """One whitespace word = one token. Deterministic replies, timed prefill/decode."""
+
+    def __init__(self, tokens_per_s=40.0, prefill_tokens_per_s=2000.0, reply_tokens=24):
+        self.tokens_per_s = float(tokens_per_s)
+        self.prefill_tokens_per_s = float(prefill_tokens_per_s)
+        self.reply_tokens = int(reply_tokens)
+        self.max_tokens = reply_tokens
+        self.last_stats = {}
+        self._kv = {}   # slot -> token prefix, like LlamaWrapper ("chat" = calls with history)
+        self.calls = 0
+
+    def _prompt_ids(self, system_prompt, user_prompt, history=None):
+        turns = " ".join(f"<{m['role']}> {m['content']}" for m in history or [])
+        return f"<sys> {system_prompt or ''} {turns} <user> {user_prompt or ''} <assistant>".split()
+
+    def _reuse(self, ids, slot):
+        prefix = self._kv.pop(slot, [])
+        n = 0
+        limit = min(len(prefix), len(ids) - 1)
+        while n < limit and prefix[n] == ids[n]:
+            n += 1
+        return n
+
+    def prefill(self, system_prompt, user_prompt, history=None):
+        t0 = time.perf_counter()
+        slot = "default" if history is None else "chat"
+        ids = self._prompt_ids(system_prompt, user_prompt, history)
+        reused = self._reuse(ids, slot)
+        time.sleep((len(ids) - 1 - reused) / self.prefill_tokens_per_s)
+        self._kv[slot] = ids[:-1]
+        return {"prompt_tokens": len(ids), "reused_tokens": reused, "prefill_s": time.perf_counter() - t0}
+
+    def generate(self, system_prompt, user_prompt, max_new_tokens=None, temperature=None, top_p=None, on_delta=None, history=None):
+        self.calls += 1
+        t0 = time.perf_counter()
+        slot = "default" if history is None else "chat"
+        ids = self._prompt_ids(system_prompt, user_prompt, history)
+        reused = self._reuse(ids, slot)
+        time.sleep((len(ids) - reused) / self.prefill_tokens_per_s)
+        ttft = time.perf_counter() - t0
+
+        n = min(self.reply_tokens, int(max_new_tokens or self.reply_tokens))
+        seed = _seed(user_prompt)
+        words = [_VOCAB[(seed + i * 7) % len(_VOCAB)] for i in range(n)]
+        for i, w in enumerate(words):
+            if i:
+                time.sleep(1.0 / self.tokens_per_s)
+            if on_delta is not None:
+                on_delta(w if i == 0 else " " + w)
+        total = time.perf_counter() - t0
+
+        self._kv[slot] = ids + words[:-1]
+        decode = total - ttft
+        self.last_stats = {
+            "prompt_tokens": len(ids),
+            "new_tokens": n,
+            "ttft_s": ttft,
+            "decode_s": decode,
+            "total_s": total,
+            "tokens_per_s": (n - 1) / decode if decode > 0 and n > 1 else None,
+            "reused_tokens": reused,
+            "history_messages": len(history or []),
+        }
+        return (" ".join(words).capitalize() + ".") if words else ""
+
+    def warm_up(self, prompt="Hi"):
+        self.generate("", prompt, max_new_tokens=4)
+
+
+class _FakeShort:
+    def __init__(self):
+        self.memory = []
+
+    def add_user_only(self, user_text):
+        entry_id = f"s{len(self.memory)}"
+        self.memory.append({"id": entry_id, "timestamp": time.time(), "user": user_text, "ai": ""})
+        return entry_id
+
+    def set_ai_for_id(self, entry_id, ai_text):
+        for m in self.memory:
+            if m["id"] == entry_id:
+                m["ai"] = ai_text
+                return True
+        return False
+
+
+class _FakeLong:
+    def __init__(self):
+        self.facts = []
+
+    def warm_up(self):
+        pass
+
+
+class FakeMemory:
+    def __init__(self, retrieval_s=0.02, extract_s=0.05):
+        self.retrieval_s = float(retrieval_s)
+        self.extract_s = float(extract_s)
+        self.short = _FakeShort()
+        self.long = _FakeLong()
+
+    def start_turn(self, raw_user_text):
+        return self.short.add_user_only(f"[USER]: {(raw_user_text or '').strip()}")
+
+    def build_prompt_with_context(self, raw_user_text):
+        time.sleep(self.retrieval_s)
+        return f"[USER]: {(raw_user_text or '').strip()}"
+
+    def history_messages(self, max_exchanges=6):
+        """Last completed exchanges (the real one is token bounded, see ShortTermMemory.history)."""
+        messages = []
+        for m in [m for m in self.short.memory if m["ai"]][-max_exchanges:]:
+            messages.append({"role": "user", "content": m["user"][len("[USER]: "):]})
+            messages.append({"role": "assistant", "content": m["ai"]})
+        return messages
+
+    def extract_and_store_facts(self, user_text, ai_text):
+        time.sleep(self.extract_s)
+        if user_text:
+            self.long.facts.append(user_text[:80])
+
+
+class FakeEmotion:
+    def __init__(self, latency_s=0.005):
+        self.latency_s = float(latency_s)
+
+    def predict_label(self, text):
+        time.sleep(self.latency_s)
+        return _EMOTIONS[_seed(text) % len(_EMOTIONS)]
+
+    def warm_up(self):
+        self.predict_label("Hello.")
+
+
+class FastNullSink(NullSink):
+    """Null sink paced at `speed` x real time (1.0 = real time)."""
+
+    def __init__(self, sample_rate, channels, speed=1.0):
+        super().__init__(sample_rate, channels, realtime=True)
+        self.speed = max(1e-6, float(speed))
+
+    def write(self, data):
+        if data:
+            frames = len(data) // (2 * self.channels)
+            time.sleep(frames / float(self.sample_rate) / self.speed)
+
+
+class FakeTTS(BaseTTS):
+    """Tone 'speech': len(text)/chars_per_s seconds of audio, synthesized at synth_rtf."""
+
+    def __init__(self, signals, audio_output, chars_per_s=15.0, synth_rtf=0.2, first_chunk_s=0.05):
+        super().__init__(signals, audio_output=audio_output)
+        self.chars_per_s = float(chars_per_s)
+        self.synth_rtf = float(synth_rtf)
+        self.first_chunk_s = float(first_chunk_s)
+        self.audio_format = (24000, 1, "int16")
+
+    def _synthesize(self, text, emotion_label, on_chunk):
+        rate = self.audio_format[0]
+        duration = max(0.2, len(text) / self.chars_per_s)
+        chunk_s = 0.1
+        time.sleep(self.first_chunk_s)
+        t = 0.0
+        while t < duration and not self._synthesis_cancelled():
+            n = int(rate * chunk_s)
+            x = np.arange(n) / rate + t
+            env = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * x)     # ~syllable rate
+            pcm = (0.3 * env * np.sin(2 * np.pi * 180 * x) * 32767).astype(np.int16).tobytes()
+            time.sleep(chunk_s * self.synth_rtf)
+            on_chunk(pcm)
+            t += chunk_s
+
+    def _cache_identity(self, emotion_label):
+        return ("fake", None, None, None)
+
+
+class MockVTSServer:
+    """
+    VTS plugin API on ws://127.0.0.1:<port>: auth always succeeds, every request is answered
+    (except the first drop_hotkeys hotkey requests: no response, the client times out).
+    kick() closes every client connection (client side reconnect path).
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency_s=0.0, drop_hotkeys=0):
+        self.host = host
+        self.port = int(port)
+        self.latency_s = float(latency_s)
+        self.drop_hotkeys = int(drop_hotkeys)
+        self.counts = {}
+        self.hotkeys = []       # hotkeyIDs in arrival order
+        self._clients = set()
+        self._loop = None
+        self._stop = None
+        self._started = threading.Event()
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._run()), daemon=True)
+        self._thread.start()
+        self._started.wait(timeout=5.0)
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+    def kick(self):
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self._close_clients(), self._loop).result(timeout=5.0)
+
+    async def _close_clients(self):
+        for ws in list(self._clients):
+            await ws.close()
+
+    async def _run(self):
+        import websockets
+
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        async with websockets.serve(self._handle, self.host, self.port) as server:
+            self.port = next(iter(server.sockets)).getsockname()[1]
+            self._started.set()
+            await self._stop.wait()
+
+    async def _handle(self, ws):
+        self._clients.add(ws)
+        try:
+            await self._serve(ws)
+        finally:
+            self._clients.discard(ws)
+
+    async def _serve(self, ws):
+        async for raw in ws:
+            msg = json.loads(raw)
+            kind = msg.get("messageType", "")
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+            if kind == "HotkeyTriggerRequest":
+                self.hotkeys.append((msg.get("data") or {}).get("hotkeyID"))
+                if self.drop_hotkeys > 0:
+                    self.drop_hotkeys -= 1
+                    continue
+            if kind == "AuthenticationTokenRequest":
+                data = {"authenticationToken": "bench-token"}
+            elif kind == "AuthenticationRequest":
+                data = {"authenticated": True}
+            else:
+                data = {}
+            if self.latency_s > 0:
+                await asyncio.sleep(self.latency_s)
+            await ws.send(json.dumps({
+                "apiName": "VTubeStudioPublicAPI",
+                "apiVersion": "1.0",
+                "requestID": msg.get("requestID"),
+                "messageType": kind.replace("Request", "Response"),
+                "data": data,
+            }))
+
+
+class StubChatServer:
+    """
+    OpenAI-compatible chat server on http://127.0.0.1:<port>/v1 for llm_http.OpenAIChatLLM.
+    Replies like FakeLLM (word = token, timed), streamed as chunked SSE over keep-alive
+    connections. fail_first: that many requests get a 503 (retry path).
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, tokens_per_s=40.0, ttft_s=0.05, reply_tokens=24, fail_first=0):
+        self.host = host
+        self.port = int(port)
+        self.tokens_per_s = float(tokens_per_s)
+        self.ttft_s = float(ttft_s)
+        self.reply_tokens = int(reply_tokens)
+        self.fail_first = int(fail_first)
+        self.counts = {"connections": 0, "requests": 0, "failed": 0}
+        self._lock = threading.Lock()
+        self._httpd = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/v1"
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"   # keep-alive
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.counts["connections"] += 1
+
+            def do_GET(self):
+                if self.path.rstrip("/") != "/v1/models":
+                    self.send_error(404)
+                    return
+                self._json(200, {"object": "list", "data": [{"id": "stub-model", "object": "model"}]})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                with stub._lock:
+                    stub.counts["requests"] += 1
+                    fail = stub.counts["requests"] <= stub.fail_first
+                    if fail:
+                        stub.counts["failed"] += 1
+                if self.path.rstrip("/") != "/v1/chat/completions":
+                    self.send_error(404)
+                    return
+                if fail:
+                    self._json(503, {"error": {"message": "stub: unavailable"}})
+                    return
+                stub._reply(self, body)
+
+            def _json(self, status, data):
+                raw = json.dumps(data).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def _reply(self, handler, body):
+        messages = body.get("messages") or [{}]
+        user_prompt = messages[-1].get("content") or ""
+        n = min(self.reply_tokens, int(body.get("max_tokens") or self.reply_tokens))
+        seed = _seed(user_prompt)
+        words = [_VOCAB[(seed + i * 7) % len(_VOCAB)] for i in range(n)]
+        usage = {
+            "prompt_tokens": sum(len((m.get("content") or "").split()) for m in messages),
+            "completion_tokens": n,
+        }
+        time.sleep(self.ttft_s)
+
+        if not body.get("stream"):
+            handler._json(200, {
+                "object": "chat.completion",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            return
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+
+        def send(data):
+            raw = f"data: {data}\n\n".encode("utf-8")
+            handler.wfile.write(f"{len(raw):x}\r\n".encode("ascii") + raw + b"\r\n")
+            handler.wfile.flush()
+
+        for i, w in enumerate(words):
+            if i:
+                time.sleep(1.0 / self.tokens_per_s)
+            send(json.dumps({"object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {"content": w if i == 0 else " " + w}}]}))
+        send(json.dumps({"object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            send(json.dumps({"object": "chat.completion.chunk", "choices": [], "usage": usage}))
+        send("[DONE]")
+        handler.wfile.write(b"0\r\n\r\n")
+        handler.wfile.flush()
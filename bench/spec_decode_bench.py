@@ -0,0 +1,135 @@
+"""
+Speculative decoding check: speed and output distribution, plain vs draft model.
+
+Runs LlamaWrapper unquantized (CPU is fine with small models of one tokenizer family):
+
+    python -m bench.spec_decode_bench
+    python -m bench.spec_decode_bench --model meta-llama/Llama-3.2-3B-Instruct --draft meta-llama/Llama-3.2-1B-Instruct
+
+Speed: the same prompts with and without the draft model, tokens/s, tokens per
+decoding step and draft acceptance rate.
+
+Distribution: speculative sampling must not change what the main model samples.
+The first --dist-tokens tokens of a fixed prompt are sampled --samples times plain,
+plain again (sampling noise baseline) and with the draft; the total variation
+distance plain<->draft has to stay within --max-ratio x the plain<->plain one.
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import Counter
+
+DEFAULT_MODEL = "HuggingFaceTB/SmolLM2-360M-Instruct"
+DEFAULT_DRAFT = "HuggingFaceTB/SmolLM2-135M-Instruct"
+
+PROMPTS = [
+    "Say hi to the chat in one sentence.",
+    "What is your favourite colour and why? Answer briefly.",
+    "Tell me a short joke about cats.",
+    "Count from one to ten in words.",
+]
+SYSTEM_PROMPT = "You are a friendly virtual streamer. Keep answers short."
+
+
+def run_speed(llm, draft, prompts, max_new_tokens, rounds):
+    llm.draft_model = draft
+    tokens = 0
+    seconds = 0.0
+    steps = 0
+    accepted_rates = []
+    for _ in range(rounds):
+        for prompt in prompts:
+            t0 = time.perf_counter()
+            llm.generate(system_prompt=SYSTEM_PROMPT, user_prompt=prompt, max_new_tokens=max_new_tokens)
+            seconds += time.perf_counter() - t0
+            st = llm.last_stats
+            tokens += st["new_tokens"]
+            steps += st.get("decode_steps") or st["new_tokens"]
+            if st.get("acceptance_rate") is not None:
+                accepted_rates.append(st["acceptance_rate"])
+    return {
+        "tokens": tokens,
+        "seconds": seconds,
+        "tokens_per_s": tokens / seconds if seconds > 0 else None,
+        "tokens_per_step": tokens / steps if steps else None,
+        "acceptance_rate": sum(accepted_rates) / len(accepted_rates) if accepted_rates else None,
+    }
+
+
+def sample_heads(llm, draft, prompt, samples, n_tokens, temperature, seed):
+    import torch
+
+    llm.draft_model = draft
+    torch.manual_seed(seed)
+    heads = Counter()   # decoded first n_tokens -> count
+    for _ in range(samples):
+        heads[llm.generate(system_prompt=SYSTEM_PROMPT, user_prompt=prompt, max_new_tokens=n_tokens,
+                           temperature=temperature, top_p=1.0)] += 1
+    return heads
+
+
+def total_variation(a, b):
+    na, nb = sum(a.values()), sum(b.values())
+    return 0.5 * sum(abs(a[k] / na - b[k] / nb) for k in set(a) | set(b))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--model", default=DEFAULT_MODEL)
+    ap.add_argument("--draft", default=DEFAULT_DRAFT)
+    ap.add_argument("--assistant-tokens", type=int, default=5, help="draft tokens per step")
+    ap.add_argument("--max-new-tokens", type=int, default=48)
+    ap.add_argument("--rounds", type=int, default=2, help="speed: passes over the prompts")
+    ap.add_argument("--samples", type=int, default=400, help="distribution: samples per run")
+    ap.add_argument("--dist-tokens", type=int, default=2, help="distribution: leading tokens compared")
+    ap.add_argument("--temperature", type=float, default=1.0)
+    ap.add_argument("--max-ratio", type=float, default=1.5, help="allowed TV(plain, draft) / TV(plain, plain)")
+    ap.add_argument("--json", help="write the full results here")
+    args = ap.parse_args()
+
+    import config
+    config.speculative_decoding_config["num_assistant_tokens"] = args.assistant_tokens
+    from llm_wrapper import LlamaWrapper
+
+    t0 = time.perf_counter()
+    llm = LlamaWrapper(model_name=args.model, draft_model_name=args.draft, load_in_4bit=False)
+    draft = llm.draft_model
+    if draft is None:
+        raise SystemExit(f"Draft model {args.draft} was not loaded (tokenizer mismatch?)")
+    print(f"[Bench] loaded {args.model} + draft {args.draft} in {time.perf_counter() - t0:.1f} s")
+    llm.warm_up()
+
+    speed = {
+        "plain": run_speed(llm, None, PROMPTS, args.max_new_tokens, args.rounds),
+        "draft": run_speed(llm, draft, PROMPTS, args.max_new_tokens, args.rounds),
+    }
+
+    prompt = PROMPTS[0]
+    plain_a = sample_heads(llm, None, prompt, args.samples, args.dist_tokens, args.temperature, seed=1)
+    plain_b = sample_heads(llm, None, prompt, args.samples, args.dist_tokens, args.temperature, seed=2)
+    drafted = sample_heads(llm, draft, prompt, args.samples, args.dist_tokens, args.temperature, seed=3)
+    tv_noise = total_variation(plain_a, plain_b)
+    tv_draft = total_variation(plain_a, drafted)
+    ok = tv_draft <= max(tv_noise * args.max_ratio, 0.02)
+
+    plain, spec = speed["plain"], speed["draft"]
+    print(f"\n{'mode':<8} {'tok/s':>8} {'tok/step':>9} {'accept':>7}")
+    for name, r in speed.items():
+        accept = f"{r['acceptance_rate']:.2f}" if r["acceptance_rate"] is not None else "-"
+        print(f"{name:<8} {r['tokens_per_s']:>8.1f} {r['tokens_per_step']:>9.2f} {accept:>7}")
+    if plain["tokens_per_s"] and spec["tokens_per_s"]:
+        print(f"speedup: {spec['tokens_per_s'] / plain['tokens_per_s']:.2f}x")
+    print(f"distribution ({args.samples} samples, {args.dist_tokens} tokens, T={args.temperature}): "
+          f"TV plain/plain={tv_noise:.3f}, plain/draft={tv_draft:.3f} -> {'OK' if ok else 'FAIL'}")
+
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "speed": speed, "tv_noise": tv_noise, "tv_draft": tv_draft, "ok": ok}, f, indent=2)
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+STT model / compute profile benchmark: WER and real-time factor.
+
+Fixtures: a directory of 16-bit .wav clips, each with a reference transcript
+next to it (clip.wav + clip.txt).
+
+    python -m bench.stt_bench --fixtures data/stt_fixtures
+    python -m bench.stt_bench --fixtures data/stt_fixtures --device cpu --threads 4 --json data/stt_bench.json
+
+Variants are name=model_key:device:compute_type (model_key from config.stt_models).
+The models are run through faster-whisper directly (the same CTranslate2 backend
+RealtimeSTT uses), without VAD, so only the model + compute type is measured.
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+
+import numpy as np
+
+from config import stt_models, stt_config_batch
+from stt_replay import load_clip, FEED_RATE
+
+DEFAULT_VARIANTS = [
+    "tiny_fp16=tiny_fp16:cuda:float16",
+    "base_fp16=base_fp16:cuda:float16",
+    "tiny_int8=tiny_fp32:cpu:int8",
+    "base_int8=base_fp32:cpu:int8",
+    "tiny_fp16_int8=tiny_fp16:cpu:int8",
+    "base_fp16_int8=base_fp16:cpu:int8",
+]
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize(text):
+    """lowercase, punctuation removed (accents kept: ő/ű matter in Hungarian)"""
+    return _WORD.findall((text or "").lower())
+
+
+def edit_distance(ref, hyp):
+    prev = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        cur = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (r != h))
+        prev = cur
+    return prev[-1]
+
+
+def load_fixtures(path):
+    clips = []
+    for name in sorted(os.listdir(path)):
+        if not name.lower().endswith(".wav"):
+            continue
+        ref_path = os.path.join(path, os.path.splitext(name)[0] + ".txt")
+        if not os.path.exists(ref_path):
+            print(f"[Bench] skip {name}: no reference transcript")
+            continue
+        with open(ref_path, "r", encoding="utf-8") as f:
+            reference = f.read().strip()
+        pcm = load_clip(os.path.join(path, name))
+        audio = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+        clips.append({"name": name, "audio": audio, "reference": reference})
+    return clips
+
+
+def parse_variant(spec):
+    name, _, rest = spec.partition("=")
+    model_key, device, compute_type = rest.split(":")
+    return {"name": name, "model_key": model_key, "device": device, "compute_type": compute_type}
+
+
+def run_variant(variant, clips, language, beam_size, threads, warmup):
+    from faster_whisper import WhisperModel
+
+    t0 = time.perf_counter()
+    model = WhisperModel(
+        stt_models[variant["model_key"]],
+        device=variant["device"],
+        compute_type=variant["compute_type"],
+        cpu_threads=threads,
+    )
+    load_s = time.perf_counter() - t0
+
+    def transcribe(audio):
+        segments, _ = model.transcribe(audio, language=language, beam_size=beam_size, vad_filter=False)
+        return " ".join(s.text.strip() for s in segments)  # generator: decoding happens here
+
+    for clip in clips[:warmup]:
+        transcribe(clip["audio"])
+
+    edits = ref_words = 0
+    audio_s = decode_s = 0.0
+    per_clip = []
+    for clip in clips:
+        t0 = time.perf_counter()
+        hyp = transcribe(clip["audio"])
+        dt = time.perf_counter() - t0
+        ref = normalize(clip["reference"])
+        e = edit_distance(ref, normalize(hyp))
+        dur = len(clip["audio"]) / float(FEED_RATE)
+        edits += e
+        ref_words += len(ref)
+        audio_s += dur
+        decode_s += dt
+        per_clip.append({"clip": clip["name"], "wer": e / max(1, len(ref)), "rtf": dt / dur, "hypothesis": hyp})
+
+    return {
+        "variant": variant["name"],
+        "model": variant["model_key"],
+        "device": variant["device"],
+        "compute_type": variant["compute_type"],
+        "load_s": load_s,
+        "wer": edits / max(1, ref_words),
+        "rtf": decode_s / max(1e-9, audio_s),
+        "audio_s": audio_s,
+        "clips": per_clip,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--fixtures", default="data/stt_fixtures")
+    ap.add_argument("--variant", action="append", help="name=model_key:device:compute_type (repeatable)")
+    ap.add_argument("--device", choices=("cpu", "cuda"), help="only run variants on this device")
+    ap.add_argument("--threads", type=int, default=0, help="CPU threads (0 = CTranslate2 default)")
+    ap.add_argument("--beam-size", type=int, default=5)
+    ap.add_argument("--warmup", type=int, default=1, help="clips transcribed before timing")
+    ap.add_argument("--language", default=stt_config_batch["language"])
+    ap.add_argument("--json", help="write the full results here")
+    args = ap.parse_args()
+
+    clips = load_fixtures(args.fixtures)
+    if not clips:
+        raise SystemExit(f"No fixtures (clip.wav + clip.txt) in {args.fixtures}")
+
+    variants = [parse_variant(v) for v in (args.variant or DEFAULT_VARIANTS)]
+    if args.device:
+        variants = [v for v in variants if v["device"] == args.device]
+
+    results = []
+    for v in variants:
+        print(f"[Bench] {v['name']} ({v['model_key']}, {v['device']}/{v['compute_type']})...")
+        try:
+            results.append(run_variant(v, clips, args.language, args.beam_size, args.threads, args.warmup))
+        except Exception as e:
+            print(f"[Bench] {v['name']} failed: {e}")
+            results.append({"variant": v["name"], "error": str(e)})
+
+    total_audio = sum(len(c["audio"]) for c in clips) / float(FEED_RATE)
+    print(f"\n{len(clips)} clips, {total_audio:.1f} s audio")
+    print(f"{'variant':<16} {'device':<6} {'compute':<8} {'load_s':>7} {'WER':>7} {'RTF':>7}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['variant']:<16} ERROR: {r['error']}")
+            continue
+        print(f"{r['variant']:<16} {r['device']:<6} {r['compute_type']:<8} {r['load_s']:>7.2f} {r['wer']:>7.3f} {r['rtf']:>7.3f}")
+
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+Text chat input (live chat stand-in): local TCP socket and/or a tailed file.
+
+One message per line, either JSON ({"author": ..., "text": ...}) or "author: text".
+Live chats can deliver thousands of messages per minute, far more than one LLM
+turn can answer, so messages are filtered before they reach the input queue:
+
+    - empty / overlong messages are dropped / cut
+    - duplicates (same author, or the same text from anyone = spam waves) within dedupe_seconds
+    - per-author token bucket (author_rate msgs/s, author_burst)
+    - global token bucket (global_rate msgs/s, global_burst) bounds what reaches the queue
+
+Whatever piles up during a turn is merged by InputDigest: speech first, then the
+most relevant chat messages (source weight x mention priority x recency), capped
+in count and characters. Everything dropped is counted.
+"""
+
+import json
+import os
+import re
+import socketserver
+import threading
+import time
+from collections import OrderedDict
+
+_WORD_RE = re.compile(r"[^\w\s]+")
+_AUTHOR_RE = re.compile(r"^([\w.\-]{1,40}):\s+(.*)$")
+SPEECH_SOURCES = ("microphone",)
+
+
+def _normalize(text):
+    return " ".join(_WORD_RE.sub(" ", (text or "").lower()).split())
+
+
+def parse_line(line):
+    """(author, text) from a JSON or "author: text" line; author None if there is none."""
+    line = (line or "").strip()
+    if not line:
+        return None, ""
+    if line.startswith("{"):
+        try:
+            data = json.loads(line)
+            return data.get("author"), str(data.get("text") or "")
+        except (ValueError, AttributeError):
+            pass
+    m = _AUTHOR_RE.match(line)
+    if m:
+        return m.group(1), m.group(2)
+    return None, line
+
+
+class _Bucket:
+    def __init__(self, rate, burst, now):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.ts = now
+
+    def take(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.ts) * self.rate)
+        self.ts = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+class ChatFilter:
+    """Dedupe + rate limits. accept() -> None if the message passes, else the drop reason."""
+
+    def __init__(self, author_rate=0.2, author_burst=2, global_rate=5.0, global_burst=20,
+                 dedupe_seconds=30.0, max_authors=10000, max_texts=10000):
+        self.author_rate = float(author_rate)
+        self.author_burst = float(author_burst)
+        self.dedupe_seconds = float(dedupe_seconds)
+        self.max_authors = int(max_authors)
+        self.max_texts = int(max_texts)
+        self._global = _Bucket(global_rate, global_burst, time.monotonic())
+        self._authors = OrderedDict()   # author -> (bucket, last normalized text, ts), LRU
+        self._texts = OrderedDict()     # normalized text -> last seen (any author), oldest first
+
+    def accept(self, author, text, now=None):
+        now = time.monotonic() if now is None else now
+        norm = _normalize(text)
+        if not norm:
+            return "empty"
+
+        state = self._authors.get(author)
+        if state is not None:
+            self._authors.move_to_end(author)
+            bucket, last_norm, last_ts = state
+            if norm == last_norm and now - last_ts < self.dedupe_seconds:
+                return "duplicate"
+        else:
+            bucket = _Bucket(self.author_rate, self.author_burst, now)
+        seen = self._texts.get(norm)
+        if seen is not None and now - seen < self.dedupe_seconds:
+            return "duplicate"
+
+        # rate limits last: a duplicate doesn't use up the author's budget
+        if not bucket.take(now):
+            self._remember(author, bucket, norm, now, state is None)
+            return "author_rate"
+        self._remember(author, bucket, norm, now, state is None)
+        if not self._global.take(now):
+            return "global_rate"
+        self._texts[norm] = now
+        self._texts.move_to_end(norm)
+        while len(self._texts) > self.max_texts:
+            self._texts.popitem(last=False)
+        return None
+
+    def _remember(self, author, bucket, norm, now, new):
+        self._authors[author] = (bucket, norm, now)
+        if new:
+            while len(self._authors) > self.max_authors:
+                self._authors.popitem(last=False)
+
+
+class InputDigest:
+    """
+    Merges a burst of queue items into one user text.
+    Speech: newest utterance is the main text, older ones "also said earlier" (as before).
+    Chat: newest message per author, best max_messages by source weight x priority x
+    recency (half-life), shown oldest first, cut at max_chars.
+    """
+
+    def __init__(self, max_messages=8, max_chars=600, half_life_seconds=15.0, source_weights=None):
+        self.max_messages = int(max_messages)
+        self.max_chars = int(max_chars)
+        self.half_life_seconds = float(half_life_seconds)
+        self.source_weights = dict(source_weights or {})
+        self.stats = {"bursts": 0, "chat_in": 0, "chat_kept": 0, "dropped_author_repeat": 0, "dropped_cap": 0}
+
+    def merge(self, items, now=None):
+        now = time.time() if now is None else now
+        speech = []
+        chat = []
+        for it in items:
+            text = (it.get("text") or "").strip()
+            if not text:
+                continue
+            if (it.get("source") or "microphone") in SPEECH_SOURCES:
+                speech.append(text)
+            else:
+                chat.append(it)
+        self.stats["bursts"] += 1
+
+        parts = []
+        if speech:
+            parts.append(speech[-1])
+            if len(speech) > 1:
+                parts[0] += "\nUser also said earlier: " + " | ".join(speech[:-1])
+        if chat:
+            lines = self._select_chat(chat, now)
+            if lines:
+                parts.append("Chat: " + " | ".join(lines))
+        return "\n".join(parts)
+
+    def _score(self, it, now):
+        age = max(0.0, now - float(it.get("timestamp") or now))
+        weight = self.source_weights.get(it.get("source"), 1.0) * float(it.get("priority") or 1.0)
+        return weight * 0.5 ** (age / self.half_life_seconds) if self.half_life_seconds > 0 else weight
+
+    def _select_chat(self, chat, now):
+        self.stats["chat_in"] += len(chat)
+        newest = OrderedDict()     # author -> (index, item): one message per author, the newest
+        for i, it in enumerate(chat):
+            key = it.get("author") or f"#{i}"
+            newest.pop(key, None)
+            newest[key] = (i, it)
+        self.stats["dropped_author_repeat"] += len(chat) - len(newest)
+
+        ranked = sorted(newest.values(), key=lambda p: (self._score(p[1], now), p[0]), reverse=True)
+        chosen = []
+        used = 0
+        for i, it in ranked[:self.max_messages]:
+            line = f"{it['author']}: {it['text'].strip()}" if it.get("author") else it["text"].strip()
+            if chosen and used + len(line) + 3 > self.max_chars:
+                break
+            chosen.append((i, line[:self.max_chars]))
+            used += len(line) + 3
+        self.stats["chat_kept"] += len(chosen)
+        self.stats["dropped_cap"] += len(newest) - len(chosen)
+        return [line for _, line in sorted(chosen)]
+
+
+class ChatInput:
+    """Socket / file-tail adapter: filtered messages go to the input queue as source "chat"."""
+
+    def __init__(self, input_queue, signals, host="127.0.0.1", port=None, tail_path=None,
+                 max_message_chars=200, mention_keywords=(), mention_priority=2.0,
+                 poll_interval=0.2, **filter_args):
+        self.input_queue = input_queue
+        self.signals = signals
+        self.host = host
+        self.port = port
+        self.tail_path = tail_path
+        self.max_message_chars = int(max_message_chars)
+        self.mention_keywords = [k.lower() for k in (mention_keywords or ()) if k]
+        self.mention_priority = float(mention_priority)
+        self.poll_interval = float(poll_interval)
+        self.filter = ChatFilter(**filter_args)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._server = None
+        self._threads = []
+        self.stats = {"received": 0, "accepted": 0, "empty": 0, "duplicate": 0, "author_rate": 0, "global_rate": 0}
+
+    def start(self):
+        if self.port is not None:
+            self._start_socket()
+        if self.tail_path:
+            t = threading.Thread(target=self._tail, daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, author, text, source="chat"):
+        """Thread-safe. True if the message was queued, False if it was filtered out."""
+        text = (text or "").strip()[:self.max_message_chars]
+        author = (str(author).strip() or None) if author is not None else None
+        with self._lock:
+            self.stats["received"] += 1
+            reason = self.filter.accept(author, text)
+            if reason is not None:
+                self.stats[reason] += 1
+                return False
+            self.stats["accepted"] += 1
+        lowered = text.lower()
+        priority = self.mention_priority if any(k in lowered for k in self.mention_keywords) else 1.0
+        self.input_queue.put({
+            "timestamp": time.time(),
+            "source": source,
+            "kind": "final",
+            "author": author,
+            "priority": priority,
+            "text": text,
+        })
+        self.signals.new_q = True
+        return True
+
+    def submit_line(self, line):
+        author, text = parse_line(line)
+        return self.submit(author, text)
+
+    def stop(self):
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        for t in self._threads:
+            t.join(timeout=1.0)
+        self._threads = []
+
+    # sources
+    def _start_socket(self):
+        adapter = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for raw in self.rfile:
+                    if adapter._stop.is_set():
+                        break
+                    adapter.submit_line(raw.decode("utf-8", errors="replace"))
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self._server = Server((self.host, int(self.port)), Handler)
+        self.port = self._server.server_address[1]
+        t = threading.Thread(target=self._server.serve_forever, daemon=True)
+        t.start()
+        self._threads.append(t)
+        print(f"[ChatInput] listening on {self.host}:{self.port}")
+
+    def _tail(self):
+        """Follows tail_path from its current end (like tail -F: survives truncation / rotation)."""
+        f = None
+        inode = None
+        buf = ""
+        from_start = False      # after a rotation the new file is read from the beginning
+        while not self._stop.is_set():
+            try:
+                st = os.stat(self.tail_path)
+                if f is not None and (st.st_ino != inode or st.st_size < f.tell()):
+                    f.close()   # replaced / truncated: start over
+                    f = None
+                    from_start = True
+                if f is None:
+                    f = open(self.tail_path, "r", encoding="utf-8", errors="replace")
+                    inode = st.st_ino
+                    buf = ""
+                    if not from_start:
+                        f.seek(0, os.SEEK_END)
+                    print(f"[ChatInput] tailing {self.tail_path}")
+                chunk = f.read()
+                if chunk:
+                    buf += chunk
+                    *lines, buf = buf.split("\n")
+                    for line in lines:
+                        self.submit_line(line)
+                    continue
+            except FileNotFoundError:
+                if f is not None:
+                    f.close()
+                    f = None
+                from_start = True
+            except Exception as e:
+                print(f"[ChatInput] ERROR: tail failed: {e}")
+            self._stop.wait(self.poll_interval)
+        if f is not None:
+            f.close()
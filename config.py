@@ -25,14 +25,70 @@ stt_models = {
     "turbo_fp16": "models/whisper-v3-turbo-hu-ct2-fp16"
 }
 
+# compute profile for the whisper models (CTranslate2 / faster-whisper)
+stt_profiles = {
+    "gpu": {
+        "device": "cuda",
+        "compute_type": "auto",
+    },
+    "cpu_int8": {           # no GPU needed, fp16/fp32 CT2 models are quantized to int8 at load time
+        "device": "cpu",
+        "compute_type": "int8",
+        "cpu_threads": 0,   # intra-op threads for the transcription process (0 = physical cores)
+        "batch_model": "base_fp32",     # key of stt_models
+    },
+}
+
+stt_profile = {
+    "name": "gpu",          # key of stt_profiles
+    "warmup_clip": None,    # optional short .wav transcribed (and discarded) before listening starts
+}
+
 stt_mode = {
-    "mode": "batch"
+    "mode": "batch"     # "realtime" | "batch" | "replay" (stt_replay_config, no microphone)
+}
+
+speculative_prefill_config = {
+    "enabled": True,    # stable partial transcript -> retrieval + LLM prefill while the user is still talking
+    "min_words": 3,     # shorter stable partials are ignored
+}
+
+stt_replay_config = {
+    "source": "data/stt_replay",  # dir of .wav/.pcm, playlist (.txt/.m3u), one file, or "-" (raw PCM on stdin)
+    "recorder": "batch",    # which recorder config to feed: "batch" | "realtime"
+    "speed": 1.0,           # 1.0 = real time, 4.0 = 4x faster, 0 = as fast as possible
+    "chunk_ms": 32,
+    "gap_seconds": 1.0,     # silence fed after every clip so the VAD closes the segment
+    "raw_sample_rate": 16000,   # for .pcm/.raw/stdin (int16)
+    "raw_channels": 1,
+    "loop": False,
 }
 
 LLM_models = {
     "base_model": "turboderp/Llama-3-8B-Instruct-exl2",
     "meta_model_inst": "meta-llama/Meta-Llama-3-8B-Instruct",
-    "meta_model": "meta-llama/Meta-Llama-3-8B"
+    "meta_model": "meta-llama/Meta-Llama-3-8B",
+    "draft_model": "meta-llama/Llama-3.2-1B-Instruct",    # same tokenizer as Llama 3 8B (speculative decoding)
+}
+
+llm_backend_config = {
+    "backend": "transformers",  # "transformers" (LlamaWrapper, in process, CUDA) | "openai" (HTTP server, no GPU here)
+    "openai": {
+        "base_url": "http://127.0.0.1:1234/v1",    # any OpenAI-compatible server (LM Studio default)
+        "model": None,              # None = the first model the server lists
+        "api_key": None,
+        "connect_timeout": 3.0,
+        "read_timeout": 60.0,       # between streamed chunks
+        "retries": 2,               # connection errors / timeouts / 429 / 5xx, only before anything was streamed
+        "backoff_seconds": 0.5,     # doubled per retry
+        "pool_size": 4,             # keep-alive connections (replies + fact / summary jobs)
+        "stream": True,             # SSE: reply deltas + time to first token
+    },
+}
+
+speculative_decoding_config = {
+    "enabled": False,           # LlamaWrapper: draft model proposes, the main model verifies (same output distribution)
+    "num_assistant_tokens": 5,  # draft tokens per step (fixed, so the acceptance rate is comparable)
 }
 
 LLM_params = {
@@ -53,6 +109,23 @@ tts_config = {
     # shared
     "output_device_index": None,    # default output
     "enabled": True,    # turn on/off tts engines
+    "policy": "queue",  # back-to-back replies: "queue" | "replace" | "drop_if_busy"
+
+    # shared audio output (one stream per device, all engines feed it)
+    "audio_output": {
+        "sink": "pyaudio",  # "pyaudio" | "null" (headless) | "wav" (headless, writes wav_path)
+        "sample_rate": 24000,
+        "channels": 1,
+        "frames_per_chunk": 1024,
+        "wav_path": "cache/tts/output.wav",
+    },
+
+    # synthesized audio cache (text+engine+voice+speed+emotion -> pcm), shared by all engines
+    "cache": {
+        "enabled": True,
+        "dir": "cache/tts/pcm",
+        "max_mb": 256,  # LRU eviction above this size
+    },
 
     # orpheus
     "orpheus": {
@@ -84,4 +157,134 @@ tts_config = {
         "model_id": "eleven_multilingual_v2",
         "output_format": "wav_24000", # options: wav_16000, wav_22050, wav_24000, wav_32000, wav_44100, wav_48000, wav_8000
     },
-}
\ No newline at end of file
+}
+
+startup_config = {
+    "max_workers": 6,   # components (llm, memory, emotion, tts, vts) load in parallel
+}
+
+warmup_config = {
+    "enabled": True,    # dummy llm/tts/embedding/emotion pass before the main loop
+    "rounds": 2,        # 1st = cold, the rest = warm
+    "llm_prompt": "Hi",
+    "tts_text": "Hello.",
+}
+
+tracing_config = {
+    "enabled": True,    # per-turn stage spans + rolling p50/p95/p99 (cheap, leave on)
+    "window": 1024,     # samples kept per stage
+    "dump_path": "data/traces.json",    # written on shutdown (None = off)
+}
+
+metrics_config = {
+    "enabled": False,   # Prometheus text format on http://host:port/metrics
+    "host": "127.0.0.1",
+    "port": 9108,       # use a different port per character on the same host
+}
+
+web_config = {
+    "enabled": False,   # WebSocket frontend: ws://host:port
+    "host": "127.0.0.1",
+    "port": 8765,
+    "client_queue_size": 256,   # per browser tab, overflow -> that tab is disconnected
+}
+
+vts_config = {
+    "url": "ws://localhost:8001",   # VTube Studio plugin API (point at a mock server for tests)
+    "token_path": "./vtubeStudio_token.txt",
+    "request_timeout": 3.0,
+    "reconnect_min_sec": 0.5,       # exponential backoff between reconnects
+    "reconnect_max_sec": 30.0,
+}
+
+lipsync_config = {
+    "enabled": True,    # mouth parameters from the TTS audio -> VTS (no virtual cable needed)
+    "rate_hz": 30,      # injections per second (30-60)
+    "gate_db": -45.0,   # quieter than this = mouth closed
+    "full_db": -12.0,   # this loud = mouth fully open
+    "attack": 0.6,      # smoothing per frame (0-1, higher = faster)
+    "release": 0.25,
+    "params": {         # feature -> VTS parameter id (None = off)
+        "mouth_open": "MouthOpen",
+        "mouth_form": "MouthSmile",
+        "volume": "VoiceVolume",
+        "frequency": "VoiceFrequency",
+    },
+}
+
+sessions_config = {
+    "max_batch": 8,     # sequences decoded together by the shared GenerationEngine
+    "chroma_path": "data/chroma",       # one Chroma client, one collection per session (ltm_<id>)
+    "lore_path": "data/lore.json",      # default lore, SessionManager.create(lore_path=...) overrides
+    "short_retention_seconds": 300,
+    "queue_size": 64,   # per-session input queue, overflow -> input dropped (counted)
+    "system_prompt": None,  # None = the AgentController persona
+}
+
+process_config = {
+    "enabled": False,   # True = STT, TTS (+ audio output) and the LLM each run in their own process
+    "stages": ["stt", "tts", "llm"],    # which of them (the rest stays in the main process)
+    "start_method": "spawn",    # "spawn" is the only safe choice with CUDA
+    "ready_timeout": 600,       # seconds a stage may take to load its models
+    "stop_timeout": 5.0,        # graceful stop, then terminate()
+    "pcm_ring_seconds": 4.0,    # played TTS audio -> main process (lip-sync) via shared memory
+}
+
+prompt_budget_config = {
+    "max_prefill_tokens": 1024,     # whole prompt: chat template + system prompt + memory context
+    "sections": {       # token cap per memory section, filled in this order (lower = dropped first)
+        "user": 256,
+        "recent": 192,
+        "summary": 160,
+        "lore": 160,
+        "facts": 192,
+    },
+}
+
+chat_history_config = {
+    "enabled": True,        # earlier exchanges go to the LLM as real chat messages (conversation KV is kept)
+    "max_tokens": 768,      # history window, on top of max_prefill_tokens
+    "low_watermark": 0.5,   # on overflow trim down to this fraction (the KV is rebuilt only then)
+}
+
+summary_config = {
+    "enabled": True,        # fold exchanges leaving short-term memory into a rolling summary (idle LLM job)
+    "path": "data/summary.json",    # kept across restarts (None = memory only)
+    "max_tokens": 160,      # summary size cap, it is injected as [SUMMARY]
+    "lead_seconds": 60,     # fold exchanges this long before short-term retention drops them
+    "batch": 4,             # exchanges folded per idle step
+}
+
+autonomous_pool_config = {
+    "enabled": True,        # pre-generate re-engagement lines while idle, silence plays one instantly
+    "size": 3,              # lines kept ready
+    "ttl_seconds": 300,     # older lines are discarded
+    "refill_lead_seconds": 20,  # start filling this long before the silence deadline
+    "similarity": 0.8,      # difflib ratio: a line this close to a recent one is a duplicate
+    "recent_size": 16,      # spoken lines remembered for dedup
+    "clear_on_user_turn": True, # pooled lines were written for the old context
+    "presynthesize": True,  # render the audio into the TTS cache too (needs tts_config["cache"])
+}
+
+chat_input_config = {
+    "enabled": False,       # text chat (live chat stand-in) next to the microphone
+    "host": "127.0.0.1",
+    "port": 8766,           # one message per line: JSON {"author", "text"} or "author: text" (None = no socket)
+    "tail_path": None,      # or follow a file (e.g. a chat log written by a bot)
+    "max_message_chars": 200,
+    "dedupe_seconds": 30,   # same text again (same author, or anyone) within this window is dropped
+    "author_rate": 0.2,     # messages/s per author (token bucket)...
+    "author_burst": 2,      # ...with this burst
+    "global_rate": 5.0,     # messages/s reaching the input queue at all
+    "global_burst": 20,
+    "mention_keywords": [], # e.g. the character's name: those messages rank higher
+    "mention_priority": 2.0,
+}
+
+input_digest_config = {
+    # merging a burst of queued input into one prompt (speech always kept)
+    "max_chat_messages": 8,     # chat messages per prompt (one per author)
+    "max_chat_chars": 600,
+    "half_life_seconds": 15,    # recency weight of a chat message halves every N s
+    "source_weights": {"chat": 1.0},
+}
@@ -1,10 +1,11 @@
-import torch
-from transformers import pipeline
 from config import emotion_config
 
 
 class EmotionDetector:
     def __init__(self):
+        import torch
+        from transformers import pipeline
+
         self.model_name = emotion_config["model_name"]
         self.max_length = emotion_config["max_length"]
 
@@ -32,3 +33,6 @@ class EmotionDetector:
             return "neutral"
         result = self._classifier(text)
         return (result[0].get("label") or "neutral").lower()
+
+    def warm_up(self, text="Hello, nice to see you!"):
+        self.predict_label(text)
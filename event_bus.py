@@ -0,0 +1,142 @@
+"""
+In-process event bus (Signals publishes every state change here).
+
+- many subscribers, each with its own bounded buffer -> memory never grows
+- publish never blocks: safe from audio / STT callback threads
+- overflow policy per subscriber:
+    "drop_oldest": ring buffer, the oldest event is dropped when full
+    "coalesce":    one slot per event name, only the newest value is kept
+                   (ideal for state like ai_talking / emotion_label)
+
+Events are (name, value, ts) tuples.
+"""
+
+import threading
+import time
+from collections import deque, OrderedDict
+
+DROP_OLDEST = "drop_oldest"
+COALESCE = "coalesce"
+
+
+class Subscription:
+    def __init__(self, bus, name, maxlen=256, policy=DROP_OLDEST, topics=None, notify=None):
+        if policy not in (DROP_OLDEST, COALESCE):
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.bus = bus
+        self.name = name
+        self.maxlen = max(1, int(maxlen))
+        self.policy = policy
+        self.topics = None if topics is None else frozenset(topics)
+        self.notify = notify    # optional callable() after each delivery (e.g. wake an asyncio loop)
+
+        self._cv = threading.Condition(threading.Lock())
+        self._buf = deque() if policy == DROP_OLDEST else OrderedDict()
+        self.delivered = 0
+        self.dropped = 0        # lost to overflow
+        self.coalesced = 0      # replaced by a newer value of the same event
+        self.closed = False
+
+    # publisher side (never blocks for long: no IO, no waiting)
+    def _offer(self, event):
+        if self.topics is not None and event[0] not in self.topics:
+            return
+        with self._cv:
+            if self.closed:
+                return
+            if self.policy == DROP_OLDEST:
+                if len(self._buf) >= self.maxlen:
+                    self._buf.popleft()
+                    self.dropped += 1
+                self._buf.append(event)
+            else:
+                key = event[0]
+                if key in self._buf:
+                    del self._buf[key]
+                    self.coalesced += 1
+                elif len(self._buf) >= self.maxlen:
+                    self._buf.popitem(last=False)
+                    self.dropped += 1
+                self._buf[key] = event
+            self.delivered += 1
+            self._cv.notify()
+        if self.notify is not None:
+            try:
+                self.notify()
+            except Exception:
+                pass
+
+    def _pop(self):
+        if self.policy == DROP_OLDEST:
+            return self._buf.popleft()
+        return self._buf.popitem(last=False)[1]
+
+    # consumer side
+    def get(self, timeout=None):
+        """Next event, or None on timeout / close."""
+        with self._cv:
+            if not self._cv.wait_for(lambda: self._buf or self.closed, timeout):
+                return None
+            if not self._buf:
+                return None
+            return self._pop()
+
+    def drain(self, max_items=None):
+        """All buffered events (oldest first) without blocking."""
+        out = []
+        with self._cv:
+            while self._buf and (max_items is None or len(out) < max_items):
+                out.append(self._pop())
+        return out
+
+    def __len__(self):
+        with self._cv:
+            return len(self._buf)
+
+    def close(self):
+        self.bus.unsubscribe(self)
+        with self._cv:
+            self.closed = True
+            self._buf.clear()
+            self._cv.notify_all()
+
+    def stats(self):
+        with self._cv:
+            return {
+                "name": self.name,
+                "policy": self.policy,
+                "buffered": len(self._buf),
+                "maxlen": self.maxlen,
+                "delivered": self.delivered,
+                "dropped": self.dropped,
+                "coalesced": self.coalesced,
+            }
+
+
+class EventBus:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subs = ()         # replaced on (un)subscribe, publish reads it without locking
+        self.published = 0
+
+    def subscribe(self, name, maxlen=256, policy=DROP_OLDEST, topics=None, notify=None):
+        sub = Subscription(self, name, maxlen=maxlen, policy=policy, topics=topics, notify=notify)
+        with self._lock:
+            self._subs = self._subs + (sub,)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subs = tuple(s for s in self._subs if s is not sub)
+
+    def publish(self, name, value, ts=None):
+        event = (name, value, time.time() if ts is None else ts)
+        self.published += 1
+        for sub in self._subs:
+            sub._offer(event)
+
+    def stats(self):
+        return {
+            "published": self.published,
+            "subscribers": [s.stats() for s in self._subs],
+        }
@@ -0,0 +1,361 @@
+"""
+Shared generation engine: continuous batching of decode steps across sessions.
+
+One engine owns the LlamaWrapper's model. Callers (sessions, the fact extractor,
+an AgentController via EngineClient) submit prompts from their own threads;
+a single engine thread runs:
+
+    admit new requests (prefill each one, batch of 1) -> join the running batch
+    one decode step for the WHOLE batch (B sequences x 1 token)
+    finished sequences leave the batch, the rest keep going
+
+so a new request never waits for the others to finish, and aggregate tokens/sec
+grows with the number of concurrent sessions instead of serializing turn by turn.
+
+Everything that touches the model, the tokenizer or the wrapper's template caches
+runs on the engine thread (prompts are encoded on admission; other jobs go through
+call()), since none of them are thread-safe.
+
+The batch KV cache is kept left-padded ([B, heads, L, dim] per layer) with an
+attention mask; it is only re-padded when a sequence joins, and trimmed when
+sequences leave.
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from llm_wrapper import _TimingStreamer
+
+
+_WAKE = object()    # wakes the engine thread for a call() job
+
+
+def _to_legacy(cache):
+    """HF cache object (or legacy tuple) -> tuple of (key, value) per layer"""
+    if hasattr(cache, "to_legacy_cache"):
+        return cache.to_legacy_cache()
+    return tuple(cache)
+
+
+class _Request:
+    def __init__(self, prompt, max_new_tokens, temperature, top_p, on_delta, tokenizer):
+        self.future = Future()
+        self.prompt = prompt        # (system_prompt, user_prompt, history), encoded on admission
+        self.prompt_ids = None
+        self.max_new_tokens = int(max_new_tokens)
+        self.temperature = float(temperature)
+        self.top_p = float(top_p)
+        self.streamer = _TimingStreamer(tokenizer, on_delta)
+        self.generated = []
+        self.next_token = None      # sampled, not yet in the KV cache
+        self.enqueued_at = time.perf_counter()
+        self.admitted_at = None
+
+
+class GenerationEngine:
+    def __init__(self, llm, max_batch=8):
+        self.llm = llm
+        self.model = llm.model
+        self.tokenizer = llm.tokenizer
+        self.max_batch = max(1, int(max_batch))
+
+        eos = getattr(getattr(self.model, "generation_config", None), "eos_token_id", None)
+        eos = eos if isinstance(eos, (list, tuple)) else [eos]
+        self.eos_ids = {int(e) for e in list(eos) + [self.tokenizer.eos_token_id] if e is not None}
+
+        self._pending = queue.Queue()
+        self._jobs = deque()        # (fn, args, kwargs, future) for call()
+        self._active = []           # row i of the batch == self._active[i]
+        self._keys = None           # per layer [B, heads, L, dim]
+        self._values = None
+        self._mask = None           # [B, L] (0 = left padding)
+        self._positions = None      # [B] position of each row's next token
+
+        self._running = False
+        self._thread = None
+        self.stats = {
+            "requests": 0, "completed": 0, "failed": 0,
+            "steps": 0, "tokens": 0, "batch_rows": 0, "max_batch_seen": 0, "busy_s": 0.0,
+        }
+
+    # Public API
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return self
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        self._pending.put(None)
+
+    def submit(self, system_prompt, user_prompt, max_new_tokens=None, temperature=None, top_p=None, on_delta=None, history=None):
+        """Thread-safe. Returns a Future -> reply text (future.stats has the timings)."""
+        req = _Request(
+            (system_prompt, user_prompt, list(history or [])),
+            self.llm.max_tokens if max_new_tokens is None else max_new_tokens,
+            self.llm.temperature if temperature is None else temperature,
+            self.llm.top_p if top_p is None else top_p,
+            on_delta,
+            self.tokenizer,
+        )
+        self.stats["requests"] += 1
+        self._pending.put(req)
+        return req.future
+
+    def call(self, fn, *args, **kwargs):
+        """Thread-safe. Runs fn(*args, **kwargs) on the engine thread, returns a Future -> result."""
+        fut = Future()
+        self._jobs.append((fn, args, kwargs, fut))
+        self._pending.put(_WAKE)
+        return fut
+
+    def prompt_overhead(self, system_prompt):
+        """llm.prompt_overhead on the engine thread (it fills the template cache)."""
+        return self.call(self.llm.prompt_overhead, system_prompt).result()
+
+    def client(self):
+        return EngineClient(self)
+
+    def summary(self):
+        st = dict(self.stats)
+        st["active"] = len(self._active)
+        st["pending"] = self._pending.qsize()
+        st["avg_batch"] = st["batch_rows"] / st["steps"] if st["steps"] else None
+        st["tokens_per_s"] = st["tokens"] / st["busy_s"] if st["busy_s"] > 0 else None
+        return st
+
+    # Engine thread
+    def _loop(self):
+        import torch
+
+        while self._running:
+            self._run_jobs()
+            self._admit(block=not self._active)
+            if not self._active:
+                continue
+            t0 = time.perf_counter()
+            try:
+                with torch.no_grad():
+                    self._decode_step()
+            except Exception as e:
+                print(f"[GenerationEngine] ERROR: decode step failed: {e}")
+                self._fail_all(e)
+            self.stats["busy_s"] += time.perf_counter() - t0
+
+    def _admit(self, block):
+        import torch
+
+        while len(self._active) < self.max_batch:
+            try:
+                req = self._pending.get(timeout=0.5) if block else self._pending.get_nowait()
+            except queue.Empty:
+                return
+            if req is None:     # stop()
+                return
+            block = False
+            if req is _WAKE:
+                self._run_jobs()
+                continue
+            t0 = time.perf_counter()
+            try:
+                with torch.no_grad():
+                    self._prefill(req)
+            except Exception as e:
+                print(f"[GenerationEngine] ERROR: prefill failed: {e}")
+                self.stats["failed"] += 1
+                req.future.set_exception(e)
+            self.stats["busy_s"] += time.perf_counter() - t0
+
+    def _run_jobs(self):
+        while self._jobs:
+            fn, args, kwargs, fut = self._jobs.popleft()
+            try:
+                fut.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                fut.set_exception(e)
+
+    def _prefill(self, req):
+        import torch
+
+        req.admitted_at = time.perf_counter()
+        # tokenized here, not in submit(): the template caches and the fast tokenizer are not thread-safe
+        req.prompt_ids = self.llm._encode_prompt(*req.prompt)
+        ids = torch.tensor([req.prompt_ids], device=self.model.device)
+        req.streamer.put(ids)   # prompt (starts the TTFT clock)
+        out = self.model(input_ids=ids, use_cache=True)
+        layers = _to_legacy(out.past_key_values)
+        token = self._sample(out.logits[:, -1, :], [req.temperature], [req.top_p])
+        self._join(req, layers, ids.shape[1])
+        if self._emit(req, int(token[0])):
+            self._leave([len(self._active) - 1])
+
+    def _join(self, req, layers, length):
+        import torch
+        import torch.nn.functional as F
+
+        dev = self.model.device
+        new_mask = torch.ones((1, length), dtype=torch.long, device=dev)
+        new_pos = torch.tensor([length], dtype=torch.long, device=dev)
+        if self._keys is None:
+            self._keys = [k for k, _ in layers]
+            self._values = [v for _, v in layers]
+            self._mask, self._positions = new_mask, new_pos
+        else:
+            cur = self._mask.shape[1]
+            total = max(cur, length)
+            pad_old, pad_new = total - cur, total - length
+            self._keys = [
+                torch.cat([F.pad(k, (0, 0, pad_old, 0)), F.pad(nk, (0, 0, pad_new, 0))], dim=0)
+                for k, (nk, _) in zip(self._keys, layers)
+            ]
+            self._values = [
+                torch.cat([F.pad(v, (0, 0, pad_old, 0)), F.pad(nv, (0, 0, pad_new, 0))], dim=0)
+                for v, (_, nv) in zip(self._values, layers)
+            ]
+            self._mask = torch.cat([F.pad(self._mask, (pad_old, 0)), F.pad(new_mask, (pad_new, 0))], dim=0)
+            self._positions = torch.cat([self._positions, new_pos])
+        self._active.append(req)
+
+    def _decode_step(self):
+        import torch
+        from transformers import DynamicCache
+
+        batch = len(self._active)
+        dev = self.model.device
+        input_ids = torch.tensor([[r.next_token] for r in self._active], dtype=torch.long, device=dev)
+        mask = torch.cat([self._mask, torch.ones((batch, 1), dtype=torch.long, device=dev)], dim=1)
+        cache = DynamicCache.from_legacy_cache(tuple(zip(self._keys, self._values)))
+
+        out = self.model(
+            input_ids=input_ids,
+            attention_mask=mask,
+            position_ids=self._positions[:, None],
+            past_key_values=cache,
+            use_cache=True,
+        )
+        layers = _to_legacy(out.past_key_values)
+        self._keys = [k for k, _ in layers]
+        self._values = [v for _, v in layers]
+        self._mask = mask
+        self._positions = self._positions + 1
+
+        tokens = self._sample(
+            out.logits[:, -1, :],
+            [r.temperature for r in self._active],
+            [r.top_p for r in self._active],
+        ).tolist()
+
+        self.stats["steps"] += 1
+        self.stats["batch_rows"] += batch
+        self.stats["max_batch_seen"] = max(self.stats["max_batch_seen"], batch)
+
+        finished = [i for i, (r, t) in enumerate(zip(self._active, tokens)) if self._emit(r, t)]
+        if finished:
+            self._leave(finished)
+
+    def _emit(self, req, token):
+        """Record one sampled token. True if the request is done."""
+        import torch
+
+        if token in self.eos_ids:
+            self._finish(req)
+            return True
+        req.generated.append(token)
+        req.next_token = token
+        req.streamer.put(torch.tensor([token]))
+        self.stats["tokens"] += 1
+        if len(req.generated) >= req.max_new_tokens:
+            self._finish(req)
+            return True
+        return False
+
+    def _leave(self, rows):
+        import torch
+
+        gone = set(rows)
+        keep = [i for i in range(len(self._active)) if i not in gone]
+        self._active = [self._active[i] for i in keep]
+        if not self._active:
+            self._keys = self._values = self._mask = self._positions = None
+            return
+        keep = torch.tensor(keep, device=self._mask.device)
+        self._keys = [k.index_select(0, keep) for k in self._keys]
+        self._values = [v.index_select(0, keep) for v in self._values]
+        self._mask = self._mask.index_select(0, keep)
+        self._positions = self._positions.index_select(0, keep)
+
+        # drop left columns that are padding for every remaining row
+        first = int(self._mask.any(dim=0).long().argmax())
+        if first > 0:
+            self._keys = [k[:, :, first:] for k in self._keys]
+            self._values = [v[:, :, first:] for v in self._values]
+            self._mask = self._mask[:, first:]
+
+    def _sample(self, logits, temperatures, top_ps):
+        """Per-row temperature / top-p sampling (temperature <= 0 -> greedy)."""
+        import torch
+
+        logits = logits.float()
+        temps = torch.tensor(temperatures, device=logits.device, dtype=torch.float32)
+        top_p = torch.tensor(top_ps, device=logits.device, dtype=torch.float32)
+        greedy = logits.argmax(dim=-1)
+
+        probs = torch.softmax(logits / temps.clamp(min=1e-5)[:, None], dim=-1)
+        sorted_probs, order = probs.sort(dim=-1, descending=True)
+        cut = (sorted_probs.cumsum(dim=-1) - sorted_probs) > top_p[:, None]
+        sorted_probs = sorted_probs.masked_fill(cut, 0.0)
+        sorted_probs = sorted_probs / sorted_probs.sum(dim=-1, keepdim=True)
+        sampled = order.gather(1, torch.multinomial(sorted_probs, 1)).squeeze(1)
+
+        return torch.where(temps > 0, sampled, greedy)
+
+    def _finish(self, req):
+        total = time.perf_counter() - req.streamer.t0
+        s = req.streamer
+        ttft = (s.first_token_at - s.t0) if s.first_token_at is not None else None
+        decode = (total - ttft) if ttft is not None else None
+        n = len(req.generated)
+        req.future.stats = {
+            "prompt_tokens": len(req.prompt_ids),
+            "new_tokens": n,
+            "ttft_s": ttft,
+            "decode_s": decode,
+            "total_s": total,
+            "tokens_per_s": (n - 1) / decode if decode and n > 1 else None,
+            "queue_wait_s": (req.admitted_at or req.enqueued_at) - req.enqueued_at,
+        }
+        text = self.tokenizer.decode(req.generated, skip_special_tokens=True).strip()
+        self.stats["completed"] += 1
+        req.future.set_result(text)
+
+    def _fail_all(self, error):
+        for req in self._active:
+            if not req.future.done():
+                self.stats["failed"] += 1
+                req.future.set_exception(error)
+        self._active = []
+        self._keys = self._values = self._mask = self._positions = None
+
+
+class EngineClient:
+    """LlamaWrapper-compatible handle (generate / last_stats / warm_up) on a shared engine."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.max_tokens = engine.llm.max_tokens
+        self.last_stats = {}
+
+    def generate(self, system_prompt, user_prompt, max_new_tokens=None, temperature=None, top_p=None, on_delta=None, history=None):
+        fut = self.engine.submit(system_prompt, user_prompt, max_new_tokens, temperature, top_p, on_delta, history)
+        text = fut.result()
+        self.last_stats = getattr(fut, "stats", {})
+        return text
+
+    def warm_up(self, prompt="Hi"):
+        self.generate(system_prompt="", user_prompt=prompt, max_new_tokens=4)
@@ -0,0 +1,175 @@
+"""
+Audio-driven lip-sync for VTube Studio.
+
+LipSync listens to the shared AudioOutput (see tts/audio_output.py): every chunk
+that is actually written to the device is cut into frames of 1/rate_hz seconds,
+and each frame gets a timestamp of when it becomes audible. Per frame:
+
+- RMS level (dB, noise gate)     -> MouthOpen / VoiceVolume (attack/release smoothed)
+- spectral centroid (brightness) -> MouthSmile (front vowels i/e are wider) / VoiceFrequency
+- zero-crossing rate             -> fricatives (s, f, sh) close the mouth a bit
+
+The VTS controller calls sample() at rate_hz and injects whatever frame is due
+now, so the mouth follows playback time, not synthesis time.
+"""
+
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+DEFAULT_PARAMS = {
+    "mouth_open": "MouthOpen",
+    "mouth_form": "MouthSmile",
+    "volume": "VoiceVolume",
+    "frequency": "VoiceFrequency",
+}
+
+
+class LipSync:
+    def __init__(
+        self,
+        rate_hz=30,
+        gate_db=-45.0,
+        full_db=-12.0,
+        attack=0.6,
+        release=0.25,
+        params=None,
+        max_frames=512,
+    ):
+        self.rate_hz = max(1, int(rate_hz))
+        self.gate_db = float(gate_db)
+        self.full_db = float(full_db)
+        self.attack = float(attack)
+        self.release = float(release)
+
+        # feature -> VTS parameter id (None = don't inject)
+        self.params = dict(DEFAULT_PARAMS)
+        if params:
+            self.params.update(params)
+
+        self.sample_rate = 24000
+        self.channels = 1
+
+        self._lock = threading.Lock()
+        self._frames = deque(maxlen=int(max_frames))    # (play_ts, values), play_ts ascending
+        self._carry = np.zeros(0, dtype=np.float32)     # samples of an unfinished frame
+        self._carry_ts = None
+        self._open = 0.0
+        self._last_values = None
+        self._last_ts = 0.0
+
+        self.stats = {"frames": 0, "sampled": 0, "skipped": 0}
+
+    @property
+    def hop(self):
+        return max(1, self.sample_rate // self.rate_hz)
+
+    def attach(self, audio_output):
+        """Analyse everything played on this AudioOutput."""
+        self.sample_rate = audio_output.sample_rate
+        self.channels = audio_output.channels
+        audio_output.add_listener(self)
+
+# AudioOutput listener (writer thread)
+    def on_chunk(self, pcm, play_start):
+        samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+        if self.channels > 1:
+            samples = samples[: (len(samples) // self.channels) * self.channels]
+            samples = samples.reshape(-1, self.channels).mean(axis=1)
+
+        hop = self.hop
+        frame_dur = hop / float(self.sample_rate)
+
+        # continue the unfinished frame only if this chunk follows it directly
+        if self._carry_ts is not None and len(self._carry):
+            expected = self._carry_ts + len(self._carry) / float(self.sample_rate)
+            if abs(expected - play_start) < frame_dur:
+                samples = np.concatenate([self._carry, samples])
+                play_start = self._carry_ts
+
+        n_full = len(samples) // hop
+        frames = []
+        for i in range(n_full):
+            frame = samples[i * hop:(i + 1) * hop]
+            frames.append((play_start + i * frame_dur, self._analyse(frame)))
+
+        self._carry = samples[n_full * hop:]
+        self._carry_ts = play_start + n_full * frame_dur
+
+        if frames:
+            with self._lock:
+                self._frames.extend(frames)
+            self.stats["frames"] += len(frames)
+
+    def on_stop(self):
+        self._carry = np.zeros(0, dtype=np.float32)
+        self._carry_ts = None
+        self._open = 0.0
+        with self._lock:
+            self._frames.append((time.monotonic(), self._rest_values()))
+
+# VTS side
+    def sample(self, now=None):
+        """
+        Values of the newest frame that is audible by `now`, or None if nothing changed.
+        Frames that were passed over (sender too slow) are skipped, never replayed.
+        """
+        now = time.monotonic() if now is None else now
+        due = None
+        with self._lock:
+            while self._frames and self._frames[0][0] <= now:
+                if due is not None:
+                    self.stats["skipped"] += 1
+                due = self._frames.popleft()
+
+        if due is None:
+            # audio stalled mid-utterance (synthesis slower than realtime): close the mouth
+            stale = now - self._last_ts > 3.0 / self.rate_hz
+            if stale and self._last_values and any(self._last_values.values()):
+                due = (now, self._rest_values())
+            else:
+                return None
+
+        self._last_ts, self._last_values = due[0], due[1]
+        self.stats["sampled"] += 1
+        return self._last_values
+
+# Features
+    def _analyse(self, frame):
+        rms = float(np.sqrt(np.mean(frame * frame) + 1e-12))
+        db = 20.0 * np.log10(rms + 1e-9)
+        level = min(1.0, max(0.0, (db - self.gate_db) / (self.full_db - self.gate_db)))
+
+        # zero-crossing rate: high + quiet = fricative
+        zcr = float(np.mean(np.abs(np.diff(np.signbit(frame).astype(np.int8))))) if len(frame) > 1 else 0.0
+
+        # spectral centroid (Hz)
+        spectrum = np.abs(np.fft.rfft(frame * np.hanning(len(frame))))
+        total = float(spectrum.sum())
+        if total > 1e-9:
+            freqs = np.fft.rfftfreq(len(frame), 1.0 / self.sample_rate)
+            centroid = float((freqs * spectrum).sum() / total)
+        else:
+            centroid = 0.0
+
+        target = level
+        if zcr > 0.25:
+            target *= 0.5
+        coeff = self.attack if target > self._open else self.release
+        self._open += (target - self._open) * coeff
+
+        form = min(1.0, max(0.0, (centroid - 800.0) / 2200.0)) if level > 0 else 0.0
+        return self._map({
+            "mouth_open": round(self._open, 3),
+            "mouth_form": round(form, 3),
+            "volume": round(level, 3),
+            "frequency": round(min(1.0, centroid / 4000.0), 3),
+        })
+
+    def _rest_values(self):
+        return self._map({"mouth_open": 0.0, "mouth_form": 0.0, "volume": 0.0, "frequency": 0.0})
+
+    def _map(self, features):
+        return {self.params[k]: v for k, v in features.items() if self.params.get(k)}
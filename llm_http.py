@@ -0,0 +1,173 @@
+"""
+LLM behind an OpenAI-compatible /v1/chat/completions server (LM Studio, llama.cpp
+server, vLLM, ...): the agent runs without a GPU in process.
+
+Same interface as LlamaWrapper (generate with on_delta / history, last_stats,
+warm_up, prompt_overhead). One requests.Session keeps the connections alive
+(pooled), so a turn doesn't pay a TCP handshake. Replies are streamed (SSE):
+on_delta and time-to-first-token work like in process. A failed request
+(connection error, timeout, 429 / 5xx) is retried with exponential backoff, as
+long as nothing was streamed from it yet.
+"""
+
+import json
+import time
+
+from config import LLM_params, llm_backend_config
+
+_RETRY_STATUS = (429, 500, 502, 503, 504)
+_CHARS_PER_TOKEN = 4    # no tokenizer in process: token counts are estimated
+_TEMPLATE_TOKENS = 16   # chat template around system + user message (estimate)
+
+
+class _RetryableStatus(Exception):
+    pass
+
+
+class OpenAIChatLLM:
+    def __init__(self, base_url=None, model=None, api_key=None, connect_timeout=None, read_timeout=None,
+                 retries=None, backoff_seconds=None, pool_size=None, stream=None):
+        """Arguments default to llm_backend_config["openai"]."""
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        cfg = llm_backend_config.get("openai", {}) or {}
+        self.base_url = (base_url or cfg.get("base_url", "http://127.0.0.1:1234/v1")).rstrip("/")
+        self.connect_timeout = float(connect_timeout if connect_timeout is not None else cfg.get("connect_timeout", 3.0))
+        self.read_timeout = float(read_timeout if read_timeout is not None else cfg.get("read_timeout", 60.0))
+        self.retries = int(retries if retries is not None else cfg.get("retries", 2))
+        self.backoff_seconds = float(backoff_seconds if backoff_seconds is not None else cfg.get("backoff_seconds", 0.5))
+        self.stream = bool(stream if stream is not None else cfg.get("stream", True))
+
+        self.max_tokens = LLM_params["max_tokens"]
+        self.temperature = LLM_params["temperature"]
+        self.top_p = LLM_params["top_p"]
+        self.tokenizer = None   # prompt budget falls back to estimates
+        self.last_stats = {}
+
+        self._requests = requests
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=int(pool_size or cfg.get("pool_size", 4)), max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        api_key = api_key if api_key is not None else cfg.get("api_key")
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+
+        self.model = model or cfg.get("model") or self._first_model()
+        print(f"[OpenAIChatLLM] {self.base_url} model={self.model} (stream={self.stream})")
+
+    def _first_model(self):
+        """No model configured: take the one the server has loaded."""
+        try:
+            resp = self.session.get(self.base_url + "/models", timeout=(self.connect_timeout, self.read_timeout))
+            resp.raise_for_status()
+            models = resp.json().get("data") or []
+        except Exception as e:
+            raise RuntimeError(f"LLM server not reachable at {self.base_url}: {e}")
+        if not models:
+            raise RuntimeError(f"LLM server at {self.base_url} has no model loaded")
+        return models[0]["id"]
+
+    @staticmethod
+    def _messages(system_prompt, user_prompt, history=None):
+        messages = []
+        if (system_prompt or "").strip():
+            messages.append({"role": "system", "content": system_prompt.strip()})
+        messages.extend({"role": m["role"], "content": m["content"]} for m in history or [])
+        messages.append({"role": "user", "content": (user_prompt or "").strip()})
+        return messages
+
+    def prompt_overhead(self, system_prompt):
+        """Estimated tokens of template + system prompt (see LlamaWrapper.prompt_overhead)."""
+        return -(-len((system_prompt or "").strip()) // _CHARS_PER_TOKEN) + _TEMPLATE_TOKENS
+
+    def generate(self, system_prompt, user_prompt, max_new_tokens=None, temperature=None, top_p=None, on_delta=None, history=None):
+        payload = {
+            "model": self.model,
+            "messages": self._messages(system_prompt, user_prompt, history),
+            "max_tokens": self.max_tokens if max_new_tokens is None else int(max_new_tokens),
+            "temperature": self.temperature if temperature is None else float(temperature),
+            "top_p": self.top_p if top_p is None else float(top_p),
+            "stream": self.stream,
+        }
+        if self.stream:
+            payload["stream_options"] = {"include_usage": True}
+
+        attempt = 0
+        while True:
+            state = {"t0": time.perf_counter(), "first": None, "chunks": 0, "parts": [], "usage": None}
+            try:
+                self._post(payload, on_delta, state)
+                break
+            except (self._requests.ConnectionError, self._requests.Timeout, _RetryableStatus) as e:
+                if state["chunks"] or attempt >= self.retries:
+                    raise RuntimeError(f"LLM request failed after {attempt + 1} attempt(s): {e}")
+                delay = self.backoff_seconds * (2 ** attempt)
+                attempt += 1
+                print(f"[OpenAIChatLLM] WARN: {e}, retry {attempt}/{self.retries} in {delay:.1f} s")
+                time.sleep(delay)
+
+        total = time.perf_counter() - state["t0"]
+        usage = state["usage"] or {}
+        new_tokens = usage.get("completion_tokens") or state["chunks"]
+        ttft = (state["first"] - state["t0"]) if state["first"] is not None else None
+        decode = (total - ttft) if ttft is not None else None
+        self.last_stats = {
+            "prompt_tokens": usage.get("prompt_tokens"),
+            "new_tokens": int(new_tokens),
+            "ttft_s": ttft,     # prefill + network
+            "decode_s": decode,
+            "total_s": total,
+            "tokens_per_s": (new_tokens - 1) / decode if decode and new_tokens > 1 else None,
+            "reused_tokens": None,  # prompt caching happens in the server
+            "history_messages": len(history or []),
+            "retries": attempt,
+        }
+        return "".join(state["parts"]).strip()
+
+    def _post(self, payload, on_delta, state):
+        url = self.base_url + "/chat/completions"
+        with self.session.post(url, json=payload, stream=self.stream, timeout=(self.connect_timeout, self.read_timeout)) as resp:
+            if resp.status_code in _RETRY_STATUS:
+                raise _RetryableStatus(f"HTTP {resp.status_code}")
+            if resp.status_code >= 400:
+                raise RuntimeError(f"LLM server HTTP {resp.status_code}: {resp.text[:200]}")
+            if not self.stream:
+                data = resp.json()
+                state["usage"] = data.get("usage")
+                self._on_text(((data.get("choices") or [{}])[0].get("message") or {}).get("content"), on_delta, state)
+                return
+            # SSE: "data: {json}" lines, "data: [DONE]" at the end; read to the end so the connection is reused
+            for line in resp.iter_lines():
+                if not line.startswith(b"data:"):
+                    continue
+                data = line[5:].strip()
+                if data == b"[DONE]":
+                    continue
+                event = json.loads(data)
+                if event.get("usage"):
+                    state["usage"] = event["usage"]
+                for choice in event.get("choices") or []:
+                    self._on_text((choice.get("delta") or {}).get("content"), on_delta, state)
+
+    @staticmethod
+    def _on_text(text, on_delta, state):
+        if not text:
+            return
+        if state["first"] is None:
+            state["first"] = time.perf_counter()
+        state["chunks"] += 1
+        state["parts"].append(text)
+        if on_delta is not None:
+            try:
+                on_delta(text)
+            except Exception as e:
+                print(f"[OpenAIChatLLM] ERROR in on_delta: {e}")
+
+    def warm_up(self, prompt="Hi"):
+        """Tiny generation: opens the pooled connection, makes the server load the model."""
+        self.generate(system_prompt="", user_prompt=prompt, max_new_tokens=4)
+
+    def stop(self):
+        self.session.close()
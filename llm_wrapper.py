@@ -1,44 +1,174 @@
-import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig
-from config import LLM_models, LLM_params
+import time
+from config import LLM_models, LLM_params, prompt_budget_config, speculative_decoding_config, llm_backend_config
+
+
+def build_llm():
+    """LLM backend from llm_backend_config: "transformers" (this class, in process) or "openai" (HTTP server)."""
+    backend = (llm_backend_config.get("backend") or "transformers").strip().lower()
+    if backend == "transformers":
+        return LlamaWrapper()
+    if backend == "openai":
+        from llm_http import OpenAIChatLLM
+        return OpenAIChatLLM()
+    raise ValueError(f"Unknown LLM backend: {backend}")
+
+
+class _TimingStreamer:
+    """
+    HF generate() streamer: generate() calls put() once with the prompt, then once per
+    decoding step (one token, or the accepted draft tokens + 1 with a draft model).
+    Gives time-to-first-token, token / step counts, and (only if on_delta is set)
+    incremental text deltas.
+    """
+
+    def __init__(self, tokenizer=None, on_delta=None):
+        self.t0 = time.perf_counter()
+        self.first_token_at = None
+        self.new_tokens = 0
+        self.step_tokens = []   # tokens per decoding step
+        self._prompt_seen = False
+        self._tokenizer = tokenizer
+        self._on_delta = on_delta
+        self._ids = []
+        self._emitted = ""
+
+    def put(self, value):
+        if not self._prompt_seen:
+            self._prompt_seen = True
+            return
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        n = int(value.numel()) if hasattr(value, "numel") else 1
+        self.new_tokens += n
+        self.step_tokens.append(n)
+        if self._on_delta is not None:
+            self._ids.extend(value.reshape(-1).tolist())
+            self._emit_delta()
+
+    def _emit_delta(self):
+        text = self._tokenizer.decode(self._ids, skip_special_tokens=True)
+        if text.endswith("\ufffd"):
+            return  # incomplete multi-byte char, wait for the next token
+        delta = text[len(self._emitted):]
+        if delta:
+            self._emitted = text
+            try:
+                self._on_delta(delta)
+            except Exception as e:
+                print(f"[LlamaWrapper] ERROR in on_delta: {e}")
+
+    def end(self):
+        pass
 
 
 class LlamaWrapper:
-    def __init__(self):
-        self.model_name = LLM_models["meta_model"]
+    def __init__(self, model_name=None, draft_model_name=None, load_in_4bit=True):
+        """
+        Defaults come from config.py. model_name / draft_model_name / load_in_4bit=False
+        run small models on CPU (bench/spec_decode_bench.py).
+        """
+        # heavy imports here, not at module import (startup runs components in parallel)
+        import torch
+        from transformers import AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig
+
+        self.model_name = model_name or LLM_models["meta_model"]
         self.max_tokens = LLM_params["max_tokens"]
         self.temperature = LLM_params["temperature"]
         self.top_p = LLM_params["top_p"]
 
         # compute_dtype = torch.bfloat16 if torch.cuda.is_available() else torch.float16
         compute_dtype = torch.bfloat16 # cuda test
-        quant_config = BitsAndBytesConfig(
-            load_in_4bit=True,
-            bnb_4bit_quant_type="nf4",
-            bnb_4bit_use_double_quant=True,
-            bnb_4bit_compute_dtype=compute_dtype,
-        )
+        load_args = {}
+        if load_in_4bit:
+            quant_config = BitsAndBytesConfig(
+                load_in_4bit=True,
+                bnb_4bit_quant_type="nf4",
+                bnb_4bit_use_double_quant=True,
+                bnb_4bit_compute_dtype=compute_dtype,
+            )
+            load_args = {"device_map": "auto", "quantization_config": quant_config, "torch_dtype": compute_dtype}
 
         self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
         
-        self.model = AutoModelForCausalLM.from_pretrained(
-            self.model_name,
-            device_map="auto",
-            quantization_config=quant_config,
-            torch_dtype=compute_dtype
-        )
+        self.model = AutoModelForCausalLM.from_pretrained(self.model_name, **load_args)
         self.model.eval()
 
+        # optional draft model: speculative (assisted) decoding, the main model verifies
+        # num_assistant_tokens draft tokens per forward pass. Sampling stays exact
+        # (rejection sampling), the reply distribution is the main model's.
+        self.draft_model = None
+        self.num_assistant_tokens = int(speculative_decoding_config.get("num_assistant_tokens", 5))
+        if draft_model_name is None and speculative_decoding_config.get("enabled", False):
+            draft_model_name = LLM_models.get("draft_model")
+        if draft_model_name:
+            draft_args = {}
+            if load_in_4bit:    # small enough unquantized, just same device + dtype as the main model
+                draft_args = {"device_map": "auto", "torch_dtype": compute_dtype}
+            self.draft_model = self._load_draft(draft_model_name, draft_args)
+
+        # timings of the last generate() call (read by the tracer / metrics)
+        self.last_stats = {}
+
+        # KV cache of the last prompt (+ reply) and the token ids it covers, per slot:
+        # "chat" = the running conversation (calls with history), "default" = everything else
+        # (fact extraction, warm-up), so side jobs never evict the conversation KV.
+        # The next prefill()/generate() of a slot reuses the longest common token prefix.
+        self._kv = {}   # slot -> (ids, cache)
+
+        # tokenized chat template around the user message, per system prompt (see _encode_prompt)
+        self._template_cache = {}
+        self._history_template = (None, None)   # (key, ids) of the last history prompt
+        self.max_prefill_tokens = int(prompt_budget_config.get("max_prefill_tokens", 1024))
+
+
+    def _load_draft(self, name, load_args):
+        """Draft model sharing the main tokenizer's vocabulary (else None: plain decoding)."""
+        from transformers import AutoTokenizer, AutoModelForCausalLM
+
+        problem = self._draft_vocab_mismatch(AutoTokenizer.from_pretrained(name))
+        if problem:
+            print(f"[LlamaWrapper] WARN: draft model {name} has a different tokenizer ({problem}), speculative decoding off")
+            return None
+        draft = AutoModelForCausalLM.from_pretrained(name, **load_args)
+        draft.eval()
+        # fixed draft length: acceptance rate = accepted / drafted stays measurable
+        draft.generation_config.num_assistant_tokens = self.num_assistant_tokens
+        draft.generation_config.num_assistant_tokens_schedule = "constant"
+        print(f"[LlamaWrapper] speculative decoding: draft {name}, {self.num_assistant_tokens} tokens per step")
+        return draft
+
+    def _draft_vocab_mismatch(self, draft_tokenizer):
+        """
+        None if draft token ids mean the same as the main model's, else what differs.
+        Same vocab size + same regular (non added / special) tokens is enough: releases
+        of one family rename reserved special tokens (Llama 3 vs 3.1+), and those never
+        come out of the draft as regular text anyway.
+        """
+        if len(draft_tokenizer) != len(self.tokenizer):
+            return f"vocab size {len(draft_tokenizer)} vs {len(self.tokenizer)}"
+
+        def regular(tok):
+            added = set(tok.get_added_vocab()) | set(tok.all_special_tokens)
+            return {t: i for t, i in tok.get_vocab().items() if t not in added}
+
+        main, draft = regular(self.tokenizer), regular(draft_tokenizer)
+        differing = sorted(set(main.items()) ^ set(draft.items()), key=lambda p: p[1])
+        if not differing:
+            return None
+        shown = ", ".join(f"{t!r}={i}" for t, i in differing[:5])
+        return f"{len(differing)} regular tokens differ: {shown}"
 
     # HF AutoTokenizer chat template builder, this might be temporary
-    def _build_chat_prompt(self, system_prompt, user_prompt):
+    def _build_chat_prompt(self, system_prompt, user_prompt, history=None):
         system_prompt = (system_prompt or "").strip()
         user_prompt = (user_prompt or "").strip()
+        history = history or []
 
         if hasattr(self.tokenizer, "apply_chat_template"):
             messages = []
             if system_prompt:
                 messages.append({"role": "system", "content": system_prompt})
+            messages.extend({"role": m["role"], "content": m["content"]} for m in history)
             messages.append({"role": "user", "content": user_prompt})
 
             return self.tokenizer.apply_chat_template(
@@ -47,32 +177,185 @@ class LlamaWrapper:
                 add_generation_prompt=True
             )
 
+        turns = "".join(f"{'User' if m['role'] == 'user' else 'Assistant'}: {m['content']}\n" for m in history)
         if system_prompt:
-            return f"System: {system_prompt}\nUser: {user_prompt}\nAssistant:"
-        return f"User: {user_prompt}\nAssistant:"
+            return f"System: {system_prompt}\n{turns}User: {user_prompt}\nAssistant:"
+        return f"{turns}User: {user_prompt}\nAssistant:"
+
+
+    _USER_SLOT = "\u2063USER\u2063"   # placeholder, never tokenized
+
+    def _template_ids(self, system_prompt, history=None):
+        """
+        (head_ids, tail_ids) of the chat prompt around the user message. Cached per
+        system prompt; with history only the last one is kept (prefill + generate of a turn).
+        """
+        system_prompt = (system_prompt or "").strip()
+        if not history:
+            hit = self._template_cache.get(system_prompt)
+            if hit is None:
+                hit = self._split_template(system_prompt, None)
+                self._template_cache[system_prompt] = hit
+            return hit
+        key = (system_prompt, tuple((m["role"], m["content"]) for m in history))
+        if self._history_template[0] != key:
+            self._history_template = (key, self._split_template(system_prompt, history))
+        return self._history_template[1]
+
+    def _split_template(self, system_prompt, history):
+        head, tail = self._build_chat_prompt(system_prompt, self._USER_SLOT, history).split(self._USER_SLOT)
+        return (
+            self.tokenizer(head)["input_ids"],  # + BOS, like tokenizing the whole prompt
+            self.tokenizer(tail, add_special_tokens=False)["input_ids"],
+        )
+
+    def prompt_overhead(self, system_prompt):
+        """Tokens the template + system prompt take (the memory prompt budget subtracts these)."""
+        head, tail = self._template_ids(system_prompt)
+        return len(head) + len(tail)
 
+    def _encode_prompt(self, system_prompt, user_prompt, history=None):
+        """
+        Prompt token ids: only the user text is tokenized per call, the template is cached.
+        Hard cap at max_prefill_tokens for the template + user message (the end of the user
+        text is cut; memory puts the lowest priority context last). The history window
+        comes on top of that, it has its own token bound (ShortTermMemory.history).
+        """
+        head, tail = self._template_ids(system_prompt, history)
+        user_ids = self.tokenizer((user_prompt or "").strip(), add_special_tokens=False)["input_ids"]
+        room = self.max_prefill_tokens - self.prompt_overhead(system_prompt)
+        if room > 0 and len(user_ids) > room:
+            user_ids = user_ids[:room]
+        return head + user_ids + tail
 
-    def generate(self, system_prompt, user_prompt, max_new_tokens=None, temperature=None, top_p=None):
-            prompt = self._build_chat_prompt(system_prompt, user_prompt)
+    # Prefix KV cache
+    def _take_prefix(self, ids, slot="default"):
+        """
+        Cached KV of a slot cropped to the longest common prefix with `ids` (at least one
+        token of `ids` is left to compute). Returns (cache, reused_tokens); the cache is handed over.
+        A conversation only differs from the last turn at its end, unless the history
+        window was trimmed: then the prefix ends at the system prompt and it is rebuilt.
+        """
+        cached_ids, cache = self._kv.pop(slot, ([], None))
+        if cache is None or not hasattr(cache, "crop"):
+            return None, 0
+        n = 0
+        limit = min(len(cached_ids), len(ids) - 1)
+        while n < limit and cached_ids[n] == ids[n]:
+            n += 1
+        if n == 0:
+            return None, 0
+        cache.crop(n)
+        return cache, n
 
+    def prefill(self, system_prompt, user_prompt, history=None):
+        """
+        Compute the KV cache of a prompt ahead of generate() (e.g. from a stable partial
+        transcript while the user is still talking). A later generate() with the same
+        prompt only computes the last token; a different prompt reuses the common prefix.
+        """
+        import torch
+
+        t0 = time.perf_counter()
+        slot = "default" if history is None else "chat"
+        ids = torch.tensor([self._encode_prompt(system_prompt, user_prompt, history)], device=self.model.device)
+        cache, reused = self._take_prefix(ids[0].tolist(), slot)
+        if ids.shape[1] - 1 > reused:
+            if cache is None:
+                from transformers import DynamicCache
+                cache = DynamicCache()
+            with torch.no_grad():
+                self.model(input_ids=ids[:, reused:-1], past_key_values=cache, use_cache=True)
+        self._kv[slot] = (ids[0, :-1].tolist(), cache)
+        return {
+            "prompt_tokens": int(ids.shape[1]),
+            "reused_tokens": reused,
+            "prefill_s": time.perf_counter() - t0,
+        }
+
+    def generate(self, system_prompt, user_prompt, max_new_tokens=None, temperature=None, top_p=None, on_delta=None, history=None):
+            """
+            history: earlier chat messages [{"role": "user" | "assistant", "content": ...}] (oldest
+            first). Calls with a history share the conversation KV: only what was appended since
+            the last turn is prefilled.
+            """
             max_new_tokens = self.max_tokens if max_new_tokens is None else int(max_new_tokens)
             temperature = self.temperature if temperature is None else float(temperature)
             top_p = self.top_p if top_p is None else float(top_p)
 
-            inputs = self.tokenizer(prompt, return_tensors="pt")
-            inputs = {k: v.to(self.model.device) for k, v in inputs.items()}
-            input_len = inputs["input_ids"].shape[1]
+            import torch
+
+            slot = "default" if history is None else "chat"
+            ids = torch.tensor([self._encode_prompt(system_prompt, user_prompt, history)], device=self.model.device)
+            inputs = {"input_ids": ids, "attention_mask": torch.ones_like(ids)}
+            input_len = ids.shape[1]
+
+            cache, reused = self._take_prefix(inputs["input_ids"][0].tolist(), slot)
+            extra = {"past_key_values": cache} if cache is not None else {}
+            if self.draft_model is not None:
+                extra["assistant_model"] = self.draft_model
+            # temperature <= 0 -> greedy (same as GenerationEngine)
+            sampling = {"do_sample": True, "temperature": temperature, "top_p": top_p} if temperature > 0 else {"do_sample": False}
 
+            streamer = _TimingStreamer(self.tokenizer, on_delta)
             with torch.no_grad():
                 output = self.model.generate(
                     **inputs,
+                    **extra,
                     max_new_tokens=max_new_tokens,
-                    do_sample=True, # set temper, top_p
-                    temperature=temperature,
-                    top_p=top_p,
+                    **sampling,
                     eos_token_id=self.tokenizer.eos_token_id,
+                    streamer=streamer,
+                    return_dict_in_generate=True,
                 )
+            total = time.perf_counter() - streamer.t0
 
-            new_tokens = output[0][input_len:] # only new tokens -> cut out the prompt
+            sequence = output.sequences[0]
+            # keep the KV for the next call (it covers every token except the last one)
+            if output.past_key_values is not None:
+                covered = output.past_key_values.get_seq_length()
+                self._kv[slot] = (sequence[:covered].tolist(), output.past_key_values)
+
+            new_tokens = sequence[input_len:] # only new tokens -> cut out the prompt
             text = self.tokenizer.decode(new_tokens, skip_special_tokens=True)
-            return text.strip()
\ No newline at end of file
+            self._set_last_stats(streamer, input_len, len(new_tokens), total)
+            self.last_stats["reused_tokens"] = reused
+            self.last_stats["history_messages"] = len(history or [])
+            if self.draft_model is not None:
+                self._set_draft_stats(streamer, len(new_tokens), max_new_tokens)
+            return text.strip()
+
+    def _set_last_stats(self, streamer, prompt_tokens, new_tokens, total):
+        ttft = (streamer.first_token_at - streamer.t0) if streamer.first_token_at is not None else None
+        decode = (total - ttft) if ttft is not None else None
+        self.last_stats = {
+            "prompt_tokens": int(prompt_tokens),
+            "new_tokens": int(new_tokens),
+            "ttft_s": ttft,     # ~ prefill time
+            "decode_s": decode,
+            "total_s": total,
+            "tokens_per_s": (new_tokens - 1) / decode if decode and new_tokens > 1 else None,
+        }
+
+    def _set_draft_stats(self, streamer, new_tokens, max_new_tokens):
+        """
+        Every step yields the accepted draft tokens + 1 from the main model. Drafted per
+        step: num_assistant_tokens, capped by what was left of max_new_tokens.
+        """
+        steps = len(streamer.step_tokens)
+        drafted = 0
+        produced = 0
+        for n in streamer.step_tokens:
+            drafted += max(0, min(self.num_assistant_tokens, max_new_tokens - produced - 1))
+            produced += n
+        accepted = max(0, new_tokens - steps)
+        self.last_stats.update({
+            "speculative": True,
+            "decode_steps": steps,
+            "tokens_per_step": new_tokens / steps if steps else None,
+            "acceptance_rate": min(1.0, accepted / drafted) if drafted else None,
+        })
+
+    def warm_up(self, prompt="Hi"):
+        """Tiny generation: compiles CUDA kernels + allocates the KV cache before the first real turn."""
+        self.generate(system_prompt="", user_prompt=prompt, max_new_tokens=4)
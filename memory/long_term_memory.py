@@ -1,12 +1,32 @@
 import hashlib
-import chromadb
-from sentence_transformers import SentenceTransformer
+import threading
+
+# one embedder / chroma client per process, shared by every session's collection
+_SHARED = {}
+_SHARED_LOCK = threading.Lock()
+
+
+def _shared(key, factory):
+    with _SHARED_LOCK:
+        if key not in _SHARED:
+            _SHARED[key] = factory()
+        return _SHARED[key]
+
 
 class LongTermMemory:
-    def __init__(self, db_path="data/chroma", collection_name="long_term_memory"):
-        self.client = chromadb.PersistentClient(path=db_path)
+    def __init__(self, db_path="data/chroma", collection_name="long_term_memory", embedder_name="all-MiniLM-L6-v2"):
+        import chromadb
+        from sentence_transformers import SentenceTransformer
+
+        self.client = _shared(("chroma", db_path), lambda: chromadb.PersistentClient(path=db_path))
         self.collection = self.client.get_or_create_collection(collection_name)
-        self.embedder = SentenceTransformer("all-MiniLM-L6-v2")
+        self.embedder = _shared(("embedder", embedder_name), lambda: SentenceTransformer(embedder_name))
+
+    def warm_up(self, text="warm up"):
+        """Embedding pass + one query, so the first retrieval is not the cold one."""
+        embedding = self.embedder.encode([text])[0].tolist()
+        if self.collection.count() > 0:
+            self.collection.query(query_embeddings=[embedding], n_results=1, include=["documents"])
 
     def _stable_id(self, text):
         return hashlib.sha256(text.encode("utf-8")).hexdigest()
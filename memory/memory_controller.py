@@ -2,6 +2,8 @@ from .lore_memory import LoreMemory
 from .short_term_memory import ShortTermMemory
 from .long_term_memory import LongTermMemory
 from .facts_extractor import FactExtractor
+from .prompt_budget import PromptBudget
+from .rolling_summary import RollingSummary
 
 class MemoryController:
     def __init__(
@@ -11,11 +13,37 @@ class MemoryController:
             chroma_path="data/chroma",
             chroma_collection="long_term_memory",
             short_retention_seconds=300,
+            max_prompt_tokens=1024,
+            section_budgets=None,
+            tokenizer=None,
+            reserved_tokens=0,
+            history_tokens=0,
+            history_low_watermark=0.5,
+            summary_tokens=0,
+            summary_path=None,
+            summary_lead_seconds=60,
+            summary_batch=4,
         ):
         self.lore = LoreMemory(path=lore_path)
         self.short = ShortTermMemory(short_retention_seconds)
         self.long = LongTermMemory(db_path=chroma_path, collection_name=chroma_collection)
         self.extractor = FactExtractor(generate_callable)
+        # token caps per section (tokenizer may be attached later, see PromptBudget.set_tokenizer)
+        self.budget = PromptBudget(
+            max_tokens=max_prompt_tokens,
+            sections=section_budgets,
+            tokenizer=tokenizer,
+            reserved_tokens=reserved_tokens,
+        )
+        # multi-turn chat history (0 = off, single [USER] message per turn)
+        self.history_tokens = int(history_tokens)
+        self.history_low_watermark = float(history_low_watermark)
+        # rolling summary of exchanges leaving short-term memory (0 = off, they are just forgotten)
+        self.summary = None
+        if summary_tokens > 0:
+            self.summary = RollingSummary(generate_callable, self.budget, path=summary_path, max_tokens=summary_tokens)
+        self.summary_lead_seconds = float(summary_lead_seconds)
+        self.summary_batch = int(summary_batch)
 
     def start_turn(self, raw_user_text): # save user prompt to short-term m. first
         raw_user_text = (raw_user_text or "").strip()
@@ -23,6 +51,27 @@ class MemoryController:
         entry_id = self.short.add_user_only(tagged_user) # ai tag empty
         return entry_id
 
+    def summary_due(self):
+        return self.summary is not None and bool(self.short.expiring(self.summary_lead_seconds, limit=1))
+
+    def summarize_expiring(self):
+        """Idle job: fold up to summary_batch expiring exchanges into the rolling summary."""
+        if self.summary is None:
+            return False
+        entries = self.short.expiring(self.summary_lead_seconds, limit=self.summary_batch)
+        if not entries:
+            return False
+        try:
+            return self.summary.fold([(m["user"], m["ai"]) for m in entries])
+        finally:
+            self.short.mark_summarized(entries)  # even on failure: never retry the same batch forever
+
+    def history_messages(self):
+        """Token-bounded chat history (oldest first) for LlamaWrapper.generate(history=...)."""
+        if self.history_tokens <= 0:
+            return []
+        return self.short.history(self.history_tokens, self.budget.count, self.history_low_watermark)
+
     def build_prompt_with_context(
         self,
         raw_user_text,
@@ -35,17 +84,19 @@ class MemoryController:
         short_threshold=70
     ):
         raw_user_text = (raw_user_text or "").strip()
-        parts = []
+        sections = {}
 
         # USER (always present)
-        parts.append(f"[USER]: {raw_user_text}")
+        sections["user"] = ("[USER]: ", raw_user_text)
+
+        # SUMMARY (rolling, everything that already left short-term memory)
+        if self.summary is not None and self.summary.text:
+            sections["summary"] = ("[SUMMARY]: ", self.summary.text)
 
         # LORE (fuzzy)
         lore_hits = self.lore.search(raw_user_text, threshold=lore_threshold, topk=lore_topk)
         if lore_hits:
-            lore_text = ". ".join([x.strip() for x in lore_hits if x and x.strip()])
-            if lore_text:
-                parts.append(f"[LORE]: {lore_text}")
+            sections["lore"] = ("[LORE]: ", lore_hits)
 
         # RECENT (short-term, exclude newest incomplete)
         short_hit = self.short.search(
@@ -53,11 +104,13 @@ class MemoryController:
             threshold=short_threshold,
             exclude_incomplete_latest=True
         )
+        if short_hit and self.history_tokens > 0 and self.short.in_history(short_hit):
+            short_hit = None  # already in the chat history
         if short_hit: # single hit
             recent_user = short_hit.get("user", "").strip()
             recent_ai = short_hit.get("ai", "").strip()
             if recent_user or recent_ai:
-                parts.append(f"[RECENT]:\nUser: {recent_user}\nAssistant: {recent_ai}")
+                sections["recent"] = ("[RECENT]:\n", f"User: {recent_user}\nAssistant: {recent_ai}")
 
         # FACT (long-term, embedding search)
         long_hits = self.long.search_with_thresholds(
@@ -68,11 +121,10 @@ class MemoryController:
             fallback_topk=long_fallback_topk,
         )
         if long_hits:
-            fact_text = ". ".join([x.strip() for x in long_hits if x and x.strip()])
-            if fact_text:
-                parts.append(f"[FACT]: {fact_text}")
+            sections["facts"] = ("[FACT]: ", long_hits)
 
-        return "\n".join(parts)
+        # token budgets: lower priority sections are truncated / dropped first
+        return self.budget.assemble(sections)
     
     # def finalize_turn_and_update_memories(self, short_id, raw_user_text, ai_text):
     #     """
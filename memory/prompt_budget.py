@@ -0,0 +1,142 @@
+"""
+Token-budgeted prompt assembly for MemoryController.
+
+Every section ([USER], [SUMMARY], [LORE], [RECENT], [FACT]) gets a token cap, and the whole
+context gets one limit (max prefill tokens minus the chat template + system prompt,
+see LlamaWrapper.prompt_overhead). Sections are filled in priority order; whatever
+no longer fits is truncated (text sections) or dropped entry by entry, lowest
+ranked first (lore / fact lists). Prompt size, and with it prefill latency, stays
+bounded no matter how much memory matches.
+
+Lore entries and facts come back turn after turn, so their token ids are cached
+(LRU). Without a tokenizer (e.g. the LLM runs in another process) token counts
+are estimated from the text length.
+"""
+
+from collections import OrderedDict
+
+CHARS_PER_TOKEN = 4     # estimate when no tokenizer is attached
+
+DEFAULT_SECTIONS = OrderedDict([    # filled in this order (= priority)
+    ("user", 256),
+    ("recent", 192),
+    ("summary", 160),
+    ("lore", 160),
+    ("facts", 192),
+])
+
+
+class PromptBudget:
+    def __init__(self, max_tokens=1024, sections=None, tokenizer=None, reserved_tokens=0, cache_size=4096):
+        self.max_tokens = int(max_tokens)
+        self.sections = OrderedDict(sections or DEFAULT_SECTIONS)
+        self.tokenizer = tokenizer
+        self.reserved_tokens = int(reserved_tokens)
+        self.cache_size = int(cache_size)
+        self._ids = OrderedDict()   # text -> token ids (LRU)
+        self.stats = {"hits": 0, "misses": 0, "truncated": 0, "dropped": 0}
+        self.last_report = {}
+
+    def set_tokenizer(self, tokenizer, reserved_tokens=None):
+        self.tokenizer = tokenizer
+        if reserved_tokens is not None:
+            self.reserved_tokens = int(reserved_tokens)
+        self._ids.clear()
+
+    @property
+    def available(self):
+        """Tokens left for the context sections."""
+        return max(0, self.max_tokens - self.reserved_tokens)
+
+    # tokens
+    def encode(self, text):
+        """Token ids (cached), None without a tokenizer."""
+        if self.tokenizer is None:
+            return None
+        ids = self._ids.get(text)
+        if ids is not None:
+            self._ids.move_to_end(text)
+            self.stats["hits"] += 1
+            return ids
+        self.stats["misses"] += 1
+        ids = self.tokenizer(text, add_special_tokens=False)["input_ids"]
+        self._ids[text] = ids
+        if len(self._ids) > self.cache_size:
+            self._ids.popitem(last=False)
+        return ids
+
+    def count(self, text):
+        if not text:
+            return 0
+        ids = self.encode(text)
+        if ids is None:
+            return -(-len(text) // CHARS_PER_TOKEN)
+        return len(ids)
+
+    def truncate(self, text, max_tokens):
+        """Longest head of `text` within max_tokens ("" if nothing fits)."""
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+        self.stats["truncated"] += 1
+        ids = self.encode(text)
+        if ids is None:
+            head = text[:max_tokens * CHARS_PER_TOKEN]
+            cut = head.rfind(" ")
+            return (head[:cut] if cut > 0 else head).rstrip()
+        return self.tokenizer.decode(ids[:max_tokens], skip_special_tokens=True).rstrip()
+
+    # assembly
+    def assemble(self, sections, order=None):
+        """
+        sections: {name: (header, body)} where body is a str (truncated to fit) or a
+        ranked list of entries (kept whole, best first, joined with ". ").
+        Returns the prompt, sections in `order` (default: as given), empty ones left out.
+        """
+        remaining = self.available
+        rendered = {}
+        report = {"available": remaining, "sections": {}}
+        for name in list(self.sections) + [n for n in sections if n not in self.sections]:
+            if name not in sections:
+                continue
+            header, body = sections[name]
+            cap = min(self.sections.get(name, remaining), remaining)
+            room = cap - self.count(header) - 1    # newline between sections
+            if isinstance(body, str):
+                text = self.truncate(body.strip(), room)
+                kept = 1 if text else 0
+                dropped = 0 if text else 1
+            else:
+                entries = [e.strip() for e in body if e and e.strip()]
+                kept_entries = []
+                used = 0
+                for i, entry in enumerate(entries):
+                    cost = self.count(entry) + (1 if kept_entries else 0)
+                    if used + cost <= room:
+                        kept_entries.append(entry)
+                        used += cost
+                    elif not kept_entries:
+                        # best entry alone is too long: keep its head rather than nothing
+                        head = self.truncate(entry, room)
+                        if head:
+                            kept_entries.append(head)
+                            used = room
+                        break
+                    else:
+                        break
+                text = ". ".join(kept_entries)
+                kept = len(kept_entries)
+                dropped = len(entries) - kept
+            self.stats["dropped"] += dropped
+            if not text:
+                report["sections"][name] = {"tokens": 0, "kept": 0, "dropped": dropped}
+                continue
+            rendered[name] = f"{header}{text}"
+            used_tokens = self.count(header) + self.count(text) + 1
+            remaining -= used_tokens
+            report["sections"][name] = {"tokens": used_tokens, "kept": kept, "dropped": dropped}
+
+        report["used"] = report["available"] - remaining
+        self.last_report = report
+        return "\n".join(rendered[n] for n in (order or sections) if n in rendered)
@@ -0,0 +1,96 @@
+import json
+import os
+import re
+import time
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You maintain a running summary of a conversation between a user and a virtual character.\n"
+    "Rules:\n"
+    "- Output ONLY the updated summary as plain text, no headings, no markdown.\n"
+    "- Keep names, facts about the user, promises, running jokes and open topics.\n"
+    "- Drop greetings, small talk and anything already resolved.\n"
+    "- Older details may be compressed further to stay within the length limit.\n"
+)
+
+SUMMARY_USER_PROMPT = (
+    "Current summary:\n{summary}\n\n"
+    "Older conversation turns to fold in:\n\n"
+    "{conversation}\n\n"
+    "Write the updated summary in at most {words} words."
+)
+
+_USER_TAG_RE = re.compile(r"^\s*\[USER\]\s*:\s*", flags=re.I)
+
+
+class RollingSummary:
+    """
+    Bounded summary of the conversation that already left short-term memory.
+    fold() merges a few exchanges into it with one LLM call (run when idle),
+    the result is cut to max_tokens, so its prompt cost stays constant.
+    """
+
+    def __init__(self, generate_callable, budget, path=None, max_tokens=160):
+        if not callable(generate_callable):
+            raise ValueError("generate_callable must be callable(system_prompt, user_prompt, **kwargs) -> str")
+        self.gen = generate_callable
+        self.budget = budget            # PromptBudget (token count / truncate)
+        self.path = path                # None = in memory only
+        self.max_tokens = int(max_tokens)
+        self.text = ""
+        self.updated_at = None
+        self.folded = 0                 # exchanges folded in so far
+        self._load()
+
+    def fold(self, exchanges, temperature=0.3, top_p=0.9):
+        """exchanges: [(user_text, ai_text)], oldest first. Returns True if the summary changed."""
+        lines = []
+        for user_text, ai_text in exchanges:
+            u = _USER_TAG_RE.sub("", user_text or "").strip()
+            a = (ai_text or "").strip()
+            if u:
+                lines.append(f"User: {u}")
+            if a:
+                lines.append(f"Assistant: {a}")
+        if not lines:
+            return False
+
+        raw = self.gen(
+            system_prompt=SUMMARY_SYSTEM_PROMPT,
+            user_prompt=SUMMARY_USER_PROMPT.format(
+                summary=self.text or "(empty)",
+                conversation="\n".join(lines),
+                words=max(10, int(self.max_tokens * 0.75)),
+            ),
+            max_new_tokens=int(self.max_tokens * 1.5),
+            temperature=temperature,
+            top_p=top_p,
+        )
+        text = self.budget.truncate((raw or "").strip(), self.max_tokens)
+        if not text:
+            return False
+        self.text = text
+        self.updated_at = time.time()
+        self.folded += len(exchanges)
+        self._save()
+        return True
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.text = data.get("text", "")
+            self.updated_at = data.get("updated_at")
+            self.folded = int(data.get("folded", 0))
+        except Exception as e:
+            print(f"[RollingSummary] WARN: could not load {self.path}: {e}")
+
+    def _save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"text": self.text, "updated_at": self.updated_at, "folded": self.folded}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
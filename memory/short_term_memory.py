@@ -1,12 +1,25 @@
 import time
 import uuid
+from collections import deque
 from rapidfuzz import fuzz
 
+_USER_TAG = "[USER]: "
+_EXCHANGE_OVERHEAD = 10     # chat template tokens around one user + assistant message pair
+
+
 class ShortTermMemory:
     def __init__(self, retention_seconds=300):
         self.memory = []
         self.retention = retention_seconds
 
+        # chat history window: completed exchanges with timestamp >= _window_start
+        self._window_start = None
+        self._window_expired = False    # cleanup() dropped an exchange that was in the window
+        self.history_trims = 0
+
+        # completed exchanges dropped by cleanup() before the rolling summary folded them in
+        self.expired = deque(maxlen=64)
+
     def add_user_only(self, user_text):
         """Adds a new entry with empty ai field. Returns the entry id."""
         entry_id = uuid.uuid4().hex
@@ -44,7 +57,40 @@ class ShortTermMemory:
 
     def cleanup(self):
         now = time.time()
-        self.memory = [m for m in self.memory if now - m["timestamp"] < self.retention]
+        keep = []
+        for m in self.memory:
+            if now - m["timestamp"] < self.retention:
+                keep.append(m)
+            elif (m.get("ai") or "").strip():
+                if self.in_history(m):
+                    self._window_expired = True
+                if not m.get("summarized"):
+                    self.expired.append(m)
+        self.memory = keep
+
+    def expiring(self, lead_seconds=60, limit=None):
+        """
+        Completed exchanges the rolling summary should fold in, oldest first: already
+        expired, expiring within lead_seconds, or outside the chat history window
+        (no longer in the prompt).
+        """
+        self.cleanup()
+        now = time.time()
+        out = list(self.expired)
+        for m in self.memory:
+            if m.get("summarized") or not (m.get("ai") or "").strip():
+                continue
+            old = now - m["timestamp"] >= self.retention - lead_seconds
+            trimmed = self._window_start is not None and m["timestamp"] < self._window_start
+            if old or trimmed:
+                out.append(m)
+        return out[:limit] if limit else out
+
+    def mark_summarized(self, entries):
+        done = {id(m) for m in entries}
+        for m in entries:
+            m["summarized"] = True
+        self.expired = deque((m for m in self.expired if id(m) not in done), maxlen=self.expired.maxlen)
 
     def search(self, query, threshold=70, exclude_incomplete_latest=True):
         self.cleanup()
@@ -60,4 +106,50 @@ class ShortTermMemory:
             if score >= threshold and score > best_score:
                 best = m
                 best_score = score
-        return best
\ No newline at end of file
+        return best
+
+    def history(self, max_tokens, count_tokens, low_watermark=0.5):
+        """
+        Completed exchanges as chat messages (oldest first), at most max_tokens.
+
+        The window start only moves when the window overflows or its oldest exchange
+        expires, and then it jumps forward to low_watermark * max_tokens (and, on
+        expiry, to exchanges younger than low_watermark * retention): consecutive
+        turns share the same message prefix (the LLM keeps its KV and only prefills
+        what was appended), and the full rebuild after a trim happens once every few
+        turns.
+        """
+        self.cleanup()
+        now = time.time()
+        done = [m for m in self.memory if (m.get("ai") or "").strip()]
+        if self._window_start is not None:
+            done = [m for m in done if m["timestamp"] >= self._window_start]
+
+        def cost(m):
+            if "tokens" not in m:   # entries are immutable once complete
+                m["tokens"] = count_tokens(m["user"]) + count_tokens(m["ai"]) + _EXCHANGE_OVERHEAD
+            return m["tokens"]
+
+        total = sum(cost(m) for m in done)
+        expired, self._window_expired = self._window_expired, False
+        if (total > max_tokens or expired) and done:
+            target = max_tokens * float(low_watermark)
+            max_age = self.retention * float(low_watermark) if expired else None
+            last = done[-1]
+            while done and (total > target or (max_age is not None and now - done[0]["timestamp"] >= max_age)):
+                total -= cost(done.pop(0))
+            self._window_start = done[0]["timestamp"] if done else last["timestamp"] + 1e-6
+            self.history_trims += 1
+
+        messages = []
+        for m in done:
+            user = m["user"][len(_USER_TAG):] if m["user"].startswith(_USER_TAG) else m["user"]
+            messages.append({"role": "user", "content": user.strip()})
+            messages.append({"role": "assistant", "content": m["ai"].strip()})
+        return messages
+
+    def in_history(self, entry):
+        """True if a completed entry is inside the current history window."""
+        return bool((entry.get("ai") or "").strip()) and (
+            self._window_start is None or entry["timestamp"] >= self._window_start
+        )
@@ -0,0 +1,104 @@
+"""
+Optional local /metrics endpoint in Prometheus text exposition format (0.0.4).
+
+The server runs in its own daemon thread. Values are only read when a scrape
+comes in (collect callback), so nothing is added to the turn pipeline itself.
+"""
+
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class MetricFamily:
+    def __init__(self, name, kind, help_text=""):
+        self.name = name
+        self.kind = kind            # "counter" | "gauge" | "summary"
+        self.help = help_text
+        self.samples = []           # (suffix, labels dict, value)
+
+    def add(self, value, suffix="", **labels):
+        if value is None:
+            return self
+        self.samples.append((suffix, labels, value))
+        return self
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    value = float(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+def render(families):
+    lines = []
+    for fam in families:
+        if not fam.samples:
+            continue
+        if fam.help:
+            lines.append(f"# HELP {fam.name} {fam.help}")
+        lines.append(f"# TYPE {fam.name} {fam.kind}")
+        for suffix, labels, value in fam.samples:
+            label_txt = ""
+            if labels:
+                label_txt = "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in labels.items()) + "}"
+            lines.append(f"{fam.name}{suffix}{label_txt} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    def __init__(self, collect, host="127.0.0.1", port=9108):
+        """collect() -> list[MetricFamily], called once per scrape."""
+        self.collect = collect
+        self.host = host
+        self.port = int(port)
+        self._httpd = None
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                try:
+                    body = render(server.collect()).encode("utf-8")
+                except Exception as e:
+                    self.send_error(500, str(e))
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, fmt, *args):
+                pass  # no stdout spam per scrape
+
+        self._httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]  # port=0 -> picked by the OS
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        print(f"[Metrics] serving on http://{self.host}:{self.port}/metrics")
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
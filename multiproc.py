@@ -0,0 +1,665 @@
+"""
+Optional multi-process topology (process_config["enabled"] in config.py).
+
+    main process    AgentController loop, memory, emotion, VTS + lip-sync, web, metrics
+    stt process     SpeechRecognizer (microphone / replay)
+    tts process     TTS engine + AudioOutput (the device stream)
+    llm process     LlamaWrapper (or the HTTP backend, see llm_wrapper.build_llm)
+
+Each stage gets its own interpreter, so whisper callbacks, the audio writer
+thread and LLM decode steps no longer fight over one GIL (no more audio
+glitches while a reply is being generated).
+
+IPC:
+    ctl queue       parent -> child: ("call", id, method, args, kwargs, stream), ("set", signal, value), ("stop",)
+    events queue    child -> parent: ready / failed, results, reply deltas, signal changes,
+                    bus events, final transcripts, utterance start/done, stats snapshots
+    PcmRing         played TTS audio (+ when it becomes audible) -> main process, for lip-sync;
+                    shared memory, the PCM is never pickled
+
+The parent-side proxies (SttProcess, TtsProcess, LlmProcess) have the same interface
+as the in-process components, so AgentController does not care where a stage runs.
+Startup: every stage loads in parallel and reports "ready" (or "failed"); shutdown:
+("stop",) lets the child stop its component cleanly, terminate() after stop_timeout.
+Children also exit on their own if the main process dies.
+
+Children are started with "spawn": they re-import config.py, runtime edits to the
+config dicts in the main process are not seen there.
+"""
+
+import itertools
+import multiprocessing as mp
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from config import process_config, tts_config
+from pcm_ring import PcmRing
+from signals import Signals
+from event_bus import COALESCE
+
+
+# ============================================================
+# Child side
+# ============================================================
+class _ChildSignals(Signals):
+    """Local Signals in a child: the listed state changes and every bus event go to the parent."""
+
+    def __init__(self, events, forward=()):
+        super().__init__(debug_print=False)
+        self._events = events
+        self._forward = frozenset(forward)
+
+    def _emit(self, name, value):
+        super()._emit(name, value)
+        if name in self._forward:
+            self._events.put(("signal", name, value))
+
+    def publish(self, name, value):
+        super().publish(name, value)
+        self._events.put(("publish", name, value))
+
+
+class _EventQueue:
+    """input_queue stand-in for the STT child: final transcripts go to the parent's InputQueue."""
+
+    def __init__(self, events):
+        self._events = events
+
+    def put(self, item, block=True, timeout=None):
+        self._events.put(("input", item))
+
+
+class _RingWriter:
+    """AudioOutput listener in the TTS child: played chunks -> PcmRing, stop -> empty marker."""
+
+    def __init__(self, ring):
+        self.ring = ring
+
+    def on_chunk(self, pcm, play_start):
+        self.ring.put(pcm, play_start)
+
+    def on_stop(self):
+        self.ring.put(b"", time.monotonic())
+
+
+class _SttServer:
+    methods = ()
+
+    def __init__(self, events, ring_name):
+        self.signals = _ChildSignals(events, forward=("user_talking",))
+        self.events = events
+        self.stt = None
+        self._thread = None
+
+    def start(self):
+        from stt import SpeechRecognizer
+
+        self.stt = SpeechRecognizer(input_queue=_EventQueue(self.events), signals=self.signals)
+        self._thread = threading.Thread(target=self.stt.start, daemon=True)
+        self._thread.start()
+        while not self.stt.ready.wait(timeout=0.5):
+            if not self._thread.is_alive():
+                raise RuntimeError("STT thread exited before it was ready")
+
+    def stats(self):
+        return self.stt.stats()
+
+    def stop(self):
+        self.stt.stop()
+        self._thread.join(timeout=5.0)
+
+
+class _TtsServer:
+    methods = ("speak", "prerender", "warm_up", "cancel")
+
+    def __init__(self, events, ring_name):
+        self.signals = _ChildSignals(events, forward=("ai_talking",))
+        self.events = events
+        self.ring = PcmRing.attach(ring_name)
+        self.tts = None
+
+    def start(self):
+        from tts.tts_wrapper import build_tts
+
+        self.tts = build_tts(self.signals)
+        self.tts.audio.add_listener(_RingWriter(self.ring))
+
+    def call(self, method, args, kwargs, on_delta, call_id):
+        if method == "speak":
+            ref, text, emotion_label, policy = args
+            events = self.events
+
+            def on_start(utt):
+                events.put(("utt_start", ref, utt.synth_started_at, utt.first_chunk_at, utt.playback_started_at))
+
+            def on_done(utt):
+                events.put(("utt_done", ref, utt.status, utt.cached, utt.finished_at))
+
+            return self.tts.speak(text, emotion_label=emotion_label, policy=policy, on_start=on_start, on_done=on_done)
+        if method == "prerender":
+            return self.tts.prerender(*args, **kwargs)
+        if method == "warm_up":
+            return self.tts.warm_up(*args, **kwargs)
+        if method == "cancel":
+            return self.tts.stop()
+        raise ValueError(f"Unknown method: {method}")
+
+    def stats(self):
+        st = self.tts.stats()
+        st["busy"] = self.tts.busy
+        st["cache"] = self.tts.cache.stats() if self.tts.cache is not None else None
+        st["ring"] = self.ring.stats()
+        return st
+
+    def stop(self):
+        self.tts.stop()
+        self.tts.audio.close()
+        self.ring.close()
+
+
+class _LlmServer:
+    methods = ("generate", "prefill", "warm_up", "prompt_overhead")
+
+    def __init__(self, events, ring_name):
+        self.signals = None
+        self.llm = None
+
+    def start(self):
+        from llm_wrapper import build_llm
+        self.llm = build_llm()
+
+    def call(self, method, args, kwargs, on_delta, call_id):
+        if method == "generate" and on_delta is not None:
+            kwargs["on_delta"] = on_delta
+        return getattr(self.llm, method)(*args, **kwargs)
+
+    def stats(self):
+        return {"last_stats": dict(getattr(self.llm, "last_stats", None) or {})}
+
+    def stop(self):
+        stop = getattr(self.llm, "stop", None)
+        if stop is not None:
+            stop()
+
+
+_SERVERS = {"stt": _SttServer, "tts": _TtsServer, "llm": _LlmServer}
+
+
+def _child_main(stage, ctl, events, ring_name, stats_interval=1.0):
+    """Entry point of a stage process (must stay importable for "spawn")."""
+    try:
+        server = _SERVERS[stage](events, ring_name)
+        server.start()
+    except Exception as e:
+        events.put(("failed", f"{type(e).__name__}: {e}"))
+        return
+    events.put(("ready", None))
+
+    calls = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{stage}-call")
+
+    def run_call(call_id, method, args, kwargs, stream):
+        on_delta = (lambda d: events.put(("delta", call_id, d))) if stream else None
+        try:
+            if method not in server.methods:
+                raise ValueError(f"Unknown method: {method}")
+            value = server.call(method, args, kwargs, on_delta, call_id)
+            events.put(("result", call_id, value, None, server.stats()))
+        except Exception as e:
+            events.put(("result", call_id, None, f"{type(e).__name__}: {e}", None))
+
+    parent = mp.parent_process()
+    next_stats = 0.0
+    while True:
+        try:
+            msg = ctl.get(timeout=0.5)
+        except queue.Empty:
+            msg = None
+        if parent is not None and not parent.is_alive():
+            print(f"[{stage} process] main process is gone, exiting")
+            break
+        if msg is not None:
+            kind = msg[0]
+            if kind == "stop":
+                break
+            if kind == "set" and server.signals is not None:
+                setattr(server.signals, msg[1], msg[2])
+            elif kind == "call":
+                calls.submit(run_call, *msg[1:])
+
+        now = time.monotonic()
+        if now >= next_stats:
+            next_stats = now + stats_interval
+            try:
+                events.put(("stats", server.stats()))
+            except Exception:
+                pass
+
+    try:
+        server.stop()
+    except Exception as e:
+        print(f"[{stage} process] ERROR: stop failed: {e}")
+    calls.shutdown(wait=False, cancel_futures=True)
+    events.put(("exited", None))
+
+
+# ============================================================
+# Parent side
+# ============================================================
+class StageProcess:
+    """Parent-side handle of one stage process: lifecycle, RPC and event pump."""
+
+    stage = None
+
+    def __init__(self, signals=None, forward_signals=(), ring_bytes=0):
+        ctx = mp.get_context(process_config.get("start_method", "spawn"))
+        self.signals = signals
+        self.ctl = ctx.Queue()
+        self.events = ctx.Queue()
+        self.ring = PcmRing.create(ring_bytes) if ring_bytes else None
+        self.process = ctx.Process(
+            target=_child_main,
+            args=(self.stage, self.ctl, self.events, self.ring.name if self.ring else None),
+            name=f"ai-{self.stage}",
+            daemon=True,
+        )
+        self.ready = threading.Event()
+        self.error = None
+        self.remote_stats = {}
+
+        self._calls = {}            # id -> (Future, on_delta)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._pump = None
+        self._closed = False
+
+        # parent -> child state (e.g. the web UI switching STT off)
+        self._sub = None
+        if signals is not None and forward_signals:
+            self._sub = signals.subscribe(
+                f"{self.stage}_process",
+                maxlen=len(forward_signals),
+                policy=COALESCE,
+                topics=forward_signals,
+                notify=self._forward_signals,
+            )
+            for name in forward_signals:
+                self.ctl.put(("set", name, getattr(signals, name)))
+
+    # lifecycle
+    def launch(self):
+        self.process.start()
+        self._pump = threading.Thread(target=self._pump_loop, daemon=True)
+        self._pump.start()
+        return self
+
+    def wait_ready(self, timeout=None):
+        """Blocks until the child has built its component. Raises if it failed or died."""
+        deadline = None if timeout is None else time.monotonic() + float(timeout)
+        while not self.ready.wait(timeout=0.2):
+            if self.error is not None or not self.process.is_alive():
+                raise RuntimeError(f"{self.stage} process failed to start: {self.error or f'exit code {self.process.exitcode}'}")
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"{self.stage} process not ready after {timeout} s")
+        return self
+
+    def close(self, timeout=None):
+        """Coordinated stop: ("stop",) -> child stops its component, terminate() if it hangs."""
+        if self._closed:
+            return
+        self._closed = True
+        timeout = process_config.get("stop_timeout", 5.0) if timeout is None else timeout
+        if self._sub is not None:
+            self._sub.close()
+        if self.process.pid is not None:
+            self.ctl.put(("stop",))
+            self.process.join(timeout=timeout)
+            if self.process.is_alive():
+                print(f"[{type(self).__name__}] WARN: no clean exit after {timeout} s, terminating")
+                self.process.terminate()
+                self.process.join(timeout=1.0)
+        if self._pump is not None:
+            self._pump.join(timeout=1.0)
+        self._fail_pending(RuntimeError(f"{self.stage} process stopped"))
+        if self.ring is not None:
+            self.ring.close()
+
+    # RPC
+    def call(self, method, *args, on_delta=None, **kwargs):
+        """Runs component.method(*args, **kwargs) in the child. Returns a Future."""
+        fut = Future()
+        if self._closed:
+            fut.set_exception(RuntimeError(f"{self.stage} process stopped"))
+            return fut
+        call_id = next(self._ids)
+        with self._lock:
+            self._calls[call_id] = (fut, on_delta)
+        self.ctl.put(("call", call_id, method, args, kwargs, on_delta is not None))
+        return fut
+
+    # event pump (parent thread)
+    def _pump_loop(self):
+        while True:
+            try:
+                msg = self.events.get(timeout=0.5)
+            except queue.Empty:
+                if not self.process.is_alive():
+                    break
+                continue
+            except (EOFError, OSError):
+                break
+            try:
+                self._dispatch(msg)
+            except Exception as e:
+                print(f"[{type(self).__name__}] ERROR handling {msg[0]}: {e}")
+            if msg[0] == "exited":
+                break
+        self._fail_pending(RuntimeError(f"{self.stage} process exited"))
+
+    def _dispatch(self, msg):
+        kind = msg[0]
+        if kind == "ready":
+            self.ready.set()
+        elif kind == "failed":
+            self.error = msg[1]
+            print(f"[{type(self).__name__}] ERROR: {msg[1]}")
+        elif kind == "stats":
+            self.remote_stats = msg[1]
+        elif kind == "signal":
+            if self.signals is not None:
+                setattr(self.signals, msg[1], msg[2])
+        elif kind == "publish":
+            if self.signals is not None:
+                self.signals.publish(msg[1], msg[2])
+        elif kind == "delta":
+            with self._lock:
+                entry = self._calls.get(msg[1])
+            if entry is not None and entry[1] is not None:
+                entry[1](msg[2])
+        elif kind == "result":
+            _, call_id, value, error, stats = msg
+            with self._lock:
+                entry = self._calls.pop(call_id, None)
+            if stats is not None:
+                self.remote_stats = stats
+            if entry is not None:
+                if error is not None:
+                    entry[0].set_exception(RuntimeError(error))
+                else:
+                    entry[0].set_result(value)
+        elif kind != "exited":
+            self._on_event(msg)
+
+    def _on_event(self, msg):
+        pass
+
+    def _forward_signals(self):
+        for name, value, _ in self._sub.drain():
+            self.ctl.put(("set", name, value))
+
+    def _fail_pending(self, error):
+        with self._lock:
+            pending, self._calls = self._calls, {}
+        for fut, _ in pending.values():
+            if not fut.done():
+                fut.set_exception(error)
+
+
+class SttProcess(StageProcess):
+    """SpeechRecognizer in its own process. Matches the AgentController stt factory interface."""
+
+    stage = "stt"
+
+    def __init__(self, input_queue, signals):
+        super().__init__(signals, forward_signals=("stt_enabled",))
+        self.input_queue = input_queue
+
+    def start(self):
+        """Blocking, like SpeechRecognizer.start(): returns when the STT process exits."""
+        self.launch()
+        self.process.join()
+        if self.error is not None:
+            raise RuntimeError(self.error)
+
+    def stats(self):
+        return self.remote_stats or {"segments": 0, "audio_s": None, "finalize_latency": {}, "rtf": {}}
+
+    def stop(self):
+        self.close()
+
+    def _on_event(self, msg):
+        if msg[0] == "input":
+            self.input_queue.put(msg[1])
+
+
+class RingAudio:
+    """
+    Parent-side stand-in for the TTS child's AudioOutput: replays its listener
+    callbacks (on_start / on_chunk(pcm, play_start) / on_stop) from the PcmRing.
+    play_start is time.monotonic(), which is system-wide (same clock in every process).
+    """
+
+    def __init__(self, ring, sample_rate=24000, channels=1, poll_s=0.005):
+        self.ring = ring
+        self.sample_rate = int(sample_rate)
+        self.channels = int(channels)
+        self.poll_s = float(poll_s)
+        self._listeners = []
+        self._playing = False
+        self._running = True
+        self._thread = threading.Thread(target=self._reader_loop, daemon=True)
+        self._thread.start()
+
+    @property
+    def playing(self):
+        return self._playing
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def close(self):
+        self._running = False
+        self._thread.join(timeout=1.0)
+
+    def _reader_loop(self):
+        while self._running:
+            try:
+                record = self.ring.get()
+            except Exception:
+                return      # ring closed
+            if record is None:
+                time.sleep(self.poll_s)
+                continue
+            pcm, play_start = record
+            if not pcm:
+                self._set_playing(False)
+                continue
+            self._set_playing(True)
+            for l in self._listeners:
+                cb = getattr(l, "on_chunk", None)
+                if cb:
+                    try:
+                        cb(pcm, play_start)
+                    except Exception:
+                        pass
+
+    def _set_playing(self, value):
+        if value == self._playing:
+            return
+        self._playing = value
+        name = "on_start" if value else "on_stop"
+        for l in self._listeners:
+            cb = getattr(l, name, None)
+            if cb:
+                try:
+                    cb()
+                except Exception:
+                    pass
+
+
+class _RemoteCache:
+    def __init__(self, owner):
+        self._owner = owner
+
+    def stats(self):
+        return self._owner.remote_stats.get("cache") or {}
+
+
+class TtsProcess(StageProcess):
+    """TTS engine + audio output in their own process, same interface as BaseTTS."""
+
+    stage = "tts"
+
+    def __init__(self, signals):
+        out_cfg = tts_config.get("audio_output", {}) or {}
+        sample_rate = int(out_cfg.get("sample_rate", 24000))
+        channels = int(out_cfg.get("channels", 1))
+        ring_bytes = int(float(process_config.get("pcm_ring_seconds", 4.0)) * sample_rate * channels * 2)
+        super().__init__(signals, ring_bytes=ring_bytes)
+        self.enabled = bool(tts_config.get("enabled", True))
+        self.policy = (tts_config.get("policy") or "queue").strip().lower()
+        self.audio = RingAudio(self.ring, sample_rate=sample_rate, channels=channels)
+        self._utts = {}     # id -> Utterance not finished in the child yet
+
+    @property
+    def cache(self):
+        return _RemoteCache(self) if self.remote_stats.get("cache") is not None else None
+
+    @property
+    def busy(self):
+        return bool(self._utts)
+
+    def play(self, text, emotion_label=None):
+        self.speak(text, emotion_label=emotion_label)
+
+    def speak(self, text, emotion_label=None, policy=None, on_start=None, on_done=None):
+        from tts.base_tts import Utterance
+
+        if not self.enabled:
+            return None
+        text = (text or "").strip()
+        if not text:
+            return None
+        utt = Utterance(text, emotion_label, on_start=on_start, on_done=on_done)
+        with self._lock:
+            self._utts[utt.id] = utt
+        fut = self.call("speak", utt.id, text, emotion_label, policy)
+        fut.add_done_callback(lambda f: self._on_speak_result(utt.id, f))
+        return utt.id
+
+    def prerender(self, text, emotion_label=None):
+        """Fire and forget: the child synthesizes into its cache (see BaseTTS.prerender)."""
+        text = (text or "").strip()
+        if not self.enabled or not text:
+            return None
+        self.call("prerender", text, emotion_label)
+        return True
+
+    def queue_depth(self):
+        return self.stats()["queue_depth"]
+
+    def stats(self):
+        st = self.remote_stats
+        if not st:
+            return {
+                "utterances": 0, "played": 0, "dropped": 0, "cancelled": 0, "cache_hits": 0, "prerendered": 0,
+                "queue_depth": 0, "queue_wait_avg_s": None, "synth_to_playback_avg_s": None,
+            }
+        return {k: v for k, v in st.items() if k not in ("busy", "cache", "ring")}
+
+    def warm_up(self, text="Hello."):
+        self.call("warm_up", text).result()
+
+    def stop(self):
+        self.close()
+
+    def close(self, timeout=None):
+        self.audio.close()
+        super().close(timeout)
+        for utt_id in list(self._utts):
+            self._finish(utt_id, "cancelled")
+
+    def _on_speak_result(self, utt_id, fut):
+        if fut.exception() is not None:
+            self._finish(utt_id, "failed")
+        elif fut.result() is None:
+            self._finish(utt_id, "dropped")
+
+    def _on_event(self, msg):
+        kind = msg[0]
+        if kind == "utt_start":
+            _, utt_id, synth_started_at, first_chunk_at, playback_started_at = msg
+            utt = self._utts.get(utt_id)
+            if utt is None:
+                return
+            utt.synth_started_at = synth_started_at
+            utt.first_chunk_at = first_chunk_at
+            utt.playback_started_at = playback_started_at
+            if utt.on_start:
+                try:
+                    utt.on_start(utt)
+                except Exception as e:
+                    print(f"[TtsProcess] ERROR in on_start: {e}")
+        elif kind == "utt_done":
+            _, utt_id, status, cached, finished_at = msg
+            utt = self._utts.get(utt_id)
+            if utt is not None:
+                utt.cached = cached
+            self._finish(utt_id, status, finished_at)
+
+    def _finish(self, utt_id, status, finished_at=None):
+        with self._lock:
+            utt = self._utts.pop(utt_id, None)
+        if utt is None or utt._done:
+            return
+        utt._done = True
+        utt.status = status
+        utt.finished_at = finished_at or time.time()
+        if utt.on_done:
+            try:
+                utt.on_done(utt)
+            except Exception as e:
+                print(f"[TtsProcess] ERROR in on_done: {e}")
+
+
+class LlmProcess(StageProcess):
+    """LlamaWrapper in its own process: generate / prefill / warm_up over RPC, deltas streamed back."""
+
+    stage = "llm"
+
+    def __init__(self):
+        from config import LLM_params
+        super().__init__()
+        self.max_tokens = LLM_params["max_tokens"]
+
+    @property
+    def last_stats(self):
+        return self.remote_stats.get("last_stats", {})
+
+    def generate(self, system_prompt, user_prompt, on_delta=None, **kwargs):
+        return self.call("generate", system_prompt=system_prompt, user_prompt=user_prompt, on_delta=on_delta, **kwargs).result()
+
+    def prefill(self, system_prompt, user_prompt, history=None):
+        return self.call("prefill", system_prompt=system_prompt, user_prompt=user_prompt, history=history).result()
+
+    def warm_up(self, prompt="Hi"):
+        return self.call("warm_up", prompt).result()
+
+    def prompt_overhead(self, system_prompt):
+        return self.call("prompt_overhead", system_prompt).result()
+
+    def stop(self):
+        self.close()
+
+
+def _spawn(proxy):
+    return proxy.launch().wait_ready(process_config.get("ready_timeout", 600))
+
+
+def build_tts_process(signals):
+    return _spawn(TtsProcess(signals))
+
+
+def build_llm_process():
+    return _spawn(LlmProcess())
@@ -0,0 +1,107 @@
+"""
+Shared-memory PCM ring buffer between two processes (multiprocessing.shared_memory).
+
+One producer, one consumer. Records are (stamp, pcm) pairs written back to back
+into a circular byte area:
+
+    [u32 length][f64 stamp][pcm bytes]      length 0 = marker (e.g. "playback stopped")
+
+The header holds write/read positions (monotonic byte counters, never wrapped),
+each one written only by its owner, so no lock is needed. The producer never
+blocks: if a record doesn't fit it is dropped and counted (audio analysis can
+lose a chunk, the audio thread must never wait on the consumer).
+"""
+
+import struct
+
+import numpy as np
+
+_HEADER = 64            # 8 x uint64: write_pos, read_pos, dropped, capacity, (reserved)
+_W, _R, _DROPPED, _CAP = 0, 1, 2, 3
+_RECORD = struct.Struct("<Id")
+
+
+class PcmRing:
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.name = shm.name
+        self.owner = owner
+        self._hdr = np.ndarray((_HEADER // 8,), dtype=np.uint64, buffer=shm.buf, offset=0)
+        if owner:
+            self._hdr[:] = 0
+            self._hdr[_CAP] = shm.size - _HEADER
+        self.capacity = int(self._hdr[_CAP])   # shm.size may be page-rounded on attach
+        self._data = np.ndarray((self.capacity,), dtype=np.uint8, buffer=shm.buf, offset=_HEADER)
+
+    @classmethod
+    def create(cls, capacity_bytes):
+        from multiprocessing import shared_memory
+        return cls(shared_memory.SharedMemory(create=True, size=_HEADER + int(capacity_bytes)), owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        # children of the creator share its resource tracker: only the creator unlinks
+        from multiprocessing import shared_memory
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    # producer
+    def put(self, pcm, stamp=0.0):
+        """Append one record. False (and counted as dropped) if the ring is full."""
+        pcm = bytes(pcm)
+        need = _RECORD.size + len(pcm)
+        w, r = int(self._hdr[_W]), int(self._hdr[_R])
+        if need > self.capacity - (w - r):
+            self._hdr[_DROPPED] += 1
+            return False
+        self._copy_in(w, _RECORD.pack(len(pcm), float(stamp)))
+        if pcm:
+            self._copy_in(w + _RECORD.size, pcm)
+        self._hdr[_W] = w + need    # publish after the payload is in place
+        return True
+
+    # consumer
+    def get(self):
+        """Oldest record as (pcm, stamp), or None if the ring is empty."""
+        w, r = int(self._hdr[_W]), int(self._hdr[_R])
+        if w == r:
+            return None
+        length, stamp = _RECORD.unpack(self._copy_out(r, _RECORD.size))
+        pcm = self._copy_out(r + _RECORD.size, length) if length else b""
+        self._hdr[_R] = r + _RECORD.size + length
+        return pcm, stamp
+
+    def stats(self):
+        w, r = int(self._hdr[_W]), int(self._hdr[_R])
+        return {
+            "capacity": self.capacity,
+            "buffered": w - r,
+            "written": w,
+            "dropped": int(self._hdr[_DROPPED]),
+        }
+
+    def close(self):
+        # drop our views first, SharedMemory.close() fails while they export the buffer
+        self._hdr = self._data = None
+        try:
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
+        except (BufferError, FileNotFoundError):
+            pass
+
+    # circular copy
+    def _copy_in(self, pos, data):
+        start = pos % self.capacity
+        first = min(len(data), self.capacity - start)
+        src = np.frombuffer(data, dtype=np.uint8)
+        self._data[start:start + first] = src[:first]
+        if first < len(data):
+            self._data[:len(data) - first] = src[first:]
+
+    def _copy_out(self, pos, n):
+        start = pos % self.capacity
+        first = min(n, self.capacity - start)
+        out = self._data[start:start + first].tobytes()
+        if first < n:
+            out += self._data[:n - first].tobytes()
+        return out
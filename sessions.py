@@ -0,0 +1,228 @@
+"""
+Multi-session serving: many conversations (characters, chat rooms) on one model.
+
+Every Session has its own input queue, worker thread and memory namespace
+(short-term list, long-term Chroma collection, lore file). All sessions talk to
+one GenerationEngine, which batches their decode steps together (see
+generation_engine.py), so N busy sessions share the GPU instead of queueing
+behind each other turn by turn.
+
+    manager = build_session_manager()
+    manager.create("room-1", on_reply=lambda session, text: print(session.id, text))
+    manager.submit("room-1", "hello!", author="viewer42")
+"""
+
+import copy
+import queue
+import re
+import threading
+import time
+from collections import deque
+
+from config import sessions_config, prompt_budget_config, summary_config
+from generation_engine import GenerationEngine
+
+
+def _collection_name(session_id):
+    """Chroma: 3-63 chars of [a-zA-Z0-9._-], starting and ending alphanumeric."""
+    name = re.sub(r"[^a-zA-Z0-9._-]", "_", f"ltm_{session_id}")[:63]
+    return name.rstrip("._-") or "ltm_session"
+
+
+class Session:
+    def __init__(self, session_id, llm, memory, system_prompt, on_reply=None, queue_size=64, idle_seconds=1.0):
+        self.id = session_id
+        self.llm = llm                  # EngineClient (generate / last_stats)
+        self.memory = memory            # MemoryController with this session's namespace
+        self.system_prompt = system_prompt
+        self.on_reply = on_reply        # on_reply(session, text)
+        self.idle_seconds = float(idle_seconds)
+
+        self.q = queue.Queue(maxsize=int(queue_size))
+        self.pending_fact_jobs = deque()
+        self.active = False
+        self._thread = None
+
+        self.stats = {"turns": 0, "dropped_inputs": 0, "last_turn_s": None, "last_stats": {}}
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return self
+        self.active = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.active = False
+        try:
+            self.q.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def submit(self, text, author=None):
+        """Thread-safe, never blocks. False if the session's queue is full."""
+        text = (text or "").strip()
+        if not text:
+            return False
+        try:
+            self.q.put_nowait({"timestamp": time.time(), "source": "chat", "author": author, "text": text})
+            return True
+        except queue.Full:
+            self.stats["dropped_inputs"] += 1
+            return False
+
+    def _run(self):
+        while self.active:
+            try:
+                item = self.q.get(timeout=self.idle_seconds)
+            except queue.Empty:
+                item = None
+            if not self.active:
+                break
+
+            if item is None:
+                # idle: ONE deferred fact extraction job, else one rolling summary batch
+                if self.pending_fact_jobs:
+                    user_text, ai_text = self.pending_fact_jobs.popleft()
+                    try:
+                        self.memory.extract_and_store_facts(user_text, ai_text)
+                    except Exception as e:
+                        print(f"[Session {self.id}] ERROR: fact extraction failed: {e}")
+                elif self.memory.summary_due():
+                    try:
+                        self.memory.summarize_expiring()
+                    except Exception as e:
+                        print(f"[Session {self.id}] ERROR: rolling summary failed: {e}")
+                continue
+
+            # burst -> newest as main, older as "also said earlier" (like AgentController)
+            items = [item]
+            try:
+                while True:
+                    nxt = self.q.get_nowait()
+                    if nxt is not None:
+                        items.append(nxt)
+            except queue.Empty:
+                pass
+            texts = [it["text"] for it in items]
+            user_text = texts[-1]
+            if len(texts) > 1:
+                user_text += "\nUser also said earlier: " + " | ".join(texts[:-1])
+
+            try:
+                self._turn(user_text)
+            except Exception as e:
+                print(f"[Session {self.id}] ERROR: turn failed: {e}")
+
+    def _turn(self, user_text):
+        t0 = time.perf_counter()
+        short_id = self.memory.start_turn(user_text)
+        prompt = self.memory.build_prompt_with_context(user_text)
+        ai_text = self.llm.generate(system_prompt=self.system_prompt, user_prompt=prompt).strip()
+        self.memory.short.set_ai_for_id(short_id, ai_text)
+        self.pending_fact_jobs.append((user_text, ai_text))
+
+        self.stats["turns"] += 1
+        self.stats["last_turn_s"] = time.perf_counter() - t0
+        self.stats["last_stats"] = dict(self.llm.last_stats)
+        if self.on_reply is not None:
+            try:
+                self.on_reply(self, ai_text)
+            except Exception as e:
+                print(f"[Session {self.id}] ERROR in on_reply: {e}")
+
+
+class SessionManager:
+    def __init__(self, engine, system_prompt, chroma_path="data/chroma", lore_path="data/lore.json",
+                 short_retention_seconds=300, queue_size=64):
+        self.engine = engine
+        self.system_prompt = system_prompt
+        self.chroma_path = chroma_path
+        self.lore_path = lore_path
+        self.short_retention_seconds = short_retention_seconds
+        self.queue_size = queue_size
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def create(self, session_id, lore_path=None, system_prompt=None, on_reply=None):
+        from memory.memory_controller import MemoryController
+
+        with self._lock:
+            if session_id in self._sessions:
+                raise ValueError(f"Session already exists: {session_id}")
+        llm = self.engine.client()
+        system_prompt = system_prompt or self.system_prompt
+        memory = MemoryController(
+            generate_callable=llm.generate,
+            lore_path=lore_path or self.lore_path,
+            chroma_path=self.chroma_path,       # one client, one collection per session
+            chroma_collection=_collection_name(session_id),
+            short_retention_seconds=self.short_retention_seconds,
+            max_prompt_tokens=prompt_budget_config.get("max_prefill_tokens", 1024),
+            section_budgets=prompt_budget_config.get("sections"),
+            # own tokenizer copy: the session thread counts tokens while the engine thread encodes
+            tokenizer=self.engine.call(copy.deepcopy, self.engine.tokenizer).result(),
+            reserved_tokens=self.engine.prompt_overhead(system_prompt),
+            # in memory only: one summary file per session would outlive the session
+            summary_tokens=summary_config.get("max_tokens", 160) if summary_config.get("enabled", True) else 0,
+            summary_lead_seconds=summary_config.get("lead_seconds", 60),
+            summary_batch=summary_config.get("batch", 4),
+        )
+        session = Session(
+            session_id,
+            llm,
+            memory,
+            system_prompt,
+            on_reply=on_reply,
+            queue_size=self.queue_size,
+        )
+        with self._lock:
+            self._sessions[session_id] = session
+        return session.start()
+
+    def get(self, session_id):
+        return self._sessions.get(session_id)
+
+    def submit(self, session_id, text, author=None):
+        session = self._sessions.get(session_id)
+        if session is None:
+            raise KeyError(f"Unknown session: {session_id}")
+        return session.submit(text, author=author)
+
+    def close(self, session_id):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None:
+            session.stop()
+
+    def close_all(self):
+        for session_id in list(self._sessions):
+            self.close(session_id)
+        self.engine.stop()
+
+    def stats(self):
+        return {
+            "engine": self.engine.summary(),
+            "sessions": {sid: dict(s.stats, queue_depth=s.q.qsize()) for sid, s in list(self._sessions.items())},
+        }
+
+
+def build_session_manager(llm=None):
+    """One LlamaWrapper + engine for every session (config: sessions_config)."""
+    if llm is None:
+        from llm_wrapper import LlamaWrapper
+        llm = LlamaWrapper()
+    system_prompt = sessions_config.get("system_prompt")
+    if not system_prompt:
+        from agent_controller import SYSTEM_PROMPT
+        system_prompt = SYSTEM_PROMPT
+    engine = GenerationEngine(llm, max_batch=sessions_config.get("max_batch", 8)).start()
+    return SessionManager(
+        engine,
+        system_prompt,
+        chroma_path=sessions_config.get("chroma_path", "data/chroma"),
+        lore_path=sessions_config.get("lore_path", "data/lore.json"),
+        short_retention_seconds=sessions_config.get("short_retention_seconds", 300),
+        queue_size=sessions_config.get("queue_size", 64),
+    )
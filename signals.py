@@ -1,6 +1,9 @@
 import queue
+import threading
 import time
 
+from event_bus import EventBus, DROP_OLDEST
+
 
 class Signals:
     def __init__(self, debug_print = True):
@@ -19,16 +22,64 @@ class Signals:
         self._stt_enabled = True
         self._avatar_enabled = True
 
-        # simple event bus: (event_name, value, ts)
-        self.sio_queue = queue.SimpleQueue()
+        # event bus: (event_name, value, ts), bounded per subscriber
+        self.bus = EventBus()
+
+        # every state change (and every InputQueue.put) wakes the waiters: the lock only
+        # guards a generation counter, predicates run outside it (publishers never wait on them)
+        self._cond = threading.Condition()
+        self._generation = 0
 
     def _emit(self, name, value):
         ts = time.time()
         self._last_event_time = ts
-        self.sio_queue.put((name, value, ts))
+        self.bus.publish(name, value, ts)
+        self.notify()
         if self._debug_print:
             print(f"[SIGNAL] {name} -> {value}")
 
+    def publish(self, name, value):
+        """Non-state events (transcripts, reply deltas, ...): bus only, no state, no waiters woken."""
+        self.bus.publish(name, value)
+
+    def subscribe(self, name, maxlen=256, policy=DROP_OLDEST, topics=None, notify=None):
+        """Attach a consumer (frontend, metrics, ...). See event_bus.Subscription."""
+        return self.bus.subscribe(name, maxlen=maxlen, policy=policy, topics=topics, notify=notify)
+
+    # waiting
+    def notify(self):
+        """Wake everyone blocked in wait_for() (they re-check their predicate)."""
+        with self._cond:
+            self._generation += 1
+            self._cond.notify_all()
+
+    def wait_for(self, predicate, timeout=None):
+        """
+        Blocks until predicate() is true or timeout (seconds) passes. Returns the last predicate value.
+        predicate is re-checked on every signal change / notify(), so no polling. It runs
+        without any lock held, so a slow predicate never blocks a publisher.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._cond:
+                seen = self._generation
+            result = predicate()
+            if result:
+                return result
+            with self._cond:
+                # a notify() since `seen` means something changed: re-check right away
+                while self._generation == seen:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            if deadline is not None and time.monotonic() >= deadline:
+                return predicate()
+
+    def wait_until(self, name, value, timeout=None):
+        """e.g. wait_until("user_talking", False, timeout=2.0)"""
+        return self.wait_for(lambda: getattr(self, name) == value, timeout)
+
     # last event timer
     @property
     def last_event_time(self):
@@ -149,4 +200,16 @@ class Signals:
         if value == self._avatar_enabled:
             return
         self._avatar_enabled = value
-        self._emit("avatar_enabled", value)
\ No newline at end of file
+        self._emit("avatar_enabled", value)
+
+
+class InputQueue(queue.Queue):
+    """queue.Queue that also wakes Signals waiters, so one wait covers input + signal changes."""
+
+    def __init__(self, signals, maxsize=0):
+        super().__init__(maxsize)
+        self._signals = signals
+
+    def put(self, item, block=True, timeout=None):
+        super().put(item, block, timeout)
+        self._signals.notify()
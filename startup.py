@@ -0,0 +1,86 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from warmup import warm_up_components
+
+
+class ComponentLoader:
+    """
+    Builds components concurrently on a thread pool (model loads mostly release the GIL:
+    disk IO, CUDA init, tokenizer/native code), exposes one readiness future per component
+    and keeps a per-component startup timing report.
+    """
+
+    def __init__(self, max_workers=6, debug_print=True):
+        self._pool = ThreadPoolExecutor(max_workers=int(max_workers), thread_name_prefix="startup")
+        self._debug_print = bool(debug_print)
+        self._futures = {}
+        self._report = {}
+        self._t0 = time.perf_counter()
+
+    def submit(self, name, factory, warm_up=None, warmup_rounds=2):
+        """
+        factory() -> component. warm_up(component) is optional and runs right after
+        construction on the same pool thread. Returns the readiness future.
+        """
+        self._report[name] = {"status": "loading", "load_s": None, "ready_at_s": None, "warmup": None, "error": None}
+        fut = self._pool.submit(self._build, name, factory, warm_up, warmup_rounds)
+        self._futures[name] = fut
+        return fut
+
+    def future(self, name):
+        return self._futures[name]
+
+    def get(self, name, timeout=None):
+        """Blocks until the component is ready (re-raises its construction error)."""
+        return self._futures[name].result(timeout=timeout)
+
+    def ready(self, name):
+        fut = self._futures.get(name)
+        return fut is not None and fut.done() and fut.exception() is None
+
+    def peek(self, name):
+        """Component if ready, else None (never blocks)."""
+        return self._futures[name].result() if self.ready(name) else None
+
+    def wait(self, names, timeout=None):
+        """Waits for several components. Returns the list of names still not ready."""
+        deadline = None if timeout is None else time.perf_counter() + float(timeout)
+        for name in names:
+            remaining = None if deadline is None else max(0.0, deadline - time.perf_counter())
+            try:
+                self._futures[name].result(timeout=remaining)
+            except Exception:
+                pass
+        return [n for n in names if not self.ready(n)]
+
+    def report(self):
+        return {name: dict(r) for name, r in self._report.items()}
+
+    def shutdown(self, wait=False):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+    def _build(self, name, factory, warm_up, warmup_rounds):
+        r = self._report[name]
+        t0 = time.perf_counter()
+        try:
+            component = factory()
+        except Exception as e:
+            r["status"] = "failed"
+            r["error"] = str(e)
+            print(f"[Startup] {name}: FAILED after {time.perf_counter() - t0:.1f} s ({e})")
+            raise
+        r["load_s"] = time.perf_counter() - t0
+
+        if warm_up is not None:
+            r["warmup"] = warm_up_components(
+                [(name, lambda: warm_up(component))],
+                rounds=warmup_rounds,
+                debug_print=self._debug_print,
+            )[name]
+
+        r["status"] = "ready"
+        r["ready_at_s"] = time.perf_counter() - self._t0
+        if self._debug_print:
+            print(f"[Startup] {name}: loaded in {r['load_s']:.1f} s, ready at +{r['ready_at_s']:.1f} s")
+        return component
@@ -1,9 +1,12 @@
+import contextlib
+import os
 import queue
+import threading
 import time
-from RealtimeSTT import AudioToTextRecorder
-from config import stt_config_realtime, stt_config_batch, stt_models
+from config import stt_config_realtime, stt_config_batch, stt_models, stt_replay_config, stt_profiles, stt_profile, stt_mode
 import logging
 from signals import Signals
+from tracing import Histogram
 
 class SpeechRecognizer:
     def __init__(self, input_queue, signals):
@@ -11,14 +14,68 @@ class SpeechRecognizer:
         self.signals = signals
         self.active = False
         self.recorder = None
+        self.ready = threading.Event()  # set once the recorder (models) is loaded
+        self.profile = dict(stt_profiles[stt_profile.get("name", "gpu")])
+        self._warming = False
+        self.load_seconds = None
+
+        # typed events: stt_partial / stt_stable (bus only), final -> input queue (+ "transcript")
+        self.segment_id = 0
+
+        # replay mode (stt_replay.ReplaySource instead of the microphone)
+        self.replay = None
+        self.replay_done = threading.Event()
+
+        # segment timing: finalize latency = recording stop -> text, rtf = that / segment audio length
+        self._seg_start = None
+        self._seg_stop = None
+        self._stop_wall = None
+        self.segments = 0
+        self.finalize_latency = Histogram()
+        self.rtf = Histogram()
+
+    def _audio_now(self):
+        """Audio clock: seconds fed (replay) or wall time (microphone)."""
+        if self.replay is not None:
+            return self.replay.fed_seconds
+        return time.perf_counter()
+
+    def _on_partial(self, text):
+        """Realtime model update, may still change completely."""
+        self._emit_partial("stt_partial", text)
+
+    def _on_stable(self, text):
+        """Stabilized realtime text: good enough to start work on (speculative prefill)."""
+        self._emit_partial("stt_stable", text)
+
+    def _emit_partial(self, name, text):
+        text = (text or "").strip()
+        if not text or self._warming or not self.signals.stt_enabled:
+            return
+        self.signals.publish(name, {"segment_id": self.segment_id, "text": text, "timestamp": time.time()})
 
     def _on_text(self, text):
-        """Callback for recognized text."""
+        """Callback for recognized text (final, one per segment)."""
         text = (text or "").strip()
+        if self._warming:
+            return
+        if text and self._stop_wall is not None:
+            finalize = time.perf_counter() - self._stop_wall
+            self.finalize_latency.add(finalize)
+            if self._seg_start is not None and self._seg_stop and self._seg_stop > self._seg_start:
+                self.rtf.add(finalize / (self._seg_stop - self._seg_start))
+            self.segments += 1
+            self._stop_wall = None
+        if text and not self.signals.stt_enabled:
+            print(f"[STT] (disabled) ignored: {text}")
+            return
         if text:
+            self.signals.publish("transcript", {"source": "microphone", "text": text, "segment_id": self.segment_id})
             payload = {
                 "timestamp": time.time(),
                 "source": "microphone",
+                "kind": "final",
+                "segment_id": self.segment_id,
                 "text": text
             }
             self.input_queue.put(payload)
@@ -26,15 +83,23 @@ class SpeechRecognizer:
             print(f"[STT] Recognized: {text}")
 
     def on_recording_start(self):
+        if self._warming:
+            return
+        self._seg_start = self._audio_now()
+        self.segment_id += 1
         self.signals.user_talking = True
         print("[STT] Recording started")
 
     def on_recording_stop(self):
+        if self._warming:
+            return
+        self._seg_stop = self._audio_now()
+        self._stop_wall = time.perf_counter()
         self.signals.user_talking = False
         print("[STT] Recording stopped")
 
-    def start_realtime(self):
-        config = {
+    def _realtime_config(self):
+        return {
             "spinner": False,
             "language": stt_config_realtime["language"],
             "use_microphone": True,
@@ -48,24 +113,18 @@ class SpeechRecognizer:
             "realtime_processing_pause": 0.4,
             "realtime_model_type": stt_config_realtime["realtime_model_type"],
             "use_main_model_for_realtime": True, # test config
-            "compute_type": "auto",
-            "device": stt_config_realtime["device"],
+            "compute_type": self.profile.get("compute_type", "auto"),
+            "device": self.profile.get("device", stt_config_realtime["device"]),
             "on_recording_start": self.on_recording_start,
             "on_recording_stop": self.on_recording_stop,
-            "on_realtime_transcription_stabilized": self._on_text,
+            "on_realtime_transcription_update": self._on_partial,
+            "on_realtime_transcription_stabilized": self._on_stable,
             "level": logging.ERROR
 
         }
-        self.active = True
 
-        with AudioToTextRecorder(**config) as recorder:
-            self.recorder = recorder
-            print("[STT] Ready and listening...")
-            while self.active:
-                recorder.text()  # Blocking until new transcription arrives
-
-    def start_batch(self):
-        config = {
+    def _batch_config(self):
+        return {
             "spinner": False,
             "language": stt_config_batch["language"],
             "use_microphone": True,
@@ -75,18 +134,114 @@ class SpeechRecognizer:
             "post_speech_silence_duration": 0.4,
             "min_length_of_recording": 0,
             "min_gap_between_recordings": 0.2,
-            "model": stt_models["tiny_fp16"], #or use sst_config_batch["model"] for base whisper
-            "compute_type": "auto",
-            "device": stt_config_batch["device"],
+            "model": stt_models[self.profile.get("batch_model", "tiny_fp16")], #or use sst_config_batch["model"] for base whisper
+            "compute_type": self.profile.get("compute_type", "auto"),
+            "device": self.profile.get("device", stt_config_batch["device"]),
             "on_recording_start": self.on_recording_start,
             "on_recording_stop": self.on_recording_stop,
             "level": logging.ERROR
         }
 
+    def start(self, mode=None):
+        """Blocking. mode: "realtime" | "batch" | "replay" (default: stt_mode in config.py)."""
+        mode = mode or stt_mode["mode"]
+        if mode == "realtime":
+            return self.start_realtime()
+        if mode == "batch":
+            return self.start_batch()
+        if mode == "replay":
+            return self.start_replay()
+        raise ValueError(f"Unknown STT mode: {mode}")
+
+    def start_realtime(self):
+        # partial/stable texts arrive through the realtime callbacks, the final one from recorder.text()
+        self._listen(self._realtime_config(), "[STT] Ready and listening...")
+
+    def start_batch(self):
+        self._listen(self._batch_config(), "[STT] Ready in batch mode (waiting for speech)...")
+
+    def start_replay(self, source=None):
+        """Same recorder and callbacks as realtime/batch, audio comes from files instead of the mic."""
+        from stt_replay import ReplaySource
+
+        cfg = stt_replay_config
+        self.replay = ReplaySource(
+            source or cfg["source"],
+            speed=cfg.get("speed", 1.0),
+            chunk_ms=cfg.get("chunk_ms", 32),
+            gap_seconds=cfg.get("gap_seconds", 1.0),
+            raw_sample_rate=cfg.get("raw_sample_rate", 16000),
+            raw_channels=cfg.get("raw_channels", 1),
+            loop=cfg.get("loop", False),
+        )
+        realtime = (cfg.get("recorder") or "batch") == "realtime"
+        config = self._realtime_config() if realtime else self._batch_config()
+        config["use_microphone"] = False
+        self._listen(
+            config,
+            f"[STT] Replaying {len(self.replay.paths)} clip(s) at {self.replay.speed}x...",
+        )
+
+    @contextlib.contextmanager
+    def _thread_tuning(self):
+        """
+        CPU profile: OMP_NUM_THREADS for the whisper model, set only while the
+        recorder loads and warms up. RealtimeSTT doesn't pass cpu_threads to
+        faster-whisper, so CT2 takes the count from the environment when the model
+        is created and first run; the previous value is restored afterwards so the
+        emotion/TTS models in this process keep their own thread counts.
+        """
+        if self.profile.get("device") != "cpu":
+            yield
+            return
+        threads = int(self.profile.get("cpu_threads", 0) or 0)
+        if threads <= 0:
+            threads = max(1, (os.cpu_count() or 2) // 2)   # physical cores, SMT siblings don't help GEMM
+        previous = os.environ.get("OMP_NUM_THREADS")
+        os.environ["OMP_NUM_THREADS"] = str(threads)
+        try:
+            yield
+        finally:
+            if previous is None:
+                os.environ.pop("OMP_NUM_THREADS", None)
+            else:
+                os.environ["OMP_NUM_THREADS"] = previous
+
+    def _warm_up(self, recorder):
+        """Transcribe a short clip (result discarded) so the first real segment runs warm."""
+        clip = stt_profile.get("warmup_clip")
+        if not clip:
+            return
+        from stt_replay import load_clip
+        self._warming = True
+        try:
+            t0 = time.perf_counter()
+            pcm = load_clip(clip) + b"\x00" * (16000 * 2)   # + 1 s silence closes the segment
+            step = 16000 // 10 * 2
+            for i in range(0, len(pcm), step):
+                recorder.feed_audio(pcm[i:i + step], original_sample_rate=16000)
+            recorder.text()
+            print(f"[STT] Warm-up transcription: {time.perf_counter() - t0:.2f} s")
+        except Exception as e:
+            print(f"[STT] WARN: warm-up failed: {e}")
+        finally:
+            self._warming = False
+
+    def _listen(self, config, banner):
         self.active = True
-        with AudioToTextRecorder(**config) as recorder:
+        t0 = time.perf_counter()
+
+        from RealtimeSTT import AudioToTextRecorder   # torch is imported before the thread count is set
+        with self._thread_tuning():
+            recorder = AudioToTextRecorder(**config)
             self.recorder = recorder
-            print("[STT] Ready in batch mode (waiting for speech)...")
+            self._warm_up(recorder)
+        with recorder:
+            self.load_seconds = time.perf_counter() - t0
+            self.ready.set()
+            print(f"{banner} (loaded in {self.load_seconds:.1f} s, {self.profile.get('device')}/{self.profile.get('compute_type')})")
+            if self.replay is not None:
+                threading.Thread(target=self._replay_feed, daemon=True).start()
 
             while self.active:
                 # Blocking call – waits until a full segment is finalized
@@ -94,6 +249,32 @@ class SpeechRecognizer:
                 if result:
                     self._on_text(result)
 
+    def _replay_feed(self):
+        t0 = time.perf_counter()
+        try:
+            self.replay.run(
+                lambda chunk: self.recorder.feed_audio(chunk, original_sample_rate=16000),
+                active=lambda: self.active,
+            )
+        except Exception as e:
+            print(f"[STT] ERROR: replay failed: {e}")
+        wall = time.perf_counter() - t0
+        st = self.stats()
+        print(
+            f"[STT] Replay done: {self.replay.clips_done} clip(s), {self.replay.fed_seconds:.1f} s audio "
+            f"in {wall:.1f} s, segments={st['segments']}, "
+            f"finalize p50={st['finalize_latency'].get('p50')}, rtf p50={st['rtf'].get('p50')}"
+        )
+        self.replay_done.set()
+
+    def stats(self):
+        return {
+            "segments": self.segments,
+            "audio_s": self.replay.fed_seconds if self.replay is not None else None,
+            "finalize_latency": self.finalize_latency.summary(),
+            "rtf": self.rtf.summary(),
+        }
+
     def stop(self):
         self.active = False
         if self.recorder:
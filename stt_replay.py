@@ -0,0 +1,148 @@
+"""
+Replay input for SpeechRecognizer: recorded audio instead of a live microphone.
+
+Source can be:
+- a directory          -> every .wav / .pcm / .raw in it (sorted by name)
+- a playlist (.txt/.m3u) -> one path per line (relative to the playlist, # = comment)
+- a single .wav file
+- a raw PCM file (.pcm / .raw, int16, raw_sample_rate / raw_channels)
+- "-"                  -> raw PCM from stdin (a live pipe: fed chunk by chunk as it arrives)
+
+Everything is converted to 16 kHz mono int16 (what AudioToTextRecorder.feed_audio
+expects) and fed in small chunks, paced at `speed` x real time (0 = as fast as
+possible). Silence is fed between clips so the VAD closes every segment. Files are
+loaded whole; stdin is read one chunk at a time until EOF.
+"""
+
+import os
+import sys
+import time
+import wave
+
+from tts.audio_output import convert_pcm
+
+FEED_RATE = 16000
+_AUDIO_EXT = (".wav", ".pcm", ".raw")
+
+
+def _resolve(source):
+    if source == "-":
+        return ["-"]
+    if os.path.isdir(source):
+        return [
+            os.path.join(source, name)
+            for name in sorted(os.listdir(source))
+            if name.lower().endswith(_AUDIO_EXT)
+        ]
+    if source.lower().endswith((".txt", ".m3u")):
+        base = os.path.dirname(source)
+        paths = []
+        with open(source, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    paths.append(line if os.path.isabs(line) else os.path.join(base, line))
+        return paths
+    return [source]
+
+
+def load_clip(path, raw_sample_rate=16000, raw_channels=1):
+    """file path -> 16 kHz mono int16 bytes"""
+    if path.lower().endswith(".wav"):
+        with wave.open(path, "rb") as wf:
+            if wf.getsampwidth() != 2:
+                raise ValueError(f"{path}: only 16-bit PCM WAV is supported")
+            rate, channels = wf.getframerate(), wf.getnchannels()
+            data = wf.readframes(wf.getnframes())
+        return convert_pcm(data, rate, channels, "int16", FEED_RATE, 1)
+
+    with open(path, "rb") as f:
+        data = f.read()
+    return convert_pcm(data, raw_sample_rate, raw_channels, "int16", FEED_RATE, 1)
+
+
+class ReplaySource:
+    def __init__(
+        self,
+        source,
+        speed=1.0,
+        chunk_ms=32,
+        gap_seconds=1.0,
+        lead_in_seconds=0.5,
+        raw_sample_rate=16000,
+        raw_channels=1,
+        loop=False,
+    ):
+        self.paths = _resolve(source)
+        if not self.paths:
+            raise ValueError(f"No audio found in replay source: {source}")
+        self.speed = float(speed)
+        self.chunk_bytes = max(2, int(FEED_RATE * chunk_ms / 1000.0)) * 2
+        self.gap_seconds = float(gap_seconds)
+        self.lead_in_seconds = float(lead_in_seconds)
+        self.raw_sample_rate = int(raw_sample_rate)
+        self.raw_channels = int(raw_channels)
+        self.loop = bool(loop)
+
+        self.fed_seconds = 0.0      # audio clock: seconds of audio fed so far
+        self.clips_done = 0
+
+    def run(self, feed, active=lambda: True, on_clip=None):
+        """
+        Blocking. feed(chunk_bytes) for every chunk, paced by self.speed.
+        on_clip(path, start_s, end_s) after each clip (positions on the audio clock).
+        """
+        t0 = time.perf_counter()
+        self._feed_silence(feed, self.lead_in_seconds, t0, active)
+        while active():
+            for path in self.paths:
+                if not active():
+                    return
+                start = self.fed_seconds
+                for chunk in self._chunks(path):
+                    if not active():
+                        return
+                    self._feed(feed, chunk, t0)
+                end = self.fed_seconds
+                self._feed_silence(feed, self.gap_seconds, t0, active)
+                self.clips_done += 1
+                if on_clip is not None:
+                    on_clip(path, start, end)
+            if not self.loop:
+                return
+
+    def _chunks(self, path):
+        """16 kHz mono int16 pieces of chunk_bytes (stdin: as they arrive, never the whole stream)."""
+        if path != "-":
+            pcm = load_clip(path, self.raw_sample_rate, self.raw_channels)
+            for i in range(0, len(pcm), self.chunk_bytes):
+                yield pcm[i:i + self.chunk_bytes]
+            return
+        frame = 2 * self.raw_channels
+        raw_bytes = max(1, self.chunk_bytes // 2 * self.raw_sample_rate // FEED_RATE) * frame
+        rest = b""
+        while True:
+            data = sys.stdin.buffer.read(raw_bytes)    # blocks for one chunk only
+            if not data:
+                return
+            data = rest + data
+            usable = len(data) // frame * frame     # keep a split frame for the next read
+            data, rest = data[:usable], data[usable:]
+            if data:
+                yield convert_pcm(data, self.raw_sample_rate, self.raw_channels, "int16", FEED_RATE, 1)
+
+    def _feed_silence(self, feed, seconds, t0, active):
+        silence = b"\x00" * self.chunk_bytes
+        n = int(seconds * FEED_RATE * 2 / self.chunk_bytes)
+        for _ in range(n):
+            if not active():
+                return
+            self._feed(feed, silence, t0)
+
+    def _feed(self, feed, chunk, t0):
+        feed(chunk)
+        self.fed_seconds += len(chunk) / (2.0 * FEED_RATE)
+        if self.speed > 0:
+            delay = t0 + self.fed_seconds / self.speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
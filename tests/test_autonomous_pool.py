@@ -0,0 +1,55 @@
+import time
+
+from agent_controller import AgentController
+from autonomous_pool import AutonomousLinePool
+
+
+class _Components:
+    def ready(self, name):
+        return True
+
+
+def _controller(pool, idle_for, silence_seconds=22.0, lead=20.0):
+    ctrl = AgentController.__new__(AgentController)     # no components loaded
+    ctrl.autonomous_pool = pool
+    ctrl.components = _Components()
+    ctrl.silence_seconds = silence_seconds
+    ctrl.pool_refill_lead_seconds = lead
+    ctrl.last_activity_ts = time.time() - idle_for
+    return ctrl
+
+
+def test_rejected_offer_pushes_the_next_refill_out():
+    pool = AutonomousLinePool(size=2, retry_seconds=5.0)
+    assert pool.refill_due()
+    pool.remember("Hello there, anyone around?")
+
+    assert not pool.offer("hello there anyone around")    # repeats something said
+    assert not pool.offer("   ")
+    assert not pool.refill_due()
+    assert pool.next_refill_at() > time.time() + 4.0
+
+
+def test_full_pool_refills_when_its_oldest_line_expires():
+    pool = AutonomousLinePool(size=1, ttl_seconds=60.0)
+    assert pool.offer("What are you all up to tonight?")
+    created = pool.lines[0]["created_at"]
+    assert pool.next_refill_at() == created + 60.0
+    assert not pool.refill_due()
+
+
+def test_idle_deadline_in_the_future_after_a_rejected_line():
+    pool = AutonomousLinePool(size=3, retry_seconds=5.0)
+    ctrl = _controller(pool, idle_for=5.0)      # inside the refill window (22 - 20 s)
+    assert ctrl._idle_deadline() <= time.time()  # refill due now
+
+    pool.offer("")                               # LLM gave nothing usable
+    now = time.time()
+    assert now + 4.0 < ctrl._idle_deadline() <= ctrl.last_activity_ts + ctrl.silence_seconds
+
+
+def test_idle_deadline_never_after_the_silence_deadline():
+    pool = AutonomousLinePool(size=1, ttl_seconds=600.0)
+    pool.offer("Anyone still here?")
+    ctrl = _controller(pool, idle_for=5.0)
+    assert ctrl._idle_deadline() == ctrl.last_activity_ts + ctrl.silence_seconds
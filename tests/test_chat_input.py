@@ -0,0 +1,53 @@
+import time
+
+from chat_input import ChatFilter, InputDigest, parse_line
+
+
+def test_parse_line():
+    assert parse_line('{"author": "ann", "text": "hi"}') == ("ann", "hi")
+    assert parse_line("bob: hello there") == ("bob", "hello there")
+    assert parse_line("http://example.com is nice") == (None, "http://example.com is nice")
+    assert parse_line("   ") == (None, "")
+
+
+def test_filter_dedupes_per_author_and_across_authors():
+    f = ChatFilter(author_rate=10, author_burst=10, global_rate=100, global_burst=100, dedupe_seconds=30)
+    t0 = time.monotonic()
+    assert f.accept("ann", "Hello!", now=t0) is None
+    assert f.accept("ann", "hello", now=t0 + 1.0) == "duplicate"
+    assert f.accept("bob", "HELLO", now=t0 + 2.0) == "duplicate"     # spam wave
+    assert f.accept("bob", "hello", now=t0 + 40.0) is None
+    assert f.accept("ann", "  ", now=t0 + 41.0) == "empty"
+
+
+def test_filter_rate_limits():
+    f = ChatFilter(author_rate=0.5, author_burst=2, global_rate=0.1, global_burst=3, dedupe_seconds=0)
+    t0 = time.monotonic()
+    assert [f.accept("ann", f"msg {i}", now=t0) for i in range(3)] == [None, None, "author_rate"]
+    assert f.accept("ann", "later", now=t0 + 2.0) is None        # refilled one token
+    assert f.accept("bob", "one", now=t0 + 2.0) == "global_rate"  # fresh author, global burst used up
+    assert f.accept("bob", "two", now=t0 + 10.0) is None
+
+
+def test_digest_speech_first_then_ranked_chat():
+    d = InputDigest(max_messages=2, max_chars=200, half_life_seconds=10.0)
+    items = [
+        {"source": "microphone", "text": "first thing"},
+        {"source": "chat", "author": "ann", "text": "old", "timestamp": 80.0},
+        {"source": "chat", "author": "bob", "text": "mention", "timestamp": 90.0, "priority": 3.0},
+        {"source": "chat", "author": "ann", "text": "newer", "timestamp": 99.0},
+        {"source": "chat", "author": "cat", "text": "plain", "timestamp": 95.0},
+        {"source": "microphone", "text": "what do you think?"},
+    ]
+    text = d.merge(items, now=100.0)
+
+    assert text == "what do you think?\nUser also said earlier: first thing\nChat: bob: mention | ann: newer"
+    assert d.stats["dropped_author_repeat"] == 1
+    assert d.stats["dropped_cap"] == 1
+
+
+def test_digest_caps_characters():
+    d = InputDigest(max_messages=10, max_chars=20)
+    items = [{"source": "chat", "author": f"u{i}", "text": "x" * 8, "timestamp": 100.0} for i in range(5)]
+    text = d.merge(items, now=100.0)
+    assert text.startswith("Chat: ") and len(text.split(" | ")) == 1
@@ -0,0 +1,60 @@
+import pytest
+
+from event_bus import COALESCE, DROP_OLDEST, EventBus
+
+
+def test_drop_oldest_keeps_newest_events():
+    bus = EventBus()
+    sub = bus.subscribe("t", maxlen=3, policy=DROP_OLDEST)
+    for i in range(5):
+        bus.publish("tick", i, ts=float(i))
+
+    assert [v for _, v, _ in sub.drain()] == [2, 3, 4]
+    st = sub.stats()
+    assert st["delivered"] == 5 and st["dropped"] == 2 and st["buffered"] == 0
+
+
+def test_coalesce_keeps_one_slot_per_name():
+    bus = EventBus()
+    sub = bus.subscribe("t", maxlen=2, policy=COALESCE)
+    bus.publish("ai_talking", True)
+    bus.publish("emotion_label", "joy")
+    bus.publish("ai_talking", False)
+    bus.publish("emotion_label", "sadness")
+
+    assert [(n, v) for n, v, _ in sub.drain()] == [("ai_talking", False), ("emotion_label", "sadness")]
+    assert sub.coalesced == 2 and sub.dropped == 0
+
+    bus.publish("a", 1)
+    bus.publish("b", 2)
+    bus.publish("c", 3)     # new name, buffer full: oldest name goes
+    assert [n for n, _, _ in sub.drain()] == ["b", "c"]
+    assert sub.dropped == 1
+
+
+def test_topics_filter_and_notify():
+    bus = EventBus()
+    woken = []
+    sub = bus.subscribe("t", topics=("emotion_label",), notify=lambda: woken.append(1))
+    bus.publish("ai_talking", True)
+    bus.publish("emotion_label", "joy")
+
+    assert [n for n, _, _ in sub.drain()] == ["emotion_label"]
+    assert len(woken) == 1
+
+
+def test_get_times_out_and_close_unsubscribes():
+    bus = EventBus()
+    sub = bus.subscribe("t")
+    assert sub.get(timeout=0.01) is None
+    bus.publish("x", 1)
+    assert sub.get(timeout=0.01)[1] == 1
+
+    sub.close()
+    bus.publish("x", 2)
+    assert len(sub) == 0 and sub.get(timeout=0.01) is None
+
+
+def test_unknown_policy_rejected():
+    with pytest.raises(ValueError):
+        EventBus().subscribe("t", policy="drop_newest")
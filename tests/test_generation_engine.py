@@ -0,0 +1,76 @@
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from generation_engine import GenerationEngine
+
+SYSTEM_PROMPT = "You are a friendly virtual streamer."
+_CHAT_TEMPLATE = (
+    "{% for m in messages %}<|{{ m.role }}|>{{ m.content }}<|end|>{% endfor %}"
+    "{% if add_generation_prompt %}<|assistant|>{% endif %}"
+)
+
+
+@pytest.fixture(scope="module")
+def llm(tmp_path_factory):
+    """Tiny random Llama + byte-level tokenizer with a chat template, saved locally (no download)."""
+    import torch
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers
+    from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+
+    from llm_wrapper import LlamaWrapper
+
+    path = tmp_path_factory.mktemp("tiny_llama")
+    specials = ["<|end|>", "<|system|>", "<|user|>", "<|assistant|>"]
+    vocab = {c: i for i, c in enumerate(pre_tokenizers.ByteLevel.alphabet())}
+    tok = Tokenizer(models.BPE(vocab=vocab, merges=[]))
+    tok.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tok.decoder = decoders.ByteLevel()
+    tok.add_special_tokens(specials)
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=tok, eos_token="<|end|>", pad_token="<|end|>")
+    tokenizer.chat_template = _CHAT_TEMPLATE
+    tokenizer.save_pretrained(path)
+
+    torch.manual_seed(0)
+    config = LlamaConfig(
+        vocab_size=len(tokenizer), hidden_size=64, intermediate_size=128, num_hidden_layers=2,
+        num_attention_heads=4, num_key_value_heads=2, max_position_embeddings=1024,
+        eos_token_id=tokenizer.eos_token_id, pad_token_id=tokenizer.pad_token_id,
+        initializer_range=0.5,     # peaky logits: a wrong mask or position changes the greedy tokens
+    )
+    LlamaForCausalLM(config).save_pretrained(path)
+    return LlamaWrapper(model_name=str(path), draft_model_name="", load_in_4bit=False)
+
+
+def test_batched_rows_match_solo_greedy(llm):
+    prompts = [
+        ("Hi!", 4),
+        ("Tell me, in a few words, what you like most about streaming late at night.", 12),
+        ("What game is next?", 8),     # shorter than the batch: joins left-padded
+    ]
+    solo = [llm.generate(SYSTEM_PROMPT, p, max_new_tokens=n, temperature=0.0) for p, n in prompts]
+
+    # submitted before start(): all rows are admitted together, the short ones leave first
+    engine = GenerationEngine(llm, max_batch=4)
+    futures = [engine.submit(SYSTEM_PROMPT, p, max_new_tokens=n, temperature=0.0) for p, n in prompts]
+    engine.start()
+    try:
+        batched = [f.result(timeout=120) for f in futures]
+    finally:
+        engine.stop()
+
+    assert batched == solo and all(solo)
+    assert engine.stats["max_batch_seen"] == 3
+    assert len({f.stats["prompt_tokens"] for f in futures}) == 3     # left padding used
+
+
+def test_call_runs_on_the_engine_thread(llm):
+    import threading
+
+    engine = GenerationEngine(llm).start()
+    try:
+        assert engine.call(threading.get_ident).result(timeout=10) == engine._thread.ident
+        assert engine.prompt_overhead(SYSTEM_PROMPT) == llm.prompt_overhead(SYSTEM_PROMPT)
+    finally:
+        engine.stop()
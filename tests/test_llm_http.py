@@ -0,0 +1,29 @@
+import pytest
+
+pytest.importorskip("requests")
+
+from bench.fakes import StubChatServer
+from llm_http import OpenAIChatLLM
+
+
+@pytest.fixture
+def stub():
+    server = StubChatServer(tokens_per_s=1000.0, ttft_s=0.0, reply_tokens=5, fail_first=1).start()
+    yield server
+    server.stop()
+
+
+def test_streams_retries_and_reuses_the_connection(stub):
+    llm = OpenAIChatLLM(base_url=stub.url, backoff_seconds=0.01)
+    try:
+        deltas = []
+        text = llm.generate("sys", "hello", on_delta=deltas.append, history=[{"role": "user", "content": "hi"}])
+        assert text == "".join(deltas).strip() and len(text.split()) == 5
+        assert llm.last_stats["retries"] == 1       # first request got a 503
+        assert llm.last_stats["new_tokens"] == 5
+
+        llm.generate("sys", "again")
+        assert stub.counts["requests"] == 3 and stub.counts["failed"] == 1
+        assert stub.counts["connections"] <= 2     # both replies on one pooled connection
+    finally:
+        llm.stop()
@@ -0,0 +1,47 @@
+import pytest
+
+from pcm_ring import _RECORD, PcmRing
+
+
+@pytest.fixture
+def ring():
+    r = PcmRing.create(256)
+    yield r
+    r.close()
+
+
+def test_records_wrap_around_the_end(ring):
+    # 100-byte payloads (112-byte records) don't divide the capacity: every few puts straddle the end
+    for i in range(50):
+        pcm = bytes([i]) * 100
+        assert ring.put(pcm, stamp=float(i))
+        assert ring.get() == (pcm, float(i))
+    assert ring.get() is None
+    st = ring.stats()
+    assert st["written"] == 50 * (_RECORD.size + 100) and st["buffered"] == 0 and st["dropped"] == 0
+
+
+def test_full_ring_drops_instead_of_blocking(ring):
+    assert ring.put(b"\x01" * 100, 1.0)
+    assert ring.put(b"\x02" * 100, 2.0)
+    assert not ring.put(b"\x03" * 100, 3.0)     # 3 x 112 > 256
+    assert ring.stats()["dropped"] == 1
+
+    assert ring.get() == (b"\x01" * 100, 1.0)
+    assert ring.put(b"\x04" * 100, 4.0)          # room again, this one wraps
+    assert ring.get() == (b"\x02" * 100, 2.0)
+    assert ring.get() == (b"\x04" * 100, 4.0)
+
+
+def test_marker_and_attached_consumer(ring):
+    other = PcmRing.attach(ring.name)
+    try:
+        assert ring.put(b"", stamp=7.5)         # length 0 = marker
+        assert ring.put(b"\x05\x06", stamp=8.0)
+        assert other.capacity == ring.capacity
+        assert other.get() == (b"", 7.5)
+        assert other.get() == (b"\x05\x06", 8.0)
+        assert other.get() is None
+        assert ring.stats()["buffered"] == 0    # read position is shared
+    finally:
+        other.close()
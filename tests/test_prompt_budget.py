@@ -0,0 +1,67 @@
+from memory.prompt_budget import CHARS_PER_TOKEN, PromptBudget
+
+
+class _WordTokenizer:
+    """word = token, enough to check the budget arithmetic"""
+
+    def __init__(self):
+        self.vocab = {}
+        self.calls = 0
+
+    def __call__(self, text, add_special_tokens=False):
+        self.calls += 1
+        return {"input_ids": [self.vocab.setdefault(w, len(self.vocab)) for w in text.split()]}
+
+    def decode(self, ids, skip_special_tokens=True):
+        words = {i: w for w, i in self.vocab.items()}
+        return " ".join(words[i] for i in ids)
+
+
+def _budget(max_tokens, sections, reserved=0):
+    return PromptBudget(max_tokens=max_tokens, sections=sections, tokenizer=_WordTokenizer(), reserved_tokens=reserved)
+
+
+def test_sections_capped_and_ordered():
+    b = _budget(100, {"user": 6, "lore": 8})
+    prompt = b.assemble(
+        {
+            "lore": ("[LORE]: ", ["alpha beta gamma", "delta epsilon", "zeta eta theta iota"]),
+            "user": ("[USER]: ", "one two three four five six seven"),
+        },
+        order=["user", "lore"],
+    )
+    # user: 6 - header (1) - newline (1) = 4 tokens; lore: 8 - 2 = 6 -> 3 + (1 + 2), the third no longer fits
+    assert prompt == "[USER]: one two three four\n[LORE]: alpha beta gamma. delta epsilon"
+    assert b.last_report["sections"]["lore"] == {"tokens": 7, "kept": 2, "dropped": 1}
+    assert b.stats["truncated"] == 1
+
+
+def test_total_limit_wins_over_section_caps():
+    b = _budget(12, {"user": 10, "facts": 10}, reserved=2)
+    b.assemble({"user": ("[U]: ", "a b c d e f"), "facts": ("[F]: ", ["g h i", "j"])})
+    report = b.last_report
+    assert report["available"] == 10
+    assert report["sections"]["user"]["tokens"] == 8
+    assert report["sections"]["facts"] == {"tokens": 0, "kept": 0, "dropped": 2}
+    assert report["used"] <= report["available"]
+
+
+def test_oversized_best_entry_keeps_its_head():
+    b = _budget(100, {"lore": 5})
+    prompt = b.assemble({"lore": ("[L]: ", ["a b c d e f g", "h"])})
+    assert prompt == "[L]: a b c"
+
+
+def test_token_ids_cached():
+    b = _budget(100, {"facts": 50})
+    for _ in range(3):
+        b.assemble({"facts": ("[F]: ", ["likes cats", "lives in Budapest"])})
+    assert b.tokenizer.calls == 4   # header, 2 entries and the joined section, tokenized once
+    assert b.stats["hits"] > 0
+
+
+def test_estimates_without_tokenizer():
+    b = PromptBudget(max_tokens=100, sections={"user": 5})
+    assert b.count("x" * (3 * CHARS_PER_TOKEN + 1)) == 4
+    prompt = b.assemble({"user": ("", "aaaa bbbb cccc dddd eeee ffff")})
+    assert prompt == "aaaa bbbb cccc"     # 4 tokens ~ 16 chars, cut at a word boundary
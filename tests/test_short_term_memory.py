@@ -0,0 +1,69 @@
+import types
+
+import pytest
+
+pytest.importorskip("rapidfuzz")
+
+from memory import short_term_memory as stm_module
+from memory.short_term_memory import ShortTermMemory
+
+
+def _words(text):
+    return len(text.split())
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(stm_module, "time", types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def _turn(stm, i, max_tokens):
+    entry_id = stm.add_user_only(f"[USER]: question number {i} about the stream")
+    messages = stm.history(max_tokens, _words)
+    stm.set_ai_for_id(entry_id, f"answer number {i} with a few more words")
+    return messages
+
+
+def _rebuilds(prefixes):
+    """Turns whose history does not start with the previous turn's history."""
+    return sum(1 for prev, cur in zip(prefixes, prefixes[1:]) if cur[:len(prev)] != prev)
+
+
+def test_history_prefix_stable_under_expiry(clock):
+    stm = ShortTermMemory(retention_seconds=300)
+    prefixes = []
+    for i in range(40):
+        prefixes.append(_turn(stm, i, max_tokens=768))
+        clock[0] += 30
+
+    # a rebuild only when the window's oldest exchange expires, then it jumps forward
+    assert _rebuilds(prefixes) <= 6
+    assert stm.history_trims == _rebuilds(prefixes)
+    assert all(len(p) <= 20 for p in prefixes)
+
+
+def test_history_window_trims_to_low_watermark_on_overflow(clock):
+    stm = ShortTermMemory(retention_seconds=3600)
+    prefixes = []
+    for i in range(30):
+        prefixes.append(_turn(stm, i, max_tokens=200))
+        clock[0] += 5
+
+    assert stm.history_trims > 0
+    assert _rebuilds(prefixes) == stm.history_trims
+    for messages in prefixes:
+        assert sum(_words(m["content"]) for m in messages) + 10 * len(messages) // 2 <= 200
+
+
+def test_history_skips_incomplete_and_strips_user_tag(clock):
+    stm = ShortTermMemory()
+    done = stm.add_user_only("[USER]: hello there")
+    stm.set_ai_for_id(done, "hi!")
+    stm.add_user_only("[USER]: still waiting")
+
+    assert stm.history(768, _words) == [
+        {"role": "user", "content": "hello there"},
+        {"role": "assistant", "content": "hi!"},
+    ]
@@ -0,0 +1,45 @@
+import threading
+import time
+
+from signals import InputQueue, Signals
+
+
+def test_wait_for_wakes_on_signal_change():
+    signals = Signals(debug_print=False)
+    threading.Timer(0.05, lambda: setattr(signals, "user_talking", True)).start()
+    t0 = time.monotonic()
+    assert signals.wait_for(lambda: signals.user_talking, timeout=2.0)
+    assert time.monotonic() - t0 < 1.0
+
+
+def test_wait_for_times_out_with_last_value():
+    signals = Signals(debug_print=False)
+    t0 = time.monotonic()
+    assert signals.wait_for(lambda: signals.ai_talking, timeout=0.05) is False
+    assert 0.04 <= time.monotonic() - t0 < 1.0
+
+
+def test_input_queue_put_wakes_waiters():
+    signals = Signals(debug_print=False)
+    q = InputQueue(signals)
+    threading.Timer(0.05, lambda: q.put({"text": "hi"})).start()
+    assert signals.wait_for(lambda: not q.empty(), timeout=2.0)
+
+
+def test_slow_predicate_does_not_block_publishers():
+    signals = Signals(debug_print=False)
+    in_predicate = threading.Event()
+
+    def slow():
+        in_predicate.set()
+        time.sleep(0.3)
+        return signals.new_q
+
+    waiter = threading.Thread(target=signals.wait_for, args=(slow, 2.0))
+    waiter.start()
+    assert in_predicate.wait(1.0)
+    t0 = time.monotonic()
+    signals.new_q = True        # publisher: bus + notify
+    assert time.monotonic() - t0 < 0.1
+    waiter.join(2.0)
+    assert not waiter.is_alive()
@@ -0,0 +1,96 @@
+import socket
+import time
+
+import pytest
+
+pytest.importorskip("websockets")
+
+from bench.fakes import MockVTSServer
+from signals import Signals
+from vtube_studio import VTubeStudioController
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+@pytest.fixture
+def make_controller(tmp_path):
+    controllers = []
+
+    def make(url, **kwargs):
+        args = dict(url=url, token_path=str(tmp_path / "token.txt"), request_timeout=0.3,
+                    reconnect_min_sec=0.05, reconnect_max_sec=0.2)
+        args.update(kwargs)
+        ctrl = VTubeStudioController(Signals(debug_print=False), **args)
+        ctrl.start()
+        controllers.append(ctrl)
+        return ctrl
+
+    yield make
+    for ctrl in controllers:
+        ctrl.stop()
+        ctrl._thread.join(timeout=5.0)
+
+
+def test_backoff_keeps_the_newest_emotion_and_hotkey_for_the_reconnect(make_controller):
+    port = _free_port()
+    ctrl = make_controller(f"ws://127.0.0.1:{port}")
+    assert _wait(lambda: ctrl.stats["reconnects"] >= 2)      # nobody listening yet
+    ctrl.trigger_emotion("joy")
+    ctrl.trigger_emotion("anger")
+    ctrl.trigger_hotkey("wave")
+    ctrl.trigger_hotkey("bow")
+
+    server = MockVTSServer(port=port).start()
+    try:
+        assert _wait(lambda: ctrl._last_seen_emotion == "anger")
+        assert _wait(lambda: "bow" in server.hotkeys)
+        assert sorted(server.hotkeys) == ["bow", "exp_anger"]
+        assert ctrl.connected
+    finally:
+        server.stop()
+
+
+def test_emotion_updates_coalesce_while_a_request_is_in_flight(make_controller):
+    server = MockVTSServer(latency_s=0.2).start()
+    try:
+        ctrl = make_controller(server.url, request_timeout=2.0)
+        assert _wait(lambda: ctrl.connected)
+        for emotion in ("joy", "anger", "fear", "sadness"):
+            ctrl.trigger_emotion(emotion)
+        ctrl.trigger_emotion("sadness")
+
+        assert _wait(lambda: ctrl._last_seen_emotion == "sadness")
+        assert server.hotkeys[-1] == "exp_sadness"
+        assert len(server.hotkeys) <= 2 and ctrl.stats["coalesced"] >= 3
+    finally:
+        server.stop()
+
+
+def test_unconfirmed_emotion_is_sent_again_after_reconnect(make_controller):
+    server = MockVTSServer(drop_hotkeys=1).start()
+    try:
+        ctrl = make_controller(server.url)
+        assert _wait(lambda: ctrl.connected)
+        ctrl.trigger_emotion("joy")
+        assert _wait(lambda: ctrl.stats["errors"] == 1)     # no response: timed out
+        assert ctrl._last_seen_emotion is None
+
+        server.kick()
+        assert _wait(lambda: ctrl._last_seen_emotion == "joy")
+        assert server.hotkeys == ["exp_joy", "exp_joy"]
+        assert ctrl.stats["reconnects"] >= 1
+    finally:
+        server.stop()
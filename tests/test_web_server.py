@@ -0,0 +1,69 @@
+import asyncio
+import json
+
+from event_bus import DROP_OLDEST
+from signals import Signals
+from web_server import WebFrontendServer, _Client
+
+
+class _FastWs:
+    def __init__(self):
+        self.sent = []
+        self.closed = None
+
+    async def send(self, msg):
+        self.sent.append(json.loads(msg))
+
+    async def close(self, code=1000, reason=""):
+        self.closed = code
+
+
+class _StalledWs(_FastWs):
+    async def send(self, msg):
+        await asyncio.Event().wait()    # never returns: the tab stopped reading
+
+
+async def _burst(n_events, queue_size=256):
+    signals = Signals(debug_print=False)
+    server = WebFrontendServer(signals, client_queue_size=queue_size)
+    server._wake = asyncio.Event()
+    server._sub = signals.subscribe("web", maxlen=server.bus_buffer, policy=DROP_OLDEST)
+
+    fast = _Client(_FastWs(), queue_size)
+    stalled = _Client(_StalledWs(), queue_size)
+    for client in (fast, stalled):
+        server._clients.add(client)
+        server._enqueue(client, json.dumps({"type": "snapshot", "state": {}}))
+        client.sender = asyncio.create_task(server._sender(client))
+    await asyncio.sleep(0)
+
+    broadcaster = asyncio.create_task(server._broadcast_loop())
+    for i in range(n_events):
+        signals.publish("reply_delta", i)
+    server._wake.set()
+    for _ in range(50):
+        await asyncio.sleep(0)
+    broadcaster.cancel()
+    for client in (fast, stalled):
+        client.sender.cancel()
+    await asyncio.sleep(0)
+    return server, fast, stalled
+
+
+def test_burst_keeps_fast_client_and_evicts_stalled_one():
+    server, fast, stalled = asyncio.run(_burst(300))
+
+    assert not fast.evicted and fast in server._clients
+    assert fast.ws.closed is None
+    assert [m["value"] for m in fast.ws.sent if m["type"] == "event"] == list(range(300))
+
+    assert stalled.evicted and stalled not in server._clients
+    assert stalled.ws.closed == 1013
+    assert server.stats["evicted"] == 1
+
+
+def test_burst_within_queue_size_evicts_nobody():
+    server, fast, stalled = asyncio.run(_burst(100))
+    assert server.stats["evicted"] == 0
+    assert not stalled.evicted
+    assert len(fast.ws.sent) == 101
@@ -0,0 +1,142 @@
+"""
+Lightweight per-turn tracing for the AgentController pipeline.
+
+One Turn per processed input (or autonomous line), one span per stage (A-J).
+Every span also goes into a rolling histogram per stage name, so p50/p95/p99
+are always available in memory. Cost per span: two perf_counter() calls and a
+deque append, cheap enough to leave on in production.
+"""
+
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+
+def _quantile(sorted_values, q):
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+class Histogram:
+    """Rolling window of the last `window` samples (seconds)."""
+
+    def __init__(self, window=1024):
+        self.samples = deque(maxlen=int(window))
+        self.count = 0      # all-time
+
+    def add(self, value):
+        self.samples.append(float(value))
+        self.count += 1
+
+    def summary(self):
+        values = sorted(self.samples)
+        if not values:
+            return {"count": self.count, "window": 0}
+        return {
+            "count": self.count,
+            "window": len(values),
+            "mean": sum(values) / len(values),
+            "p50": _quantile(values, 0.50),
+            "p95": _quantile(values, 0.95),
+            "p99": _quantile(values, 0.99),
+            "max": values[-1],
+        }
+
+
+class Turn:
+    def __init__(self, turn_id, kind):
+        self.id = turn_id
+        self.kind = kind
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.spans = {}     # stage -> seconds
+        self.attrs = {}     # token counts, text lengths, ...
+        self.total = None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "started_at": self.started_at,
+            "total_s": self.total,
+            "spans": dict(self.spans),
+            "attrs": dict(self.attrs),
+        }
+
+
+class _Span:
+    __slots__ = ("tracer", "turn", "name", "t0")
+
+    def __init__(self, tracer, turn, name):
+        self.tracer = tracer
+        self.turn = turn
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.tracer.record(self.turn, self.name, time.perf_counter() - self.t0)
+        return False
+
+
+class Tracer:
+    def __init__(self, enabled=True, window=1024, keep_turns=200):
+        self.enabled = bool(enabled)
+        self.window = int(window)
+        self.histograms = {}
+        self.turns = deque(maxlen=int(keep_turns))
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()   # only for creating histograms
+
+    def start_turn(self, kind="user"):
+        turn = Turn(next(self._ids), kind)
+        if self.enabled:
+            self.turns.append(turn)
+        return turn
+
+    def span(self, turn, name):
+        return _Span(self, turn, name)
+
+    def record(self, turn, name, seconds):
+        """Also usable from other threads (e.g. TTS playback callbacks)."""
+        if not self.enabled or seconds is None:
+            return
+        if turn is not None:
+            turn.spans[name] = seconds
+        hist = self.histograms.get(name)
+        if hist is None:
+            with self._lock:
+                hist = self.histograms.setdefault(name, Histogram(self.window))
+        hist.add(seconds)
+
+    def set(self, turn, **attrs):
+        if self.enabled and turn is not None:
+            turn.attrs.update(attrs)
+
+    def end_turn(self, turn):
+        turn.total = time.perf_counter() - turn._t0
+        self.record(None, f"turn_{turn.kind}", turn.total)
+
+    def summary(self):
+        return {name: h.summary() for name, h in list(self.histograms.items())}
+
+    def to_dict(self, include_turns=True):
+        out = {"generated_at": time.time(), "stages": self.summary()}
+        if include_turns:
+            out["turns"] = [t.to_dict() for t in list(self.turns)]
+        return out
+
+    def to_json(self, include_turns=True):
+        return json.dumps(self.to_dict(include_turns), indent=2)
+
+    def dump(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_json())
@@ -0,0 +1,160 @@
+"""
+Content-addressed cache of synthesized speech (shared by all TTS engines).
+
+key = sha256(text, engine, voice, speed, emotion tag)
+
+Greetings, catchphrases and autonomous re-engagement lines repeat a lot, so a hit
+skips the GPU synthesis (Coqui/Kokoro/Orpheus) or the paid API call (ElevenLabs)
+and goes straight to the AudioOutput.
+
+Storage: one int16 WAV per key on disk, LRU order kept in an in-memory index
+(rebuilt from file mtimes on startup), total size bounded by max_bytes.
+"""
+
+import hashlib
+import os
+import threading
+import wave
+from collections import OrderedDict
+
+
+class AudioCache:
+    def __init__(self, cache_dir="cache/tts/pcm", max_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_bytes)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._index = OrderedDict()     # key -> file size (oldest first)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._load_index()
+
+    @staticmethod
+    def make_key(text, engine, voice=None, speed=None, emotion=None):
+        parts = [
+            (text or "").strip(),
+            str(engine or ""),
+            str(voice or ""),
+            "" if speed is None else f"{float(speed):.3f}",
+            str(emotion or ""),
+        ]
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    # Public API
+    def get(self, key):
+        """Returns (pcm_int16_bytes, sample_rate, channels) or None."""
+        with self._lock:
+            if key not in self._index:
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+        path = self._path(key)
+        try:
+            with wave.open(path, "rb") as wf:
+                pcm = wf.readframes(wf.getnframes())
+                rate = wf.getframerate()
+                channels = wf.getnchannels()
+            os.utime(path)  # persist LRU order across restarts
+        except (OSError, EOFError, wave.Error):
+            self._drop(key)
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return pcm, rate, channels
+
+    def put(self, key, pcm, sample_rate, channels):
+        """Stores int16 PCM. Writes to a temp file first, so readers never see partial audio."""
+        if not pcm:
+            return
+        path = self._path(key)
+        tmp = path + ".tmp"
+        try:
+            with wave.open(tmp, "wb") as wf:
+                wf.setnchannels(int(channels))
+                wf.setsampwidth(2)
+                wf.setframerate(int(sample_rate))
+                wf.writeframes(pcm)
+            os.replace(tmp, path)
+            size = os.path.getsize(path)
+        except OSError as e:
+            print(f"[AudioCache] ERROR: write failed: {e}")
+            return
+
+        with self._lock:
+            old = self._index.pop(key, None)
+            if old is not None:
+                self._bytes -= old
+            self._index[key] = size
+            self._bytes += size
+        self._evict()
+
+    def contains(self, key):
+        with self._lock:
+            return key in self._index
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "entries": len(self._index),
+                "bytes_stored": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    # Internal
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.wav")
+
+    def _load_index(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith(".tmp"):
+                try:
+                    os.remove(path)  # leftover from a crash mid-write
+                except OSError:
+                    pass
+                continue
+            if not name.endswith(".wav"):
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, name[:-4], st.st_size))
+        entries.sort()
+        for _, key, size in entries:
+            self._index[key] = size
+            self._bytes += size
+        self._evict()
+
+    def _evict(self):
+        victims = []
+        with self._lock:
+            while self._bytes > self.max_bytes and self._index:
+                key, size = self._index.popitem(last=False)
+                self._bytes -= size
+                victims.append(key)
+        for key in victims:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def _drop(self, key):
+        with self._lock:
+            size = self._index.pop(key, None)
+            if size is not None:
+                self._bytes -= size
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
@@ -0,0 +1,360 @@
+"""
+Shared audio output for every TTS engine.
+
+Engines only produce PCM chunks. They push them into an AudioOutput, which owns
+ONE long-lived sink per output device (opening a PyAudio stream costs latency and
+causes clicks, so we never reopen it per utterance).
+
+- chunks are converted to the output format (dtype, channels, sample rate)
+- a single writer thread drains the frame queue into the sink
+- signals.ai_talking flips exactly when the first chunk hits the sink and when the
+  utterance end marker is reached (not when synthesis starts/ends)
+
+Sinks:
+- "pyaudio": real output device (stream stays open for the whole session)
+- "null":    discards audio, but paces in real time (headless runs keep timings)
+- "wav":     writes everything to a WAV file (headless runs you can listen to later)
+"""
+
+import os
+import queue
+import threading
+import time
+import wave
+
+import numpy as np
+
+
+# Sinks
+class NullSink:
+    """Discards audio. With realtime=True, write() blocks for the chunk duration."""
+
+    def __init__(self, sample_rate, channels, realtime=True):
+        self.sample_rate = int(sample_rate)
+        self.channels = int(channels)
+        self.realtime = bool(realtime)
+
+    def write(self, data):
+        if self.realtime and data:
+            frames = len(data) // (2 * self.channels)
+            time.sleep(frames / float(self.sample_rate))
+
+    def close(self):
+        pass
+
+
+class WavFileSink:
+    """Appends all played audio to one WAV file (int16)."""
+
+    def __init__(self, path, sample_rate, channels, realtime=False):
+        self.sample_rate = int(sample_rate)
+        self.channels = int(channels)
+        self.realtime = bool(realtime)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._wf = wave.open(path, "wb")
+        self._wf.setnchannels(self.channels)
+        self._wf.setsampwidth(2)
+        self._wf.setframerate(self.sample_rate)
+
+    def write(self, data):
+        if not data:
+            return
+        self._wf.writeframes(data)
+        if self.realtime:
+            frames = len(data) // (2 * self.channels)
+            time.sleep(frames / float(self.sample_rate))
+
+    def close(self):
+        try:
+            self._wf.close()
+        except Exception:
+            pass
+
+
+class PyAudioSink:
+    """One PyAudio session + one output stream, opened once and kept open."""
+
+    def __init__(self, sample_rate, channels, output_device_index=None, frames_per_buffer=1024):
+        import pyaudio
+
+        self.sample_rate = int(sample_rate)
+        self.channels = int(channels)
+        self._pa = pyaudio.PyAudio()
+        self._stream = self._pa.open(
+            format=pyaudio.paInt16,
+            channels=self.channels,
+            rate=self.sample_rate,
+            output=True,
+            output_device_index=output_device_index,
+            frames_per_buffer=int(frames_per_buffer),
+        )
+        try:
+            self.latency = float(self._stream.get_output_latency())
+        except Exception:
+            self.latency = 0.0
+
+    def write(self, data):
+        if data:
+            self._stream.write(data)  # blocking, paced by the device
+
+    def close(self):
+        try:
+            self._stream.stop_stream()
+            self._stream.close()
+        except Exception:
+            pass
+        try:
+            self._pa.terminate()
+        except Exception:
+            pass
+
+
+def build_sink(kind, sample_rate, channels, output_device_index=None,
+               wav_path="cache/tts/output.wav", frames_per_buffer=1024):
+    kind = (kind or "pyaudio").strip().lower()
+    if kind == "pyaudio":
+        return PyAudioSink(sample_rate, channels, output_device_index, frames_per_buffer)
+    if kind == "null":
+        return NullSink(sample_rate, channels, realtime=True)
+    if kind == "wav":
+        return WavFileSink(wav_path, sample_rate, channels)
+    raise ValueError(f"Unknown audio sink: {kind}")
+
+
+# Format conversion
+def convert_pcm(data, src_rate, src_channels, src_dtype, dst_rate, dst_channels):
+    """
+    bytes (int16 / float32, any channels, any rate) -> int16 bytes in the output format.
+    Resampling is linear interpolation (good enough for speech).
+    """
+    if not data:
+        return b""
+    src_dtype = (src_dtype or "int16").lower()
+    if src_dtype == "float32":
+        samples = np.frombuffer(data, dtype=np.float32)
+        samples = np.clip(samples, -1.0, 1.0) * 32767.0
+    else:
+        samples = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+
+    src_channels = max(1, int(src_channels))
+    usable = (len(samples) // src_channels) * src_channels
+    samples = samples[:usable].reshape(-1, src_channels)
+
+    # channels
+    if src_channels != dst_channels:
+        mono = samples.mean(axis=1, keepdims=True)
+        samples = np.repeat(mono, dst_channels, axis=1)
+
+    # sample rate
+    if int(src_rate) != int(dst_rate) and len(samples) > 1:
+        n_out = max(1, int(round(len(samples) * float(dst_rate) / float(src_rate))))
+        x_old = np.arange(len(samples), dtype=np.float64)
+        x_new = np.linspace(0, len(samples) - 1, n_out)
+        samples = np.stack(
+            [np.interp(x_new, x_old, samples[:, c]) for c in range(samples.shape[1])],
+            axis=1,
+        )
+
+    return np.clip(samples, -32768, 32767).astype(np.int16).tobytes()
+
+
+class AudioOutput:
+    _STOP = object()
+
+    def __init__(
+        self,
+        signals=None,
+        sink=None,
+        *,
+        sample_rate=24000,
+        channels=1,
+        frames_per_chunk=1024,
+    ):
+        self.signals = signals
+        self.sample_rate = int(sample_rate)
+        self.channels = int(channels)
+        self.frames_per_chunk = int(frames_per_chunk)
+        self.sink = sink if sink is not None else NullSink(self.sample_rate, self.channels)
+
+        # items: (generation, kind, payload), kind = "pcm" | "begin" | "end"
+        self._q = queue.Queue()
+        self._generation = 0    # bumped by flush(), stale items are skipped
+        self._playing = False
+        self._listeners = []    # objects with optional on_start() / on_stop() / on_chunk(pcm, play_start)
+
+        self._thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._thread.start()
+
+    # Public API
+    @property
+    def playing(self):
+        return self._playing
+
+    def add_listener(self, listener):
+        """
+        on_chunk(pcm, play_start) runs on the writer thread after each sink write;
+        play_start is the time.monotonic() at which the chunk becomes audible.
+        """
+        self._listeners.append(listener)
+
+    def write(self, data, *, sample_rate=None, channels=None, dtype="int16"):
+        """Queue a PCM chunk (any format). Returns immediately."""
+        if not data:
+            return
+        pcm = convert_pcm(
+            data,
+            sample_rate or self.sample_rate,
+            channels or self.channels,
+            dtype,
+            self.sample_rate,
+            self.channels,
+        )
+        # split into device-sized chunks so flush()/stop reacts quickly
+        step = self.frames_per_chunk * 2 * self.channels
+        gen = self._generation
+        for i in range(0, len(pcm), step):
+            self._q.put((gen, "pcm", pcm[i:i + step]))
+
+    def begin(self, callback):
+        """callback(ts) runs on the writer thread right before the next chunk hits the sink."""
+        self._q.put((self._generation, "begin", callback))
+
+    def end(self, callback=None):
+        """
+        Marks the end of an utterance. ai_talking goes False once everything before
+        this marker has actually been played (and nothing else is queued).
+        callback(played) runs on the writer thread; played=False if it was flushed.
+        """
+        self._q.put((self._generation, "end", callback))
+
+    def flush(self):
+        """Drop everything that is queued but not yet written."""
+        self._generation += 1
+        try:
+            while True:
+                item = self._q.get_nowait()
+                if item is not self._STOP and item[1] == "end":
+                    self._run_end_callback(item[2], played=False)
+        except queue.Empty:
+            pass
+        self._q.put((self._generation, "end", None))  # resets ai_talking on the writer thread
+
+    def close(self):
+        self.flush()
+        self._q.put(self._STOP)
+        self._thread.join(timeout=2.0)
+        try:
+            self.sink.close()
+        except Exception:
+            pass
+
+    # Writer thread
+    def _writer_loop(self):
+        while True:
+            item = self._q.get()
+            if item is self._STOP:
+                self._set_playing(False)
+                return
+
+            gen, kind, payload = item
+            stale = gen != self._generation
+
+            if kind == "begin":
+                if not stale:
+                    try:
+                        payload(time.time())
+                    except Exception as e:
+                        print(f"[AudioOutput] ERROR in begin callback: {e}")
+                continue
+
+            if kind == "end":
+                if not stale and self._q.empty():
+                    # let the device drain its own buffer before reporting "stopped"
+                    latency = float(getattr(self.sink, "latency", 0.0) or 0.0)
+                    if self._playing and latency > 0:
+                        time.sleep(latency)
+                    self._set_playing(False)
+                self._run_end_callback(payload, played=not stale)
+                continue
+
+            if stale:
+                continue
+            if not self._playing:
+                self._set_playing(True)
+            try:
+                self.sink.write(payload)
+            except Exception as e:
+                print(f"[AudioOutput] ERROR: sink write failed: {e}")
+                continue
+            if not self._listeners:
+                continue
+            # write() returns once the chunk is in the device buffer (or, for the
+            # null sink, once it has been "played"): it ends `latency` from now
+            duration = len(payload) / float(2 * self.channels * self.sample_rate)
+            latency = float(getattr(self.sink, "latency", 0.0) or 0.0)
+            play_start = time.monotonic() + latency - duration
+            for l in self._listeners:
+                cb = getattr(l, "on_chunk", None)
+                if cb:
+                    try:
+                        cb(payload, play_start)
+                    except Exception:
+                        pass
+
+    def _run_end_callback(self, callback, played):
+        if callback is None:
+            return
+        try:
+            callback(played)
+        except Exception as e:
+            print(f"[AudioOutput] ERROR in end callback: {e}")
+
+    def _set_playing(self, value):
+        if value == self._playing:
+            return
+        self._playing = value
+        if self.signals is not None:
+            self.signals.ai_talking = value
+        name = "on_start" if value else "on_stop"
+        for l in self._listeners:
+            cb = getattr(l, name, None)
+            if cb:
+                try:
+                    cb()
+                except Exception:
+                    pass
+
+
+# one output per device
+_OUTPUTS = {}
+_OUTPUTS_LOCK = threading.Lock()
+
+
+def get_audio_output(signals, output_device_index=None, cfg=None):
+    """Returns the shared AudioOutput for a device (created on first use)."""
+    cfg = cfg or {}
+    kind = (cfg.get("sink") or "pyaudio").strip().lower()
+    key = (kind, output_device_index)
+    with _OUTPUTS_LOCK:
+        out = _OUTPUTS.get(key)
+        if out is None:
+            sample_rate = int(cfg.get("sample_rate", 24000))
+            channels = int(cfg.get("channels", 1))
+            frames_per_chunk = int(cfg.get("frames_per_chunk", 1024))
+            sink = build_sink(
+                kind,
+                sample_rate,
+                channels,
+                output_device_index=output_device_index,
+                wav_path=cfg.get("wav_path", "cache/tts/output.wav"),
+                frames_per_buffer=frames_per_chunk,
+            )
+            out = AudioOutput(
+                signals,
+                sink,
+                sample_rate=sample_rate,
+                channels=channels,
+                frames_per_chunk=frames_per_chunk,
+            )
+            _OUTPUTS[key] = out
+        return out
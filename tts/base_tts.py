@@ -1,13 +1,380 @@
 from __future__ import annotations
 
+import itertools
+import threading
+import time
+from collections import deque
+
+from .audio_output import get_audio_output, convert_pcm
+
+# pyaudio.paFloat32 (avoid importing pyaudio here)
+_PA_FLOAT32 = 1
+
+# what speak() does when something is already queued/playing
+POLICY_QUEUE = "queue"                  # play after everything before it
+POLICY_REPLACE = "replace"              # cut current + pending, play this now
+POLICY_DROP_IF_BUSY = "drop_if_busy"    # ignore this one while busy
+POLICIES = (POLICY_QUEUE, POLICY_REPLACE, POLICY_DROP_IF_BUSY)
+
+_utterance_ids = itertools.count(1)
+
+
+class Utterance:
+    """One speak() request. Timestamps are time.time(), None until reached."""
+
+    def __init__(self, text, emotion_label=None, on_start=None, on_done=None):
+        self.id = next(_utterance_ids)
+        self.text = text
+        self.emotion_label = emotion_label
+        self.on_start = on_start    # on_start(utterance): first audio hits the device
+        self.on_done = on_done      # on_done(utterance): played / dropped / cancelled / failed
+
+        self.status = "queued"      # queued | synthesizing | played | rendered | dropped | cancelled | failed
+        self.cached = False
+        self.render_only = False    # prerender(): synthesize into the cache, play nothing
+        self.enqueued_at = time.time()
+        self.synth_started_at = None
+        self.first_chunk_at = None  # first synthesized chunk
+        self.playback_started_at = None
+        self.finished_at = None
+
+        self._cancelled = False
+        self._done = False
+
+    @property
+    def queue_wait(self):
+        if self.synth_started_at is None:
+            return None
+        return self.synth_started_at - self.enqueued_at
+
+    @property
+    def synth_to_playback(self):
+        if self.first_chunk_at is None or self.playback_started_at is None:
+            return None
+        return self.playback_started_at - self.first_chunk_at
+
+
 class BaseTTS:
-    def __init__(self, signals, output_device_index=None):
+    """
+    Engines only synthesize: _synthesize() pushes PCM chunks to on_chunk.
+    Playback always goes through the shared AudioOutput (one device stream for all engines).
+
+    Utterances are handled by ONE worker thread in order, so replies never overlap
+    or truncate each other by accident. Synthesis of the next utterance can overlap
+    playback of the previous one (the AudioOutput queue keeps the order).
+    """
+
+    def __init__(self, signals, output_device_index=None, audio_output=None):
         self.signals = signals
         self.output_device_index = output_device_index
         self.enabled = True
+        self.audio = audio_output if audio_output is not None else get_audio_output(signals, output_device_index)
+
+        # (sample_rate, channels, dtype) of the chunks _synthesize() produces
+        self.audio_format = (24000, 1, "int16")
+        self._stop_requested = False
+
+        # optional AudioCache (set by build_tts), hits skip synthesis entirely
+        self.cache = None
 
+        # utterance queue
+        self.policy = POLICY_QUEUE
+        self._cv = threading.Condition()
+        self._pending = deque()
+        self._current = None        # being synthesized
+        self._inflight = {}         # id -> utterance synthesized, not finished playing
+        self._worker = None
+
+        # metrics (seconds, most recent last)
+        self.metrics = {
+            "utterances": 0,
+            "played": 0,
+            "dropped": 0,
+            "cancelled": 0,
+            "cache_hits": 0,
+            "prerendered": 0,
+            "queue_wait": deque(maxlen=200),
+            "synth_to_playback": deque(maxlen=200),
+        }
+
+    # Public API
     def play(self, text: str, emotion_label = None):
-        raise NotImplementedError
+        self.speak(text, emotion_label=emotion_label)
+
+    def speak(self, text, emotion_label=None, policy=None, on_start=None, on_done=None):
+        """
+        Queue an utterance. Returns its id, or None if nothing was queued
+        (disabled, empty text, or dropped by drop_if_busy).
+        """
+        if not self.enabled:
+            return None
+        text = (text or "").strip()
+        if not text:
+            return None
+        policy = (policy or self.policy or POLICY_QUEUE).strip().lower()
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown TTS policy: {policy}")
+
+        utt = Utterance(text, emotion_label, on_start=on_start, on_done=on_done)
+        self.metrics["utterances"] += 1
+
+        if policy == POLICY_DROP_IF_BUSY and self.busy:
+            self._finish(utt, "dropped")
+            return None
+        if policy == POLICY_REPLACE:
+            self._cancel_all()
+
+        with self._cv:
+            self._stop_requested = False
+            # real speech never waits behind prerendering
+            rendering = [u for u in self._pending if u.render_only]
+            if rendering:
+                self._pending = deque(u for u in self._pending if not u.render_only)
+            current = self._current
+            if current is not None and current.render_only:
+                current._cancelled = True
+            else:
+                current = None
+            self._pending.append(utt)
+            self._ensure_worker()
+            self._cv.notify()
+        for u in rendering:
+            self._finish(u, "cancelled")
+        if current is not None:
+            try:
+                self._cancel_synthesis()
+            except Exception:
+                pass
+        return utt.id
+
+    def prerender(self, text, emotion_label=None):
+        """
+        Synthesize into the cache only (nothing is played), so a later speak() of the
+        same text is a cache hit. Runs on the utterance worker when it has nothing else
+        to do; queued speech cancels it. Returns its id, or None if there is no cache
+        or the audio is cached already.
+        """
+        text = (text or "").strip()
+        key = self._cache_key(text, emotion_label)
+        if not self.enabled or not text or key is None or self.cache.contains(key):
+            return None
+        utt = Utterance(text, emotion_label)
+        utt.render_only = True
+        with self._cv:
+            self._pending.append(utt)
+            self._ensure_worker()
+            self._cv.notify()
+        return utt.id
+
+    @property
+    def busy(self):
+        with self._cv:
+            current = self._current is not None and not self._current.render_only
+            return bool(current or self._inflight or any(not u.render_only for u in self._pending))
+
+    def queue_depth(self):
+        with self._cv:
+            return len(self._pending)
+
+    def stats(self):
+        def avg(values):
+            values = list(values)
+            return (sum(values) / len(values)) if values else None
+
+        m = self.metrics
+        return {
+            "utterances": m["utterances"],
+            "played": m["played"],
+            "dropped": m["dropped"],
+            "cancelled": m["cancelled"],
+            "cache_hits": m["cache_hits"],
+            "prerendered": m["prerendered"],
+            "queue_depth": self.queue_depth(),
+            "queue_wait_avg_s": avg(m["queue_wait"]),
+            "synth_to_playback_avg_s": avg(m["synth_to_playback"]),
+        }
 
     def stop(self):
-        raise NotImplementedError
\ No newline at end of file
+        self._stop_requested = True
+        self._cancel_all()
+
+    def warm_up(self, text="Hello."):
+        """Dummy synthesis into a null sink (nothing is played, ai_talking is untouched)."""
+        self._synthesize(text, None, lambda data: None)
+
+    # Engine hooks
+    def _synthesize(self, text, emotion_label, on_chunk):
+        """Blocking. Calls on_chunk(pcm_bytes) in self.audio_format until done."""
+        raise NotImplementedError
+
+    def _cancel_synthesis(self):
+        pass
+
+    def _synthesis_cancelled(self):
+        """For engines that poll: True if the utterance being synthesized was cut."""
+        current = self._current
+        return self._stop_requested or (current is not None and current._cancelled)
+
+    def _cache_identity(self, emotion_label):
+        """(engine, voice, speed, emotion_tag) - everything besides text that changes the audio."""
+        return (type(self).__name__, None, None, None)
+
+    # Internal
+    def _cache_key(self, text, emotion_label):
+        if self.cache is None:
+            return None
+        engine, voice, speed, emotion = self._cache_identity(emotion_label)
+        return self.cache.make_key(text, engine, voice, speed, emotion)
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._worker_loop, daemon=True)
+            self._worker.start()
+
+    def _worker_loop(self):
+        while True:
+            with self._cv:
+                while not self._pending:
+                    self._cv.wait()
+                utt = self._pending.popleft()
+                self._current = utt
+            try:
+                self._run_utterance(utt)
+            finally:
+                with self._cv:
+                    self._current = None
+
+    def _cancel_all(self):
+        with self._cv:
+            dropped = list(self._pending)
+            self._pending.clear()
+            current = self._current
+            if current is not None:
+                current._cancelled = True
+        for utt in dropped:
+            self._finish(utt, "cancelled")
+        if current is not None:
+            try:
+                self._cancel_synthesis()
+            except Exception:
+                pass
+        self.audio.flush()  # in-flight utterances get their end callback with played=False
+
+    def _run_utterance(self, utt):
+        if utt.render_only:
+            return self._render_utterance(utt)
+        rate, channels, dtype = self.audio_format
+        key = self._cache_key(utt.text, utt.emotion_label)
+        recorded = [] if key is not None else None
+        utt.status = "synthesizing"
+        utt.synth_started_at = time.time()
+        self.metrics["queue_wait"].append(utt.queue_wait)
+
+        def on_playback_start(ts):
+            utt.playback_started_at = ts
+            lag = utt.synth_to_playback
+            if lag is not None:
+                self.metrics["synth_to_playback"].append(lag)
+            if utt.on_start:
+                try:
+                    utt.on_start(utt)
+                except Exception as e:
+                    print(f"[{type(self).__name__}] ERROR in on_start: {e}")
+
+        def write(data, sample_rate, n_channels, sample_dtype="int16"):
+            if utt.first_chunk_at is None:
+                utt.first_chunk_at = time.time()
+                self.audio.begin(on_playback_start)
+            self.audio.write(data, sample_rate=sample_rate, channels=n_channels, dtype=sample_dtype)
+
+        def on_chunk(data):
+            if utt._cancelled or self._stop_requested or not data:
+                return
+            write(data, rate, channels, dtype)
+            if recorded is not None:
+                recorded.append(data)
+
+        with self._cv:
+            self._inflight[utt.id] = utt
+        failed = False
+        try:
+            hit = self.cache.get(key) if key is not None else None
+            if hit is not None:
+                utt.cached = True
+                self.metrics["cache_hits"] += 1
+                pcm, hit_rate, hit_channels = hit
+                if not utt._cancelled:
+                    write(pcm, hit_rate, hit_channels)
+            else:
+                self._synthesize(utt.text, utt.emotion_label, on_chunk)
+
+                # only complete utterances go to the cache
+                if recorded and not utt._cancelled and not self._stop_requested:
+                    pcm = convert_pcm(b"".join(recorded), rate, channels, dtype, rate, channels)
+                    self.cache.put(key, pcm, rate, channels)
+        except Exception as e:
+            failed = True
+            print(f"[{type(self).__name__}] ERROR in play(): {e}")
+        finally:
+            def on_end(played):
+                with self._cv:
+                    self._inflight.pop(utt.id, None)
+                if failed and utt.first_chunk_at is None:
+                    status = "failed"
+                elif played and not utt._cancelled:
+                    status = "played"
+                else:
+                    status = "cancelled"
+                self._finish(utt, status)
+
+            self.audio.end(on_end)
+
+    def _render_utterance(self, utt):
+        rate, channels, dtype = self.audio_format
+        key = self._cache_key(utt.text, utt.emotion_label)
+        recorded = []
+        utt.status = "synthesizing"
+        utt.synth_started_at = time.time()
+
+        def on_chunk(data):
+            if data and not utt._cancelled:
+                recorded.append(data)
+
+        status = "rendered"
+        try:
+            if key is not None and not self.cache.contains(key):
+                self._synthesize(utt.text, utt.emotion_label, on_chunk)
+                if recorded and not utt._cancelled and not self._stop_requested:
+                    self.cache.put(key, convert_pcm(b"".join(recorded), rate, channels, dtype, rate, channels), rate, channels)
+                    self.metrics["prerendered"] += 1
+                else:
+                    status = "cancelled"
+        except Exception as e:
+            status = "failed"
+            print(f"[{type(self).__name__}] ERROR in prerender(): {e}")
+        self._finish(utt, status)
+
+    def _finish(self, utt, status):
+        if utt._done:
+            return
+        utt._done = True
+        utt.status = status
+        utt.finished_at = time.time()
+        if status in self.metrics and not utt.render_only:
+            self.metrics[status] += 1
+        if utt.on_done:
+            try:
+                utt.on_done(utt)
+            except Exception as e:
+                print(f"[{type(self).__name__}] ERROR in on_done: {e}")
+
+    def _realtimetts_format(self, engine):
+        """RealtimeTTS engine.get_stream_info() -> (rate, channels, dtype)."""
+        fmt, channels, rate = engine.get_stream_info()
+        dtype = "float32" if fmt == _PA_FLOAT32 else "int16"
+        return (int(rate), int(channels), dtype)
+
+    def _play_realtimetts(self, stream, text_or_gen, on_chunk):
+        """RealtimeTTS stream, muted: we only take the synthesized chunks (blocking)."""
+        stream.feed(text_or_gen)
+        stream.play(log_synthesized_text=False, muted=True, on_audio_chunk=on_chunk)
@@ -13,8 +13,12 @@ class CoquiTTS(BaseTTS):
         speed = 1.0,
         use_deepspeed = False,
         output_device_index=None,
+        audio_output=None,
     ):
-        super().__init__(signals, output_device_index=output_device_index)
+        super().__init__(signals, output_device_index=output_device_index, audio_output=audio_output)
+        self.voice_reference = voice_reference
+        self.language = (language or "hu").strip()
+        self.speed = None if speed is None else float(speed)
 
         # If you don't have reference wav, leave voice_reference=None.
         # CoquiEngine should fall back to a default voice configuration.
@@ -31,33 +35,16 @@ class CoquiTTS(BaseTTS):
 
         self.engine = CoquiEngine(**kwargs)
 
-        self.stream = TextToAudioStream(
-            self.engine,
-            output_device_index=self.output_device_index,
-            on_audio_stream_start=self._audio_started,
-            on_audio_stream_stop=self._audio_ended,
-        )
+        # muted: playback goes through the shared AudioOutput
+        self.stream = TextToAudioStream(self.engine, muted=True)
+        self.audio_format = self._realtimetts_format(self.engine)
 
-    def play(self, text, emotion_label = None):
+    def _synthesize(self, text, emotion_label, on_chunk):
         # emotion_label ignored for Coqui (not supported)
-        if not self.enabled:
-            return
-        text = (text or "").strip()
-        if not text:
-            return
-
-        self.stream.feed(text)
-        self.stream.play_async(log_synthesized_text=False)
-
-    def stop(self):
-        try:
-            self.stream.stop()
-        except Exception:
-            pass
-        self.signals.ai_talking = False
-
-    def _audio_started(self):
-        self.signals.ai_talking = True
-
-    def _audio_ended(self):
-        self.signals.ai_talking = False
+        self._play_realtimetts(self.stream, text, on_chunk)
+
+    def _cancel_synthesis(self):
+        self.stream.stop()
+
+    def _cache_identity(self, emotion_label):
+        return ("coqui", f"{self.voice_reference or 'default'}:{self.language}", self.speed, None)
@@ -23,13 +23,8 @@ ElevenLabs we prefer a direct integration path.)
 API Reference: https://elevenlabs.io/docs/api-reference/text-to-speech
 """
 
-import time
-import os
-import threading
 from elevenlabs.client import ElevenLabs
-from base_tts import BaseTTS
-import wave
-import pyaudio
+from .base_tts import BaseTTS
 
 
 class ElevenLabsTTS(BaseTTS):
@@ -57,9 +52,9 @@ class ElevenLabsTTS(BaseTTS):
         similarity_boost = 0.5,
         style = 0.0,
         use_speaker_boost = True,
-        cache_dir = "cache/tts",
+        audio_output=None,
     ):
-        super().__init__(signals, output_device_index=output_device_index)
+        super().__init__(signals, output_device_index=output_device_index, audio_output=audio_output)
 
         if not api_key:
             raise ValueError("ElevenLabsTTS: api_key is required.")
@@ -79,25 +74,15 @@ class ElevenLabsTTS(BaseTTS):
             self.output_format = "wav_24000"
         else:
             self.output_format = output_format
-        self.file_extension = "wav"
-
-        self.cache_dir = cache_dir
-        os.makedirs(self.cache_dir, exist_ok=True)
 
         self.client = ElevenLabs(api_key=api_key)
 
-        # contorl like realtimetts (play_async, stop)
-        self._play_thread = None
-        self._stop_requested = False
-        self._current_file_path = None
-        self._pa_stream = None
+        # wav_24000 -> 24 kHz, mono, 16 bit
+        self.audio_format = (int(self.output_format.split("_")[-1]), 1, "int16")
 
 
-    def generate_audio(self, text, file_name_no_ext = None):
-        if file_name_no_ext is None:
-            file_name_no_ext = f"tts_{int(time.time() * 1000)}"
-        out_path = os.path.join(self.cache_dir, f"{file_name_no_ext}.{self.file_extension}")
-        audio_iter = self.client.text_to_speech.convert(
+    def _convert(self, text):
+        return self.client.text_to_speech.convert(
             text=text,
             voice_id=self.voice_id,
             model_id=self.model_id,
@@ -109,137 +94,52 @@ class ElevenLabsTTS(BaseTTS):
                 "use_speaker_boost": self.use_speaker_boost,
             },
         )
-        with open(out_path, "wb") as f:
-            for chunk in audio_iter:
-                if self._stop_requested:
-                    break
-                if chunk:
-                    f.write(chunk)
-        if self._stop_requested:
-            self.remove_file(out_path)
-            return None           
-        return out_path
-    
-
-    def remove_file(self, file_path: str):
-        try:
-            if file_path and os.path.exists(file_path):
-                os.remove(file_path)
-        except OSError:
-            pass
-
-
-    def play(self, text, emotion_label=None):
+
+    def _synthesize(self, text, emotion_label, on_chunk):
         """
         RealtimeTTS streams audio frames while synthesis is still ongoing (true low-latency streaming).
         With streaming engines (e.g. Coqui/Kokoro/Orpheus through RealtimeTTS), playback can start
         as soon as the first audio chunks are available.
 
         This ElevenLabs integration is simpler:
-        1) We request a WAV file from ElevenLabs (network request).
-        2) We write the full WAV to disk.
-        3) We play it locally via PyAudio.
+        1) We request a WAV stream from ElevenLabs (network request).
+        2) We skip the WAV header and push the PCM payload to the shared AudioOutput
+           as the chunks arrive (no temp file, no per-utterance PyAudio stream).
         """
-        if not self.enabled:
-            return
-        text = (text or "").strip()
-        if not text:
-            return
         tag = self._emotion_to_tag(emotion_label)
         if tag:
             text = f"{tag} {text}"
 
-        # stop any current playback/generation first
-        self.stop()
-
-        self._stop_requested = False
-        self._audio_started()
-
-        def worker():
-            pa = None
-            stream = None
-            wf = None
-            path = None
-            try:
-                # generate wav
-                path = self.generate_audio(text)
-                self._current_file_path = path
-                if not path:
-                    return
-
-                # play wav (pyaudio)
-                wf = wave.open(path, "rb")
-                pa = pyaudio.PyAudio()
-
-                stream = pa.open(
-                    format=pa.get_format_from_width(wf.getsampwidth()),
-                    channels=wf.getnchannels(),
-                    rate=wf.getframerate(),
-                    output=True,
-                    output_device_index=self.output_device_index,
-                )
-                self._pa_stream = stream
-
-                frames_per_chunk = 1024
-                data = wf.readframes(frames_per_chunk)
-
-                while data:
-                    if self._stop_requested:
-                        break
-                    stream.write(data)
-                    data = wf.readframes(frames_per_chunk)
-
-            except Exception as e:
-                print(f"[ElevenLabsTTS] ERROR in play(): {e}")
-
-            finally:
-                try:
-                    if wf is not None:
-                        wf.close()
-                except Exception:
-                    pass
-                try:
-                    if stream is not None:
-                        stream.stop_stream()
-                        stream.close()
-                except Exception:
-                    pass
-                try:
-                    if pa is not None:
-                        pa.terminate()
-                except Exception:
-                    pass
-
-                self._pa_stream = None
-                self._current_file_path = None
-                self._play_thread = None
-
-                # remove cache file
-                if path:
-                    self.remove_file(path)
-
-                self._audio_ended()
-
-        self._play_thread = threading.Thread(target=worker, daemon=True)
-        self._play_thread.start()
-
-    def stop(self):
-        self._stop_requested = True
-        try:
-            if self._pa_stream is not None:
-                self._pa_stream.stop_stream()
-                self._pa_stream.close()
-                self._pa_stream = None
-        except Exception:
-            pass
-        self.signals.ai_talking = False
-    
+        buf = b""
+        in_data = False
+        for chunk in self._convert(text):
+            if self._synthesis_cancelled():
+                break
+            if not chunk:
+                continue
+            buf += chunk
+
+            if not in_data:
+                # RIFF header: PCM starts after the "data" sub-chunk id + size
+                idx = buf.find(b"data")
+                if idx < 0 or len(buf) < idx + 8:
+                    continue
+                in_data = True
+                buf = buf[idx + 8:]
+
+            # network chunks can split a 16 bit sample, keep the odd byte for later
+            even = len(buf) - (len(buf) % 2)
+            if even:
+                on_chunk(buf[:even])
+                buf = buf[even:]
+
+    def _cache_identity(self, emotion_label):
+        voice = (
+            f"{self.voice_id}:{self.model_id}:{self.output_format}:"
+            f"{self.stability}:{self.similarity_boost}:{self.style}:{self.use_speaker_boost}"
+        )
+        return ("elevenlabs", voice, None, self._emotion_to_tag(emotion_label))
+
     def _emotion_to_tag(self, emotion_label):
         lab = (emotion_label or "").strip().lower()
         return self._EMO_TO_TAG.get(lab, "")
-
-    def _audio_started(self):
-        self.signals.ai_talking = True
-
-    def _audio_ended(self):
-        self.signals.ai_talking = False
\ No newline at end of file
@@ -11,8 +11,9 @@ class KokoroTTS(BaseTTS):
         speed = 1.0,
         debug = False,
         output_device_index=None,
+        audio_output=None,
     ):
-        super().__init__(signals, output_device_index=output_device_index)
+        super().__init__(signals, output_device_index=output_device_index, audio_output=audio_output)
         self.engine = KokoroEngine(debug=bool(debug))
         self.voice = (voice or "af_heart").strip()
         self.speed = float(speed)
@@ -20,38 +21,21 @@ class KokoroTTS(BaseTTS):
         self.engine.set_voice(self.voice)
         self.engine.set_speed(self.speed)
 
-        self.stream = TextToAudioStream(
-            self.engine,
-            output_device_index=self.output_device_index,
-            on_audio_stream_start=self._audio_started,
-            on_audio_stream_stop=self._audio_ended,
-        )
+        # muted: playback goes through the shared AudioOutput
+        self.stream = TextToAudioStream(self.engine, muted=True)
+        self.audio_format = self._realtimetts_format(self.engine)
 
     # def set_voice(self, voice): # on the fly voice change
     #     voice = (voice or "").strip().lower()
     #     self.voice = voice
     #     self.engine.set_voice(self.voice)
 
-    def play(self, text, emotion_label = None):
-        # emotion_label ignored for Coqui (not supported)
-        if not self.enabled:
-            return
-        text = (text or "").strip()
-        if not text:
-            return
-
-        self.stream.feed(text)
-        self.stream.play_async(log_synthesized_text=False)
-
-    def stop(self):
-        try:
-            self.stream.stop()
-        except Exception:
-            pass
-        self.signals.ai_talking = False
-
-    def _audio_started(self):
-        self.signals.ai_talking = True
-
-    def _audio_ended(self):
-        self.signals.ai_talking = False
\ No newline at end of file
+    def _synthesize(self, text, emotion_label, on_chunk):
+        # emotion_label ignored for Kokoro (not supported)
+        self._play_realtimetts(self.stream, text, on_chunk)
+
+    def _cancel_synthesis(self):
+        self.stream.stop()
+
+    def _cache_identity(self, emotion_label):
+        return ("kokoro", self.voice, self.speed, None)
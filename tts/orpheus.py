@@ -26,22 +26,20 @@ class OrpheusTTS(BaseTTS):
         voice = "tara",
         output_device_index=None,
         timeout_sec = 2.0,
+        audio_output=None,
     ):
-        super().__init__(signals, output_device_index=output_device_index)
+        super().__init__(signals, output_device_index=output_device_index, audio_output=audio_output)
         self.api_url = (api_url or "").rstrip("/")
-        completions_url = self.base_url + "/v1/completions"
+        completions_url = self.api_url + "/v1/completions"
         self.voice = (voice or "tara").strip().lower()
         self.timeout_sec = float(timeout_sec)
 
         self.engine = OrpheusEngine(api_url=completions_url)
         self.engine.set_voice(OrpheusVoice(self.voice))
 
-        self.stream = TextToAudioStream(
-            self.engine,
-            output_device_index=self.output_device_index,
-            on_audio_stream_start=self._audio_started,
-            on_audio_stream_stop=self._audio_ended,
-        )
+        # muted: playback goes through the shared AudioOutput
+        self.stream = TextToAudioStream(self.engine, muted=True)
+        self.audio_format = self._realtimetts_format(self.engine)
 
     def check_connection(self): # LM studio
         url = self.api_url.rstrip("/") + "/api/v1/models"
@@ -51,18 +49,18 @@ class OrpheusTTS(BaseTTS):
         except requests.RequestException:
             return False
 
+    def warm_up(self, text="Hello."):
+        # LM Studio has to be up, otherwise the synthesis below only times out
+        if not self.check_connection():
+            raise RuntimeError(f"LM Studio not reachable at {self.api_url}")
+        super().warm_up(text)
+
     # def set_voice(self, voice): # on the fly voice change
     #     voice = (voice or "").strip().lower()
     #     self.voice = voice
     #     self.engine.set_voice(OrpheusVoice(self.voice))
 
-    def play(self, text, emotion_label = None):
-        if not self.enabled:
-            return
-        text = (text or "").strip()
-        if not text:
-            return
-
+    def _synthesize(self, text, emotion_label, on_chunk):
         # Map emotion label -> Orpheus tag
         tag = self._emotion_to_tag(emotion_label)
         if tag:
@@ -72,25 +70,14 @@ class OrpheusTTS(BaseTTS):
         def gen():
             yield text
 
-        self.stream.feed(gen())
-        self.stream.play_async(log_synthesized_text=False)
+        self._play_realtimetts(self.stream, gen(), on_chunk)
 
-    def stop(self): # automatic interrupt logic not implemented yet
-        try:
-            self.stream.stop()
-        except Exception:
-            pass
-        try:
-            self.signals.ai_talking = False
-        except Exception:
-            pass
+    def _cancel_synthesis(self): # automatic interrupt logic not implemented yet
+        self.stream.stop()
+
+    def _cache_identity(self, emotion_label):
+        return ("orpheus", self.voice, None, self._emotion_to_tag(emotion_label))
 
     def _emotion_to_tag(self, emotion_label):
         lab = (emotion_label or "").strip().lower()
         return self._EMO_TO_TAG.get(lab, "")
-
-    def _audio_started(self):
-        self.signals.ai_talking = True
-
-    def _audio_ended(self):
-        self.signals.ai_talking = False
\ No newline at end of file
@@ -2,10 +2,8 @@ from __future__ import annotations
 
 from config import tts_config
 
-from .orpheus import OrpheusTTS
-from .kokoro import KokoroTTS
-from .coqui import CoquiTTS
-from .elevenlabs import ElevenLabsTTS
+from .audio_output import get_audio_output
+from .audio_cache import AudioCache
 
 
 def build_tts(signals):
@@ -13,32 +11,55 @@ def build_tts(signals):
     output_device_index = tts_config.get("output_device_index", None)
     enabled = bool(tts_config.get("enabled", True))
 
+    # one long-lived output stream per device, shared by every engine
+    audio_output = get_audio_output(
+        signals,
+        output_device_index,
+        tts_config.get("audio_output", {}) or {},
+    )
+    tts = _build_engine(engine, signals, output_device_index, audio_output)
+    tts.enabled = enabled
+    tts.policy = (tts_config.get("policy") or "queue").strip().lower()
+
+    cache_cfg = tts_config.get("cache", {}) or {}
+    if cache_cfg.get("enabled", True):
+        tts.cache = AudioCache(
+            cache_dir=cache_cfg.get("dir", "cache/tts/pcm"),
+            max_bytes=int(float(cache_cfg.get("max_mb", 256)) * 1024 * 1024),
+        )
+    return tts
+
+
+def _build_engine(engine, signals, output_device_index, audio_output):
     if engine == "orpheus":
         cfg = tts_config.get("orpheus", {}) or {}
+        from .orpheus import OrpheusTTS  # only the selected engine's deps get imported
         tts = OrpheusTTS(
             signals=signals,
             api_url=cfg.get("api_url", "http://127.0.0.1:1234"),
             voice=cfg.get("voice", "tara"),
             timeout_sec=cfg.get("timeout_sec", 2.0),
             output_device_index=output_device_index,
+            audio_output=audio_output,
         )
-        tts.enabled = enabled
         return tts
 
     if engine == "kokoro":
         cfg = tts_config.get("kokoro", {}) or {}
+        from .kokoro import KokoroTTS
         tts = KokoroTTS(
             signals=signals,
             voice=cfg.get("voice", "af_heart"),
             speed=cfg.get("speed", 1.0),
             debug=cfg.get("debug", False),
             output_device_index=output_device_index,
+            audio_output=audio_output,
         )
-        tts.enabled = enabled
         return tts
 
     if engine == "coqui":
         cfg = tts_config.get("coqui", {}) or {}
+        from .coqui import CoquiTTS
         tts = CoquiTTS(
             signals=signals,
             voice_reference=cfg.get("voice_reference", None),
@@ -47,12 +68,13 @@ def build_tts(signals):
             speed=cfg.get("speed", 1.1),
             use_deepspeed=cfg.get("use_deepspeed", False),
             output_device_index=output_device_index,
+            audio_output=audio_output,
         )
-        tts.enabled = enabled
         return tts
 
     if engine == "elevenlabs":
         cfg = tts_config.get("elevenlabs", {}) or {}
+        from .elevenlabs import ElevenLabsTTS
         tts = ElevenLabsTTS(
             signals=signals,
             api_key=cfg.get("api_key", None),
@@ -60,8 +82,8 @@ def build_tts(signals):
             model_id=cfg.get("model_id", "eleven_multilingual_v2"),
             output_format=cfg.get("output_format", "wav_24000"),
             output_device_index=output_device_index,
+            audio_output=audio_output,
         )
-        tts.enabled = enabled
         return tts
 
     raise ValueError(f"Unknown tts_config['engine']: {engine}")
\ No newline at end of file
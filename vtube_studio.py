@@ -1,7 +1,100 @@
+"""
+VTube Studio plugin controller (emotion -> hotkey), asyncio-native.
+
+- one asyncio loop in a daemon thread; other threads only schedule work on it
+  (call_soon_threadsafe), emotion changes arrive through the Signals event bus
+- own minimal VTS API client: requests are pipelined (matched by requestID),
+  so a burst of hotkeys does not wait for each response in turn
+- reconnect with exponential backoff; the auth token is cached in memory and in
+  token_path, so reconnects don't ask for permission in VTS again
+- redundant hotkeys are coalesced (only the newest emotion counts, repeats collapse)
+- request latency stats (rolling p50/p95)
+- optional lip-sync: mouth parameters from the TTS audio (lipsync.py) are injected
+  at a fixed rate; a tick is dropped, not queued, while the previous injection is
+  still in flight
+
+API reference: https://github.com/DenchiSoft/VTubeStudio
+"""
+
 import asyncio
+import itertools
+import json
+import os
+import random
 import threading
-import queue
-import pyvts
+import time
+from collections import deque
+
+from event_bus import COALESCE
+
+API_NAME = "VTubeStudioPublicAPI"
+API_VERSION = "1.0"
+
+
+class VTSAPIError(Exception):
+    pass
+
+
+class _VTSConnection:
+    """One WebSocket to VTS. request() can be awaited concurrently (pipelining)."""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self._ids = itertools.count(1)
+        self._pending = {}      # requestID -> future
+        self._reader = asyncio.create_task(self._read_loop())
+        self.closed = asyncio.Event()
+
+    @property
+    def in_flight(self):
+        return len(self._pending)
+
+    async def request(self, message_type, data=None, timeout=3.0):
+        req_id = f"r{next(self._ids)}"
+        fut = asyncio.get_running_loop().create_future()
+        self._pending[req_id] = fut
+        msg = {
+            "apiName": API_NAME,
+            "apiVersion": API_VERSION,
+            "requestID": req_id,
+            "messageType": message_type,
+        }
+        if data is not None:
+            msg["data"] = data
+        try:
+            await self.ws.send(json.dumps(msg))
+            resp = await asyncio.wait_for(fut, timeout)
+        finally:
+            self._pending.pop(req_id, None)
+        if resp.get("messageType") == "APIError":
+            err = resp.get("data") or {}
+            raise VTSAPIError(f"{err.get('errorID', '?')}: {err.get('message', 'unknown')}")
+        return resp
+
+    async def _read_loop(self):
+        try:
+            async for raw in self.ws:
+                try:
+                    resp = json.loads(raw)
+                except ValueError:
+                    continue
+                fut = self._pending.get(resp.get("requestID"))
+                if fut is not None and not fut.done():
+                    fut.set_result(resp)
+        except Exception:
+            pass
+        finally:
+            for fut in self._pending.values():
+                if not fut.done():
+                    fut.set_exception(ConnectionError("VTS socket closed"))
+            self.closed.set()
+
+    async def close(self):
+        try:
+            await self.ws.close()
+        except Exception:
+            pass
+        self._reader.cancel()
 
 
 class VTubeStudioController:
@@ -24,9 +117,21 @@ class VTubeStudioController:
         developer = "Gorgooo61",
         token_path = "./vtubeStudio_token.txt",
         emo_to_hotkey = None,
+        url = "ws://localhost:8001",
+        request_timeout = 3.0,
+        reconnect_min_sec = 0.5,
+        reconnect_max_sec = 30.0,
+        lipsync = None,
     ):
         self.signals = signals
         self.enabled = bool(enabled)
+        self.plugin_name = plugin_name
+        self.developer = developer
+        self.token_path = token_path
+        self.url = url
+        self.request_timeout = float(request_timeout)
+        self.reconnect_min_sec = float(reconnect_min_sec)
+        self.reconnect_max_sec = float(reconnect_max_sec)
 
         self._emo_to_hotkey = dict(self.DEFAULT_EMO_TO_HOTKEY)
         if emo_to_hotkey:
@@ -34,20 +139,39 @@ class VTubeStudioController:
                 if k and v:
                     self._emo_to_hotkey[str(k).strip().lower()] = str(v).strip()
 
-        self._q = queue.SimpleQueue()
+        self.lipsync = lipsync
+        self._lip_task = None
+
+        self._token = self._read_token()
+        self._last_seen_emotion = None     # last emotion whose hotkey VTS confirmed
+        self._wanted_emotion = None         # newest emotion asked for (confirmed or not)
+        self._pending_hotkey = None         # newest hotkey asked for during reconnect backoff
+        self._conn = None
+
+        # asyncio side (created in the VTS thread)
+        self._loop = None
+        self._actions = None
+        self._backlog = deque(maxlen=64)    # actions submitted before the loop exists
+        self._backlog_lock = threading.Lock()
+        self._emotion_sub = None
 
         self._thread = None
         self._ready_evt = threading.Event()
         self._stop_evt = threading.Event()
 
-        plugin_info = {
-            "plugin_name": plugin_name,
-            "developer": developer,
-            "authentication_token_path": token_path,
+        # request stats (read by the metrics endpoint)
+        self.stats = {
+            "requests": 0, "errors": 0, "latency_sum_s": 0.0, "last_latency_s": None,
+            "connects": 0, "reconnects": 0, "coalesced": 0,
+            "lipsync_sent": 0, "lipsync_dropped": 0, "lipsync_errors": 0,
         }
-        self._vts = pyvts.vts(plugin_info=plugin_info)
+        self._latencies = deque(maxlen=256)
 
 # Public API
+    @property
+    def connected(self):
+        return self._ready_evt.is_set()
+
     def start(self):
         """Start background VTS loop."""
         if self._thread and self._thread.is_alive():
@@ -59,15 +183,15 @@ class VTubeStudioController:
     def stop(self):
         """Stop background loop and close socket."""
         self._stop_evt.set()
+        self._submit(("wake", None))
 
     def trigger_emotion(self, emotion_label):
         """Trigger emotion hotkey based on label."""
         if not self.enabled:
             return
         emo = (emotion_label or "").strip().lower()
-        hotkey = self._emo_to_hotkey.get(emo) or self._emo_to_hotkey.get("neutral")
-        if hotkey:
-            self._q.put(("trigger_hotkey", hotkey))
+        if emo:
+            self._submit(("emotion", emo))
 
     def trigger_hotkey(self, hotkey_name):
         """Trigger a VTS hotkey by name."""
@@ -76,9 +200,32 @@ class VTubeStudioController:
         hotkey_name = (hotkey_name or "").strip()
         if not hotkey_name:
             return
-        self._q.put(("trigger_hotkey", hotkey_name))
+        self._submit(("trigger_hotkey", hotkey_name))
+
+    def latency_summary(self):
+        values = sorted(self._latencies)
+        if not values:
+            return {"count": 0}
+        return {
+            "count": len(values),
+            "p50": values[len(values) // 2],
+            "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+            "max": values[-1],
+        }
 
 # Internal thread/async
+    def _submit(self, action):
+        """Thread-safe: hand an action to the asyncio loop (never blocks)."""
+        with self._backlog_lock:
+            loop = self._loop
+            if loop is None:
+                self._backlog.append(action)
+                return
+        try:
+            loop.call_soon_threadsafe(self._actions.put_nowait, action)
+        except RuntimeError:
+            pass  # loop already closed
+
     def _thread_entry(self):
         asyncio.run(self._run_async())
 
@@ -86,79 +233,254 @@ class VTubeStudioController:
         if not self.enabled:
             return
 
-        # connect
-        try:
-            await self._vts.connect()
-        except Exception as e:
-            print(f"[VTubeStudio] ERROR: failed to connect: {e}")
-            self.enabled = False
-            return
+        self._actions = asyncio.Queue()
+        with self._backlog_lock:
+            for action in self._backlog:
+                self._actions.put_nowait(action)
+            self._backlog.clear()
+            self._loop = asyncio.get_running_loop()    # same lock: nothing lands in the drained backlog
 
-        # auth token
+        # emotion changes come from the signals bus (no polling)
+        self._emotion_sub = self.signals.subscribe(
+            "vts",
+            maxlen=4,
+            policy=COALESCE,
+            topics=("emotion_label",),
+            notify=lambda: self._submit(("signals", None)),
+        )
+        current = (getattr(self.signals, "emotion_label", None) or "").strip().lower()
+        if current:
+            self._actions.put_nowait(("emotion", current))
+
+        backoff = self.reconnect_min_sec
         try:
-            await self._vts.request_authenticate_token()
-            await self._vts.request_authenticate()
-        except Exception as e:
-            print(f"[VTubeStudio] ERROR: auth failed: {e}")
+            while not self._stop_evt.is_set():
+                try:
+                    await self._connect_and_auth()
+                    backoff = self.reconnect_min_sec
+                    await self._action_loop()
+                except Exception as e:
+                    if self._stop_evt.is_set():
+                        break
+                    print(f"[VTubeStudio] connection lost/failed: {e} (retry in {backoff:.1f} s)")
+                finally:
+                    self._ready_evt.clear()
+                    if self._conn is not None:
+                        await self._conn.close()
+                        self._conn = None
+
+                if self._stop_evt.is_set():
+                    break
+                await self._sleep_or_stop(backoff * (0.8 + 0.4 * random.random()))
+                backoff = min(self.reconnect_max_sec, backoff * 2.0)
+                self.stats["reconnects"] += 1
+        finally:
+            self._emotion_sub.close()
+            with self._backlog_lock:
+                self._loop = None
+            print("[VTubeStudio] Closed.")
+
+    async def _sleep_or_stop(self, seconds):
+        """
+        Backoff sleep that still wakes up on stop(). Actions arriving meanwhile only
+        update the newest wanted emotion / pending hotkey, applied after reconnect.
+        """
+        deadline = time.monotonic() + seconds
+        while not self._stop_evt.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
             try:
-                await self._vts.close()
-            except Exception:
-                pass
-            self.enabled = False
-            return
+                kind, data = await asyncio.wait_for(self._actions.get(), remaining)
+            except asyncio.TimeoutError:
+                return
+            if kind == "emotion":
+                self._wanted_emotion = data
+            elif kind == "signals":
+                for _, value, _ in self._emotion_sub.drain():
+                    self._wanted_emotion = (value or "").strip().lower() or self._wanted_emotion
+            elif kind == "trigger_hotkey":
+                self._pending_hotkey = data
+
+    async def _connect_and_auth(self):
+        import websockets
+
+        ws = await websockets.connect(self.url, open_timeout=self.request_timeout, max_size=None)
+        self._conn = _VTSConnection(ws)
+        self.stats["connects"] += 1
+
+        info = {"pluginName": self.plugin_name, "pluginDeveloper": self.developer}
+        for attempt in range(2):
+            if not self._token:
+                # VTS shows a permission popup the first time
+                resp = await self._conn.request("AuthenticationTokenRequest", dict(info), timeout=60.0)
+                self._token = (resp.get("data") or {}).get("authenticationToken")
+                self._write_token(self._token)
+            resp = await self._conn.request(
+                "AuthenticationRequest",
+                dict(info, authenticationToken=self._token),
+                timeout=self.request_timeout,
+            )
+            if (resp.get("data") or {}).get("authenticated"):
+                break
+            self._token = None  # revoked / stale token -> ask once more
+        else:
+            raise VTSAPIError("authentication rejected")
 
         self._ready_evt.set()
+        # re-apply the newest emotion after a reconnect (also one VTS never confirmed)
+        self._last_seen_emotion = None
+        current = self._wanted_emotion or (getattr(self.signals, "emotion_label", None) or "").strip().lower()
+        if current:
+            self._actions.put_nowait(("emotion", current))
+        if self._pending_hotkey:
+            self._actions.put_nowait(("trigger_hotkey", self._pending_hotkey))
+            self._pending_hotkey = None
         print("[VTubeStudio] Connected & authenticated.")
 
-        # main action loop
+    async def _action_loop(self):
+        conn = self._conn
+        lip_loop = asyncio.ensure_future(self._lipsync_loop(conn)) if self.lipsync is not None else None
+        try:
+            await self._dispatch_actions(conn)
+        finally:
+            if lip_loop is not None:
+                lip_loop.cancel()
+
+    async def _dispatch_actions(self, conn):
         while not self._stop_evt.is_set():
-            if not self.enabled:
-                await asyncio.sleep(0.1)
-                continue
+            get_task = asyncio.ensure_future(self._actions.get())
+            closed_task = asyncio.ensure_future(conn.closed.wait())
+            done, _ = await asyncio.wait({get_task, closed_task}, return_when=asyncio.FIRST_COMPLETED)
+            if get_task not in done:
+                get_task.cancel()
+                raise ConnectionError("VTS socket closed")
+            closed_task.cancel()
 
-            # drain queue
-            did_work  = 0
-            while True:
-                try:
-                    action, data = self._q.get_nowait()
-                except Exception:
-                    break
+            actions = [get_task.result()]
+            while not self._actions.empty():
+                actions.append(self._actions.get_nowait())
 
-                did_work  = True
-                if action == "trigger_hotkey":
-                    await self._trigger_hotkey_async(data)
-
-            current_emo = (getattr(self.signals, "emotion_label", None) or "").strip().lower() or None
-            if current_emo != self._last_seen_emotion:
-                self._last_seen_emotion = current_emo
-                if current_emo:
-                    # emotion -> hotkey
-                    hotkey = self._emo_to_hotkey.get(current_emo) or self._emo_to_hotkey.get("neutral")
-                    if hotkey:
-                        await self._trigger_hotkey_async(hotkey)
-                        did_work = True
-
-            # yield
-            if not did_work:
-                await asyncio.sleep(0.01)
+            hotkeys, emotion = self._coalesce(actions)
+            if hotkeys:
+                # pipelined: all requests go out now, responses are matched by requestID
+                results = await asyncio.gather(*(self._trigger_hotkey_async(h) for h in hotkeys))
+                # only a confirmed emotion counts as applied: a failed one is sent again next time
+                if emotion is not None and dict(zip(hotkeys, results)).get(self._emotion_hotkey(emotion)):
+                    self._last_seen_emotion = emotion
+
+    def _coalesce(self, actions):
+        """
+        actions -> (hotkeys to send, emotion they apply or None). Only the newest emotion
+        counts, repeats collapse.
+        """
+        hotkeys = []
+        emotion = None
+        n_in = 0
+        for kind, data in actions:
+            if kind == "signals":
+                for _, value, _ in self._emotion_sub.drain():
+                    emotion = (value or "").strip().lower() or emotion
+                n_in += 1
+            elif kind == "emotion":
+                emotion = data
+                n_in += 1
+            elif kind == "trigger_hotkey":
+                n_in += 1
+                if not hotkeys or hotkeys[-1] != data:
+                    hotkeys.append(data)
+
+        if emotion:
+            self._wanted_emotion = emotion
+        if emotion and emotion != self._last_seen_emotion:
+            hotkey = self._emotion_hotkey(emotion)
+            if hotkey and hotkey not in hotkeys:
+                hotkeys.append(hotkey)
+        else:
+            emotion = None
+
+        self.stats["coalesced"] += max(0, n_in - len(hotkeys))
+        return hotkeys, emotion
+
+    def _emotion_hotkey(self, emotion):
+        return self._emo_to_hotkey.get(emotion) or self._emo_to_hotkey.get("neutral")
+
+    async def _lipsync_loop(self, conn):
+        """Fixed-rate parameter injection, aligned to playback time by LipSync.sample()."""
+        loop = asyncio.get_running_loop()
+        period = 1.0 / self.lipsync.rate_hz
+        next_t = loop.time()
+        while not conn.closed.is_set():
+            next_t += period
+            delay = next_t - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
             else:
-                await asyncio.sleep(0)
+                next_t = loop.time()  # fell behind: don't burst to catch up
+
+            values = self.lipsync.sample()
+            if not values:
+                continue
+            if self._lip_task is not None and not self._lip_task.done():
+                self.stats["lipsync_dropped"] += 1  # socket is behind, newer frame comes next tick
+                continue
+            self._lip_task = asyncio.ensure_future(self._inject_parameters(conn, values))
 
-        # close
+    async def _inject_parameters(self, conn, values):
         try:
-            await self._vts.close()
+            await conn.request(
+                "InjectParameterDataRequest",
+                {
+                    "faceFound": False,
+                    "mode": "set",
+                    "parameterValues": [{"id": k, "value": v} for k, v in values.items()],
+                },
+                timeout=self.request_timeout,
+            )
+            self.stats["lipsync_sent"] += 1
         except Exception:
-            pass
-        print("[VTubeStudio] Closed.")
+            self.stats["lipsync_errors"] += 1
 
     async def _trigger_hotkey_async(self, hotkey_name):
-        if not hotkey_name:
-            return
+        """True once VTS confirmed the hotkey."""
+        if not hotkey_name or self._conn is None:
+            return False
+        t0 = time.perf_counter()
+        ok = False
         try:
-            req = self._vts.vts_request.requestTriggerHotKey(hotkey_name)
-            resp = await self._vts.request(req)
-            if resp and resp.get("messageType") == "APIError":
-                msg = (resp.get("data") or {}).get("message", "unknown")
-                print(f"[VTubeStudio] APIError on hotkey '{hotkey_name}': {msg}")
+            await self._conn.request(
+                "HotkeyTriggerRequest",
+                {"hotkeyID": hotkey_name},
+                timeout=self.request_timeout,
+            )
+            ok = True
+        except VTSAPIError as e:
+            self.stats["errors"] += 1
+            print(f"[VTubeStudio] APIError on hotkey '{hotkey_name}': {e}")
         except Exception as e:
-            print(f"[VTubeStudio] trigger hotkey failed '{hotkey_name}': {e}")
\ No newline at end of file
+            self.stats["errors"] += 1
+            print(f"[VTubeStudio] trigger hotkey failed '{hotkey_name}': {e}")
+        latency = time.perf_counter() - t0
+        self._latencies.append(latency)
+        self.stats["requests"] += 1
+        self.stats["latency_sum_s"] += latency
+        self.stats["last_latency_s"] = latency
+        return ok
+
+    # token cache
+    def _read_token(self):
+        try:
+            with open(self.token_path, "r", encoding="utf-8") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def _write_token(self, token):
+        if not token:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.token_path) or ".", exist_ok=True)
+            with open(self.token_path, "w", encoding="utf-8") as f:
+                f.write(token)
+        except OSError as e:
+            print(f"[VTubeStudio] could not save token: {e}")
@@ -0,0 +1,45 @@
+import time
+
+
+def warm_up_components(steps, rounds=2, debug_print=True):
+    """
+    Runs every warm-up step `rounds` times and records cold vs warm latency.
+
+    steps: list of (name, callable). The first call is the cold one (CUDA kernels,
+    lazy model loads, connection setup), the later ones show steady-state latency.
+
+    Returns {name: {"cold_s": float, "warm_s": float | None, "ok": bool, "error": str | None}}.
+    """
+    rounds = max(1, int(rounds))
+    report = {}
+
+    for name, fn in steps:
+        timings = []
+        error = None
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            try:
+                fn()
+            except Exception as e:
+                error = str(e)
+                break
+            timings.append(time.perf_counter() - t0)
+
+        warm = timings[1:]
+        report[name] = {
+            "cold_s": timings[0] if timings else None,
+            "warm_s": (sum(warm) / len(warm)) if warm else None,
+            "ok": error is None,
+            "error": error,
+        }
+
+        if debug_print:
+            r = report[name]
+            if error is not None:
+                print(f"[WarmUp] {name}: FAILED ({error})")
+            elif r["warm_s"] is None:
+                print(f"[WarmUp] {name}: cold {r['cold_s'] * 1000:.0f} ms")
+            else:
+                print(f"[WarmUp] {name}: cold {r['cold_s'] * 1000:.0f} ms -> warm {r['warm_s'] * 1000:.0f} ms")
+
+    return report
@@ -0,0 +1,171 @@
+"""
+WebSocket server for the web frontend.
+
+Server -> browser (JSON text frames):
+    {"type": "snapshot", "state": {...}}                      on connect
+    {"type": "event", "name": ..., "value": ..., "ts": ...}   signal changes, transcripts,
+                                                              reply deltas, replies
+Browser -> server:
+    {"type": "set", "key": "stt_enabled" | "avatar_enabled", "value": true/false}
+
+The agent side only publishes into the Signals event bus (never blocks). This server
+runs its own asyncio loop in a daemon thread; every client has a bounded send queue,
+and a client whose queue is still full after its sender had a chance to run (slow tab,
+bad network) is disconnected instead of slowing down anyone else.
+"""
+
+import asyncio
+import json
+import threading
+
+from event_bus import DROP_OLDEST
+
+# flags the browser may toggle
+CONTROL_KEYS = ("stt_enabled", "avatar_enabled")
+
+_STATE_KEYS = (
+    "user_talking", "ai_talking", "ai_generating", "memory_generating",
+    "new_q", "emotion_label", "stt_enabled", "avatar_enabled",
+)
+
+
+class _Client:
+    def __init__(self, ws, maxsize):
+        self.ws = ws
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.sender = None
+        self.evicted = False
+
+
+class WebFrontendServer:
+    def __init__(self, signals, host="127.0.0.1", port=8765, client_queue_size=256, bus_buffer=4096):
+        self.signals = signals
+        self.host = host
+        self.port = int(port)
+        self.client_queue_size = int(client_queue_size)
+        self.bus_buffer = int(bus_buffer)
+
+        self._clients = set()
+        self._loop = None
+        self._wake = None
+        self._stop = None
+        self._sub = None
+        self._thread = None
+        self.stats = {"connected": 0, "evicted": 0, "sent": 0, "controls": 0}
+
+    # Public API
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._thread_entry, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+    # Internal thread/async
+    def _thread_entry(self):
+        asyncio.run(self._run_async())
+
+    async def _run_async(self):
+        import websockets
+
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._stop = asyncio.Event()
+
+        # publish() runs on agent/audio/STT threads: only schedule a wake-up, never wait
+        self._sub = self.signals.subscribe(
+            "web",
+            maxlen=self.bus_buffer,
+            policy=DROP_OLDEST,
+            notify=lambda: self._loop.call_soon_threadsafe(self._wake.set),
+        )
+        try:
+            async with websockets.serve(self._handle_client, self.host, self.port):
+                print(f"[Web] WebSocket server on ws://{self.host}:{self.port}")
+                broadcaster = asyncio.create_task(self._broadcast_loop())
+                await self._stop.wait()
+                broadcaster.cancel()
+        except Exception as e:
+            print(f"[Web] ERROR: server failed: {e}")
+        finally:
+            self._sub.close()
+            print("[Web] Closed.")
+
+    async def _broadcast_loop(self):
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            batch = 0
+            for name, value, ts in self._sub.drain():
+                msg = json.dumps({"type": "event", "name": name, "value": value, "ts": ts})  # encoded once
+                full = [c for c in list(self._clients) if not self._enqueue(c, msg)]
+                batch += 1
+                if full or batch >= self.client_queue_size:
+                    # let the senders run: a burst must not look like a slow client
+                    await asyncio.sleep(0)
+                    batch = 0
+                for client in full:
+                    if not self._enqueue(client, msg):
+                        self._evict(client)
+
+    def _enqueue(self, client, msg):
+        """False if the client's queue is full (the message was not queued)."""
+        if client.evicted:
+            return True
+        try:
+            client.queue.put_nowait(msg)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def _evict(self, client):
+        # slow client: drop it, never block the others
+        if client.evicted:
+            return
+        client.evicted = True
+        self.stats["evicted"] += 1
+        self._clients.discard(client)
+        if client.sender is not None:
+            client.sender.cancel()
+        asyncio.ensure_future(client.ws.close(code=1013, reason="client too slow"))
+        print("[Web] evicted slow client")
+
+    async def _sender(self, client):
+        while True:
+            msg = await client.queue.get()
+            await client.ws.send(msg)
+            self.stats["sent"] += 1
+
+    async def _handle_client(self, ws):
+        client = _Client(ws, self.client_queue_size)
+        self._clients.add(client)
+        self.stats["connected"] += 1
+        self._enqueue(client, json.dumps({"type": "snapshot", "state": self._snapshot()}))
+        client.sender = asyncio.create_task(self._sender(client))
+        try:
+            async for raw in ws:
+                self._handle_control(raw)
+        except Exception:
+            pass
+        finally:
+            self._clients.discard(client)
+            client.sender.cancel()
+
+    def _handle_control(self, raw):
+        try:
+            msg = json.loads(raw)
+        except (TypeError, ValueError):
+            return
+        if not isinstance(msg, dict) or msg.get("type") != "set":
+            return
+        key = msg.get("key")
+        if key not in CONTROL_KEYS:
+            return
+        setattr(self.signals, key, bool(msg.get("value")))
+        self.stats["controls"] += 1
+
+    def _snapshot(self):
+        return {k: getattr(self.signals, k, None) for k in _STATE_KEYS}